@@ -0,0 +1,298 @@
+"""
+Atlas Packer - キャラクターごとのシールをアトラス画像にまとめる
+
+コレクション画面やガチャ画面は、キャラクター1体につき 30 枚（ボンドロ 15 +
+マシュマロ 15）の PNG を1枚ずつ取得・デコードしています。1体分のシールを
+最大サイズを決めた1〜数枚のアトラス画像に詰め込み、シールID → 位置の
+マニフェスト（JSON）を書き出すので、画面ごとの取得とデコードが1回で済みます。
+
+詰め込みは MaxRects（空き領域のうち短い辺の余りが最小の場所に置く）で、
+回転はしません。収まらない分は次のアトラスに回し、各アトラスは使った範囲に
+切り詰めます（枚数が最少で合計面積が最小になるアトラスの大きさを探す）。
+シールの間は padding px の透明な隙間を空けます（縮小表示でのにじみ防止）。
+
+使い方:
+    python atlas_packer.py <キャラ名> [オプション]
+        generated_stickers.json にある public/stickers/<キャラ名>/ のシール
+    python atlas_packer.py <名前> --sheet <透過済みシート> [--sheet ...] [オプション]
+        シートから detect_and_extract_stickers で切り出したシール
+        （ID は <名前>_1, <名前>_2, ... でシートをまたいで連番）
+
+オプション:
+    --output, -o    出力ディレクトリ (デフォルト: public/atlases)
+                    <名前>_0.png, <名前>_1.png, ... と <名前>.json を保存
+    --max-size      アトラスの最大の幅・高さ (デフォルト: 2048)
+    --padding       シールの間の隙間 px (デフォルト: 2)
+    --png-preset    PNG 圧縮プリセット fast / balanced / smallest
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from png_encode import DEFAULT_PRESET, PNG_PRESETS, encode_pngs
+from process_stickers import DETECT_PARAMS, detect_and_extract_stickers
+from sticker_variants import STICKERS_DIR, sticker_parts
+from sync_writer import write_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BASE_PATH, 'public', 'atlases')
+MAX_SIZE = 2048
+
+
+class MaxRectsBin:
+    """1枚のアトラスの空き領域を管理する（MaxRects, 短い辺の余りが最小の場所に置く）"""
+
+    def __init__(self, width: int, height: int):
+        self.free = [(0, 0, width, height)]
+
+    def insert(self, width: int, height: int) -> tuple:
+        """width x height を置ける場所 (x, y) を返して確保する。置けなければ None"""
+        best = None
+        for fx, fy, fw, fh in self.free:
+            if width <= fw and height <= fh:
+                score = (min(fw - width, fh - height), max(fw - width, fh - height))
+                if best is None or score < best[0]:
+                    best = (score, fx, fy)
+        if best is None:
+            return None
+
+        _, x, y = best
+        self._split(x, y, width, height)
+        return x, y
+
+    def _split(self, x: int, y: int, width: int, height: int):
+        """置いた矩形と重なる空き領域を、重ならない最大の矩形に分ける"""
+        pieces = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + width <= fx or y >= fy + fh or y + height <= fy:
+                pieces.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                pieces.append((fx, fy, x - fx, fh))
+            if x + width < fx + fw:
+                pieces.append((x + width, fy, fx + fw - x - width, fh))
+            if y > fy:
+                pieces.append((fx, fy, fw, y - fy))
+            if y + height < fy + fh:
+                pieces.append((fx, y + height, fw, fy + fh - y - height))
+
+        # ほかの空き領域に含まれるものは不要
+        self.free = [
+            r for i, r in enumerate(pieces)
+            if not any(j != i and _contains(o, r) and (o != r or j < i)
+                       for j, o in enumerate(pieces))
+        ]
+
+
+def _contains(outer: tuple, inner: tuple) -> bool:
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def _pack_pages(sizes: list, order: list, width: int, height: int, padding: int) -> list:
+    """width x height のアトラスに order の順で置き、収まらない分は次のアトラスに回す"""
+    placements = [None] * len(sizes)
+    remaining = order
+    page = 0
+    while remaining:
+        # 隙間は右と下にだけ取り、アトラスの端ではその分をはみ出してよいことにする
+        bin_ = MaxRectsBin(width + padding, height + padding)
+        left = []
+        for i in remaining:
+            w, h = sizes[i]
+            position = bin_.insert(w + padding, h + padding)
+            if position is None:
+                left.append(i)
+            else:
+                placements[i] = (page,) + position
+        if len(left) == len(remaining):
+            return None  # 1枚も置けない（アトラスが小さすぎる）
+        remaining = left
+        page += 1
+    return placements
+
+
+def _packed_area(sizes: list, placements: list) -> tuple:
+    """(アトラス枚数, 切り詰めた後の合計面積)"""
+    extents = {}
+    for (page, x, y), (w, h) in zip(placements, sizes):
+        right, bottom = extents.get(page, (0, 0))
+        extents[page] = (max(right, x + w), max(bottom, y + h))
+    return len(extents), sum(w * h for w, h in extents.values())
+
+
+def pack_rects(sizes: list, max_size: int = MAX_SIZE, padding: int = 2) -> list:
+    """
+    (幅, 高さ) のリストを max_size 四方までのアトラスに詰める
+
+    大きい順に置き、収まらない分は次のアトラスに回す。アトラスの幅・高さを
+    max_size / 16 刻みで変えて試し、枚数が最少で合計面積が最小のものを選ぶ
+    （max_size が大きいと細長い1列に並ぶのを防ぐ）。
+
+    Returns:
+        sizes と同じ順の (アトラス番号, x, y)
+    """
+    for width, height in sizes:
+        if width > max_size or height > max_size:
+            raise ValueError(f"{width}x{height} のシールは最大サイズ {max_size} に収まりません")
+
+    # 長い辺 → 面積の大きい順に置くと隙間が少ない
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (max(sizes[i]), sizes[i][0] * sizes[i][1]),
+                   reverse=True)
+    step = max(64, max_size // 16)
+    candidates = sorted(set(range(step, max_size, step)) | {max_size})
+
+    best = None
+    for width in candidates:
+        for height in candidates:
+            placements = _pack_pages(sizes, order, width, height, padding)
+            if placements is None:
+                continue
+            score = _packed_area(sizes, placements)
+            if best is None or score < best[0]:
+                best = (score, placements)
+    return best[1] if best else []
+
+
+def build_atlases(stickers: list, max_size: int = MAX_SIZE, padding: int = 2) -> tuple:
+    """
+    シール画像をアトラスにまとめる
+
+    Args:
+        stickers: [{'id', 'image': BGRA の画像}, ...]
+
+    Returns:
+        (アトラス画像のリスト, {シールID: {'atlas', 'x', 'y', 'width', 'height', 'uv'}})
+    """
+    sizes = [(s['image'].shape[1], s['image'].shape[0]) for s in stickers]
+    placements = pack_rects(sizes, max_size, padding)
+
+    # 各アトラスは使った範囲に切り詰める
+    pages = max((p[0] for p in placements), default=-1) + 1
+    extents = [[0, 0] for _ in range(pages)]
+    for (page, x, y), (width, height) in zip(placements, sizes):
+        extents[page][0] = max(extents[page][0], x + width)
+        extents[page][1] = max(extents[page][1], y + height)
+    atlases = [np.zeros((h, w, 4), dtype=np.uint8) for w, h in extents]
+
+    rects = {}
+    for sticker, (page, x, y), (width, height) in zip(stickers, placements, sizes):
+        image = sticker['image']
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        atlases[page][y:y + height, x:x + width] = image
+        atlas_width, atlas_height = extents[page]
+        rects[sticker['id']] = {
+            'atlas': page, 'x': x, 'y': y, 'width': width, 'height': height,
+            'uv': [round(x / atlas_width, 6), round(y / atlas_height, 6),
+                   round((x + width) / atlas_width, 6), round((y + height) / atlas_height, 6)],
+        }
+    return atlases, rects
+
+
+def load_character_stickers(char_name: str, stickers_dir: str = STICKERS_DIR) -> list:
+    """generated_stickers.json からキャラクターのシールを読み込む（ID 付き）"""
+    with open(os.path.join(BASE_PATH, 'generated_stickers.json'), 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    stickers = []
+    for entry in catalog:
+        if entry['folder'] != char_name:
+            continue
+        path = os.path.join(stickers_dir, *sticker_parts(entry), entry['fileName'])
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(f"  [WARN] 読み込めません: {path}")
+            continue
+        stickers.append({'id': entry['id'], 'image': image})
+    return stickers
+
+
+def load_sheet_stickers(name: str, sheet_paths: list) -> list:
+    """シートから切り出したシール（ID は <名前>_<連番>）"""
+    stickers = []
+    for path in sheet_paths:
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise FileNotFoundError(f"画像を読み込めません: {path}")
+        for sticker in detect_and_extract_stickers(image, **DETECT_PARAMS):
+            stickers.append({'id': f"{name}_{len(stickers) + 1}", 'image': sticker['image']})
+    return stickers
+
+
+def write_atlases(name: str, stickers: list, output_dir: str = DEFAULT_OUTPUT,
+                  max_size: int = MAX_SIZE, padding: int = 2,
+                  preset: str = DEFAULT_PRESET) -> dict:
+    """
+    アトラス画像 <名前>_<番号>.png とマニフェスト <名前>.json を書き出す
+
+    Returns:
+        マニフェストの内容
+    """
+    atlases, rects = build_atlases(stickers, max_size, padding)
+    encoded = encode_pngs(atlases, preset)
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'name': name, 'atlases': [], 'stickers': rects}
+    for i, (atlas, result) in enumerate(zip(atlases, encoded)):
+        file_name = f"{name}_{i}.png"
+        write_atomic(os.path.join(output_dir, file_name), result['data'])
+        manifest['atlases'].append({'file': file_name, 'width': atlas.shape[1],
+                                    'height': atlas.shape[0], 'bytes': result['bytes']})
+
+    # 前回より枚数が減ったときの古いアトラスを消す
+    page = len(atlases)
+    while os.path.isfile(os.path.join(output_dir, f"{name}_{page}.png")):
+        os.remove(os.path.join(output_dir, f"{name}_{page}.png"))
+        page += 1
+
+    write_atomic(os.path.join(output_dir, f"{name}.json"),
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Atlas Packer - キャラクターのシールをアトラス画像にまとめる'
+    )
+    parser.add_argument('name', help='キャラクター名（--sheet のときは出力名）')
+    parser.add_argument('--sheet', action='append', default=[],
+                        help='切り出し元の透過済みシート（複数可）')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='出力ディレクトリ')
+    parser.add_argument('--max-size', type=int, default=MAX_SIZE,
+                        help='アトラスの最大の幅・高さ')
+    parser.add_argument('--padding', type=int, default=2, help='シールの間の隙間 px')
+    parser.add_argument('--png-preset', choices=list(PNG_PRESETS), default=DEFAULT_PRESET,
+                        help='PNG 圧縮プリセット(fast / balanced / smallest)')
+    args = parser.parse_args()
+
+    if args.sheet:
+        stickers = load_sheet_stickers(args.name, args.sheet)
+    else:
+        stickers = load_character_stickers(args.name)
+    if not stickers:
+        parser.error(f"シールが見つかりません: {args.name}")
+
+    manifest = write_atlases(args.name, stickers, args.output, args.max_size,
+                             args.padding, args.png_preset)
+
+    source_pixels = sum(s['image'].shape[0] * s['image'].shape[1] for s in stickers)
+    print(f"{args.name}: {len(stickers)}枚 → アトラス {len(manifest['atlases'])}枚")
+    fill = source_pixels / sum(a['width'] * a['height'] for a in manifest['atlases'])
+    for atlas in manifest['atlases']:
+        print(f"  {atlas['file']}: {atlas['width']}x{atlas['height']}, "
+              f"{atlas['bytes'] / 1024:.0f} KB")
+    print(f"  充填率: {fill * 100:.1f}%")
+    print(f"  マニフェスト: {os.path.join(args.output, args.name + '.json')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Batch Runner - 複数画像の一括処理ヘルパー
+
+ファイル・ディレクトリ・グロブ指定を画像ファイルのリストに展開し、
+プロセスプールで並列に処理します。1枚ごとに進捗とエラーを表示し、
+1枚が失敗しても残りの処理は続けます。
+"""
+
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff')
+
+
+def expand_inputs(patterns: list, extensions: tuple = IMAGE_EXTENSIONS) -> list:
+    """
+    ファイル・ディレクトリ・グロブを画像ファイルのパスのリストに展開する
+
+    ディレクトリは直下の画像ファイル、グロブは一致した画像ファイル（** 可）を
+    名前順で加える。存在しないファイル名はそのまま残し、処理時のエラーとして報告する。
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))]
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            files.append(pattern)
+            continue
+        files.extend(path for path in matches
+                     if os.path.isfile(path) and path.lower().endswith(extensions))
+
+    # 重複を除く（順序は維持）
+    seen = set()
+    unique = []
+    for path in files:
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def output_paths(input_paths: list, output_root: str = None, suffix: str = '') -> list:
+    """
+    各入力の出力先 <出力ルート>/<画像名><suffix> を決める
+
+    出力ルート未指定なら入力画像と同じ場所。同じ画像名が複数あるときは
+    親フォルダ名を、同じフォルダに拡張子違いがあるときは拡張子も付けて
+    衝突を避ける（実行ごとに同じ出力先になる）。
+    """
+    parts = []
+    for path in input_paths:
+        stem, ext = os.path.splitext(os.path.basename(path))
+        parent = os.path.dirname(os.path.abspath(path))
+        parts.append((stem, ext.lstrip('.'), parent))
+    stems = [stem for stem, _, _ in parts]
+    stem_dirs = [(stem, parent) for stem, _, parent in parts]
+
+    paths = []
+    for path, (stem, ext, parent) in zip(input_paths, parts):
+        if stems.count(stem) > 1:
+            name = f"{os.path.basename(parent)}_{stem}"
+            if stem_dirs.count((stem, parent)) > 1:
+                name = f"{name}_{ext}"
+        else:
+            name = stem
+        root = output_root if output_root else os.path.dirname(path)
+        paths.append(os.path.join(root, name + suffix))
+    return paths
+
+
+def _init_worker():
+    # 各プロセスが全コアでスレッドを立てると取り合いになるため 1 スレッドに制限
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+
+
+def _run_job(func, args: tuple, prefetched=None) -> tuple:
+    """ジョブを実行して (成功したか, 結果またはエラー文, 秒数) を返す"""
+    start = time.perf_counter()
+    try:
+        if prefetched is not None:
+            result = func(*args, prefetched=prefetched)
+        else:
+            result = func(*args)
+        return True, result, time.perf_counter() - start
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+def run_batch(func, jobs: list, workers: int = None, describe=None,
+              prefetch=None) -> list:
+    """
+    jobs の各引数タプルで func を実行する
+
+    Args:
+        func: モジュール直下の関数（プロセス間で受け渡せること）
+        jobs: func に渡す引数タプルのリスト
+        workers: 並列数（None なら CPU コア数、1 なら同じプロセスで順に実行）
+        describe: 結果から進捗表示用の一言を作る関数 (result -> str)
+        prefetch: 1 プロセス実行時に、次のジョブの前処理（画像デコードなど）を
+            現在のジョブと並行して行う関数 (args -> 値)。
+            戻り値は func に prefetched= で渡される
+
+    Returns:
+        jobs と同じ順の [{'args', 'ok', 'result', 'error', 'seconds'}, ...]
+    """
+    workers = workers or os.cpu_count() or 1
+    total = len(jobs)
+    results = [None] * total
+    done = 0
+
+    def report(index, ok, value, seconds):
+        nonlocal done
+        done += 1
+        name = os.path.basename(str(jobs[index][0]))
+        if ok:
+            detail = f"  {describe(value)}" if describe else ''
+            print(f"[{done:>{len(str(total))}}/{total}] OK  {name} ({seconds:.2f}s){detail}")
+        else:
+            print(f"[{done:>{len(str(total))}}/{total}] NG  {name}: {value}")
+        sys.stdout.flush()
+        results[index] = {
+            'args': jobs[index],
+            'ok': ok,
+            'result': value if ok else None,
+            'error': None if ok else value,
+            'seconds': seconds,
+        }
+
+    if workers == 1 or total <= 1:
+        # 1 プロセス: 次のジョブの前処理をスレッドで先に進めておく
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            pending = reader.submit(prefetch, jobs[0]) if prefetch and jobs else None
+            for i, args in enumerate(jobs):
+                prefetched = None
+                if pending is not None:
+                    try:
+                        prefetched = pending.result()
+                    except Exception:
+                        prefetched = None  # func 側で改めて読み込み、エラーを報告させる
+                    pending = None
+                if prefetch and i + 1 < total:
+                    pending = reader.submit(prefetch, jobs[i + 1])
+                report(i, *_run_job(func, args, prefetched))
+        return results
+
+    # 複数プロセス: workers 枚を同時に処理するので、あるシートのデコードと
+    # 別のシートの検出・保存が重なって進む
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_run_job, func, args): i for i, args in enumerate(jobs)}
+        for future in as_completed(futures):
+            report(futures[future], *future.result())
+
+    return results
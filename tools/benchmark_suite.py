@@ -0,0 +1,405 @@
+"""
+Benchmark Suite - 画像ツールのベンチマーク
+
+乱数の種から毎回同じ合成シート（透過シート・グレー背景シート）を作り、
+各ツールの処理時間とピークメモリを計測します。結果は JSON に保存し、
+前回の結果（ベースライン）と比べて遅くなった・メモリが増えたものを表示します。
+
+合成シート:
+    --size          幅x高さ、または small (2048x2048) / 4k (4096x4096) / 8k (8192x8192)
+    --blobs         シールの数 (デフォルト: 30)
+    --shapes        ellipse / rect / star / mixed (デフォルト: mixed)
+    --touching      隣のパーツとくっついたシールの数 (デフォルト: 0)
+    --specks        ゴミ（1〜3 px の点）の数 (デフォルト: 200)
+    --seed          乱数の種 (デフォルト: 0)
+
+計測する処理（--cases で絞り込み、カンマ区切り）:
+    detect          sticker_splitter.detect_stickers
+    extract         sticker_splitter.extract_stickers
+    save            sticker_splitter.save_stickers
+    remove_gray     remove_gray_bg.remove_gray_background
+    resize          resize_for_stability.resize_for_stability
+    process_character  process_stickers.process_character
+    process_both       process_single_sheet.process_both
+    process_marshmallow_only  process_single_sheet.process_marshmallow_only
+
+各処理は別プロセス（spawn）で実行するので、ピークメモリはその処理だけの値です
+（シートのデコードを含む）。キャラクター処理は一時フォルダに出力し、
+結果キャッシュは使いません。
+
+使い方:
+    python benchmark_suite.py [オプション] -o result.json
+    python benchmark_suite.py [オプション] --baseline result.json
+
+オプション:
+    --repeat        各処理の繰り返し回数（最速値を採用）(デフォルト: 3)
+    --output, -o    結果の JSON の保存先
+    --baseline      比べるベースラインの JSON
+    --tolerance     遅くなった・増えたとみなす割合 (デフォルト: 0.10 = 10%)
+"""
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from perf_utils import peak_rss_mb
+
+SIZE_PRESETS = {
+    'small': (2048, 2048),
+    '4k': (4096, 4096),
+    '8k': (8192, 8192),
+}
+SHAPES = ('ellipse', 'rect', 'star')
+GRAY_BACKGROUND = 128
+
+CASES = ('detect', 'extract', 'save', 'remove_gray', 'resize',
+         'process_character', 'process_both', 'process_marshmallow_only')
+
+RESULT_VERSION = 1
+
+
+def parse_size(text: str) -> tuple:
+    if text in SIZE_PRESETS:
+        return SIZE_PRESETS[text]
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def _blob_mask(shape: str, width: int, height: int, rng) -> np.ndarray:
+    """width x height の枠に収まるパーツの形"""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    center = (width // 2, height // 2)
+    if shape == 'ellipse':
+        cv2.ellipse(mask, center, (width // 2 - 1, height // 2 - 1), 0, 0, 360, 255, -1)
+    elif shape == 'rect':
+        radius = max(1, min(width, height) // 6)
+        cv2.rectangle(mask, (radius, 0), (width - 1 - radius, height - 1), 255, -1)
+        cv2.rectangle(mask, (0, radius), (width - 1, height - 1 - radius), 255, -1)
+        for x, y in ((radius, radius), (width - 1 - radius, radius),
+                     (radius, height - 1 - radius), (width - 1 - radius, height - 1 - radius)):
+            cv2.circle(mask, (x, y), radius, 255, -1)
+    else:
+        points = int(rng.integers(5, 8))
+        angles = np.arange(points * 2) * np.pi / points - np.pi / 2
+        radii = np.where(np.arange(points * 2) % 2 == 0, 1.0, 0.5)
+        xs = center[0] + (width / 2 - 1) * radii * np.cos(angles)
+        ys = center[1] + (height / 2 - 1) * radii * np.sin(angles)
+        cv2.fillPoly(mask, [np.stack([xs, ys], axis=1).round().astype(np.int32)], 255)
+    return mask
+
+
+def _paint(sheet: np.ndarray, mask: np.ndarray, x: int, y: int, rng):
+    """mask の形にグラデーションと細かいノイズのある色を塗る（実物に近い PNG サイズにする）"""
+    height, width = mask.shape
+    region = sheet[y:y + height, x:x + width]
+    # グレー背景と区別できるよう彩度の高い色を選ぶ
+    hue = int(rng.integers(0, 180))
+    base = cv2.cvtColor(np.uint8([[[hue, 200, 220]]]), cv2.COLOR_HSV2BGR)[0, 0].astype(np.int16)
+    gradient = np.linspace(-30, 30, height, dtype=np.float32)[:, None, None]
+    noise = rng.integers(-6, 7, (height, width, 3), dtype=np.int16)
+    color = np.clip(base + gradient + noise, 0, 255).astype(np.uint8)
+    inside = mask > 0
+    region[:, :, :3][inside] = color[inside]
+    region[:, :, 3][inside] = 255
+
+
+def make_sheet(width: int, height: int, blobs: int = 30, shapes: str = 'mixed',
+               touching: int = 0, specks: int = 200, background: str = 'rgba',
+               seed: int = 0) -> np.ndarray:
+    """
+    合成シートを作る（同じ引数なら毎回同じ画素）
+
+    Args:
+        background: 'rgba'（透過背景）または 'gray'（不透明な #808080 背景）
+        touching: 右隣に小さなパーツがくっついたシールの数（1つの連結成分になる）
+        specks: 1〜3 px のゴミの数（min_size で除かれるはずのもの）
+    """
+    rng = np.random.default_rng(seed)
+    sheet = np.zeros((height, width, 4), dtype=np.uint8)
+    if background == 'gray':
+        sheet[:] = (GRAY_BACKGROUND, GRAY_BACKGROUND, GRAY_BACKGROUND, 255)
+
+    # 格子のマスに1つずつ置く（くっつけるもの以外は離れている）
+    cols = max(1, int(np.ceil(np.sqrt(blobs * width / height))))
+    rows = max(1, int(np.ceil(blobs / cols)))
+    cell_w, cell_h = width // cols, height // rows
+    for i in range(blobs):
+        row, col = divmod(i, cols)
+        shape = SHAPES[int(rng.integers(0, len(SHAPES)))] if shapes == 'mixed' else shapes
+        w = int(cell_w * rng.uniform(0.35, 0.55))
+        h = int(cell_h * rng.uniform(0.35, 0.55))
+        x = col * cell_w + int(rng.integers(cell_w // 20, cell_w - w - cell_w // 4))
+        y = row * cell_h + int(rng.integers(cell_h // 20, cell_h - h - cell_h // 20))
+        mask = _blob_mask(shape, w, h, rng)
+        _paint(sheet, mask, x, y, rng)
+        if i < touching:
+            # 中央の行の右端に重ねて小さなパーツを置く
+            small_w, small_h = max(3, w // 3), max(3, h // 3)
+            edge = int(np.nonzero(mask[h // 2])[0].max())
+            _paint(sheet, _blob_mask('ellipse', small_w, small_h, rng),
+                   x + edge - small_w // 4, y + (h - small_h) // 2, rng)
+
+    if background == 'gray':
+        # グレー背景の上のゴミは背景と違う色にする
+        color = np.array([40, 40, 200], dtype=np.uint8)
+    for _ in range(specks):
+        size = int(rng.integers(1, 4))
+        x = int(rng.integers(0, width - size))
+        y = int(rng.integers(0, height - size))
+        if background == 'gray':
+            sheet[y:y + size, x:x + size, :3] = color
+        else:
+            sheet[y:y + size, x:x + size] = (0, 0, 255, 255)
+
+    return sheet if background == 'rgba' else np.ascontiguousarray(sheet[:, :, :3])
+
+
+def sheet_config(args) -> dict:
+    width, height = parse_size(args.size)
+    return {'width': width, 'height': height, 'blobs': args.blobs, 'shapes': args.shapes,
+            'touching': args.touching, 'specks': args.specks, 'seed': args.seed}
+
+
+def write_sheets(config: dict, work_dir: str) -> dict:
+    """
+    ベンチマークに使うシートを PNG で書き出す
+
+    Returns:
+        {'rgba', 'rgba2', 'gray': パス, 'digest': 画素の sha256（ベースラインとの照合用）}
+    """
+    digest = hashlib.sha256()
+    paths = {}
+    for name, background, seed in (('rgba', 'rgba', config['seed']),
+                                   ('rgba2', 'rgba', config['seed'] + 1),
+                                   ('gray', 'gray', config['seed'])):
+        sheet = make_sheet(config['width'], config['height'], config['blobs'],
+                           config['shapes'], config['touching'], config['specks'],
+                           background, seed)
+        digest.update(sheet.tobytes())
+        paths[name] = os.path.join(work_dir, f"{name}.png")
+        ok, buffer = cv2.imencode('.png', sheet, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            raise OSError(f"PNG エンコードに失敗しました: {name}")
+        with open(paths[name], 'wb') as f:
+            f.write(buffer)
+    paths['digest'] = digest.hexdigest()
+    return paths
+
+
+def _prepare_case(name: str, sheets: dict, work_dir: str) -> tuple:
+    """
+    計測する処理を用意する（ワーカープロセスで実行）
+
+    Returns:
+        (run: 計測する関数, reset: 各回の前に呼ぶ後片付け（計測しない）)
+    """
+    out_dir = os.path.join(work_dir, f"out_{name}")
+
+    def reset():
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir, exist_ok=True)
+
+    if name in ('detect', 'extract', 'save'):
+        import sticker_splitter
+        image = cv2.imread(sheets['rgba'], cv2.IMREAD_UNCHANGED)
+        if name == 'detect':
+            return lambda: sticker_splitter.detect_stickers(image), reset
+        boxes = sticker_splitter.detect_stickers(image)
+        if name == 'extract':
+            return lambda: sticker_splitter.extract_stickers(image, boxes), reset
+        stickers = sticker_splitter.extract_stickers(image, boxes)
+        return lambda: sticker_splitter.save_stickers(stickers, out_dir), reset
+
+    if name == 'remove_gray':
+        from remove_gray_bg import remove_gray_background
+        return (lambda: remove_gray_background(sheets['gray'],
+                                               os.path.join(out_dir, 'keyed.png')), reset)
+
+    if name == 'resize':
+        from resize_for_stability import resize_for_stability
+        return (lambda: resize_for_stability(sheets['rgba'],
+                                             os.path.join(out_dir, 'resized.png')), reset)
+
+    # キャラクター処理: 出力先を一時フォルダに向け、結果キャッシュは使わない
+    import process_single_sheet
+    import process_stickers
+    from result_cache import load_or_extract
+    from sticker_hash_index import check_new_stickers
+    index_path = os.path.join(work_dir, f"hashes_{name}.json")
+    for module in (process_stickers, process_single_sheet):
+        module.OUTPUT_BASE = out_dir
+        module.load_or_extract = functools.partial(load_or_extract, cache_dir=None)
+        module.check_new_stickers = functools.partial(check_new_stickers,
+                                                      index_path=index_path)
+
+    def reset_character():
+        reset()
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    if name == 'process_character':
+        run = lambda: process_stickers.process_character('bench', sheets['rgba'],
+                                                         sheets['rgba2'])
+    elif name == 'process_both':
+        run = lambda: process_single_sheet.process_both('bench', sheets['rgba'],
+                                                        sheets['rgba2'])
+    else:
+        run = lambda: process_single_sheet.process_marshmallow_only('bench', sheets['rgba2'])
+    return run, reset_character
+
+
+def run_case(name: str, sheets: dict, work_dir: str, repeat: int) -> dict:
+    """1つの処理を repeat 回計測する（ワーカープロセスで実行）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        run, reset = _prepare_case(name, sheets, work_dir)
+        times = []
+        for _ in range(repeat):
+            reset()
+            start = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - start) * 1000)
+    return {
+        'ms_min': round(min(times), 2),
+        'ms_median': round(statistics.median(times), 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_suite(config: dict, cases: list, repeat: int = 3) -> dict:
+    """シートを作り、各処理を別プロセスで計測する"""
+    work_dir = tempfile.mkdtemp(prefix='sticker_bench_')
+    try:
+        context = multiprocessing.get_context('spawn')
+        # Linux のピークメモリ (ru_maxrss) は exec をまたいで親から引き継がれるので、
+        # 大きなシートを作るのも別プロセスにして、このプロセスは小さいままにする
+        with context.Pool(1) as pool:
+            sheets = pool.apply(write_sheets, (config, work_dir))
+        results = {}
+        for name in cases:
+            # 処理ごとに新しいプロセスにして、ピークメモリを分ける
+            with context.Pool(1) as pool:
+                results[name] = pool.apply(run_case, (name, sheets, work_dir, repeat))
+            print(f"  {name:<26} {results[name]['ms_min']:>10.1f} ms "
+                  f"(中央値 {results[name]['ms_median']:.1f}) "
+                  f"{results[name]['peak_rss_mb']:>8.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'version': RESULT_VERSION,
+        'config': config,
+        'sheet_digest': sheets['digest'],
+        'repeat': repeat,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.10) -> list:
+    """
+    ベースラインと比べて、遅くなった・メモリが増えた処理を返す
+
+    Returns:
+        [(処理, 項目, ベースライン, 今回, 比), ...]
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        for metric in ('ms_min', 'peak_rss_mb'):
+            if base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, base[metric], result[metric],
+                                    result[metric] / base[metric]))
+    return regressions
+
+
+def format_comparison(current: dict, baseline: dict) -> str:
+    lines = [f"  {'処理':<24} {'前回 ms':>10} {'今回 ms':>10} {'比':>6} "
+             f"{'前回 MB':>9} {'今回 MB':>9}"]
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            lines.append(f"  {name:<26} {'-':>10} {result['ms_min']:>10.1f}")
+            continue
+        ratio = result['ms_min'] / base['ms_min'] if base['ms_min'] else 0.0
+        lines.append(f"  {name:<26} {base['ms_min']:>10.1f} {result['ms_min']:>10.1f} "
+                     f"{ratio:>6.2f} {base['peak_rss_mb']:>9.1f} {result['peak_rss_mb']:>9.1f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark Suite - 合成シートで画像ツールの速度・メモリを計測'
+    )
+    parser.add_argument('--size', default='4k', help='幅x高さ または small / 4k / 8k')
+    parser.add_argument('--blobs', type=int, default=30, help='シールの数')
+    parser.add_argument('--shapes', choices=SHAPES + ('mixed',), default='mixed',
+                        help='シールの形')
+    parser.add_argument('--touching', type=int, default=0,
+                        help='隣のパーツとくっついたシールの数')
+    parser.add_argument('--specks', type=int, default=200, help='ゴミの数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数の種')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help='計測する処理（カンマ区切り）')
+    parser.add_argument('--repeat', type=int, default=3, help='各処理の繰り返し回数')
+    parser.add_argument('-o', '--output', help='結果の JSON の保存先')
+    parser.add_argument('--baseline', help='比べるベースラインの JSON')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='遅くなった・増えたとみなす割合')
+    args = parser.parse_args()
+
+    cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    for case in cases:
+        if case not in CASES:
+            parser.error(f"不明な処理: {case} ({', '.join(CASES)})")
+
+    config = sheet_config(args)
+    print(f"合成シート: {config['width']}x{config['height']}, シール {config['blobs']}個 "
+          f"({config['shapes']}), くっつき {config['touching']}, ゴミ {config['specks']}, "
+          f"seed {config['seed']}")
+    result = run_suite(config, cases, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('sheet_digest') != result['sheet_digest']:
+            print("\n[WARN] ベースラインとシートが違います（設定か生成方法が変わっています）")
+        print(f"\nベースライン比較: {args.baseline}")
+        print(format_comparison(result, baseline))
+        regressions = compare(result, baseline, args.tolerance)
+        for name, metric, before, after, ratio in regressions:
+            label = '処理時間' if metric == 'ms_min' else 'ピークメモリ'
+            print(f"  [REGRESSION] {name}: {label} {before} → {after} ({ratio:.2f}倍)")
+        if regressions:
+            sys.exit(1)
+        print(f"  悪化なし（許容 {args.tolerance * 100:.0f}%）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Build Catalog - シールカタログの全出力を1回の走査で作る
+
+all_characters.json と RARITY_CONFIG からシールのレコードを1件ずつ作り、
+そのまま次の4つへ同時に書き出します。
+
+    generated_stickers.json
+    src/data/stickerMasterData.ts
+    supabase/migrations/024_seed_all_stickers.sql
+    tools/sticker_batches/batch_NN.sql（100件ずつ）
+
+generate_sticker_data.py → generate_ts_master.py → generate_sql_migration.py →
+insert_stickers_batched.py を順に実行したのと同じ内容になりますが、
+中間の JSON を読み直さず、レコードをリストに溜めることもありません。
+どこかで失敗した場合はどのファイルも書き換えません。
+
+使い方:
+    python build_catalog.py [オプション]
+
+オプション:
+    --characters  キャラクター一覧 (デフォルト: all_characters.json)
+    --scan        public/stickers を走査して一覧を作り直してから使う
+                  （sticker_inventory.py と同じ。--characters のファイルも更新する）
+    --only        書き出す出力をカンマ区切りで指定 (json,ts,sql,batches。デフォルト: 全部)
+    --batch-size  バッチ SQL 1ファイルあたりの件数 (デフォルト: 100)
+    --no-metadata 画像の width / height / bytes / contentHash を付けない
+    --shards      シリーズごとの TS モジュールも書く (src/data/stickerSeries/series_NN.ts)
+"""
+
+import argparse
+import json
+import time
+
+from catalog_writers import (BATCH_DIR, BATCH_SIZE, JSON_PATH, MIGRATION_PATH, SHARD_DIR,
+                             TS_PATH, BatchWriter, JsonWriter, MigrationWriter, TsMasterWriter,
+                             write_all)
+from generate_sticker_data import (CHARACTERS_PATH, count_rarities, iter_sticker_records,
+                                   print_rarity_distribution)
+from sticker_inventory import scan_characters, write_characters
+from sticker_metadata import enrich_records
+
+OUTPUTS = ('json', 'ts', 'sql', 'batches')
+
+
+def open_writers(outputs: tuple = OUTPUTS, batch_size: int = BATCH_SIZE,
+                 shards: bool = False) -> list:
+    factories = {
+        'json': lambda: JsonWriter(JSON_PATH),
+        'ts': lambda: TsMasterWriter(TS_PATH, SHARD_DIR if shards else None),
+        'sql': lambda: MigrationWriter(MIGRATION_PATH),
+        'batches': lambda: BatchWriter(BATCH_DIR, batch_size),
+    }
+    writers = []
+    try:
+        for name in outputs:
+            writers.append(factories[name]())
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    return writers
+
+
+def build_catalog(characters: list, outputs: tuple = OUTPUTS,
+                  batch_size: int = BATCH_SIZE, metadata: bool = True,
+                  shards: bool = False) -> dict:
+    """
+    Returns:
+        {'total': 件数, 'rarity_counts': {レアリティ: 件数}, 'writers': [書き出し先, ...],
+         'missing': [画像が見つからないシールの ID, ...]}
+    """
+    rarity_counts = {}
+    missing = []
+    records = iter_sticker_records(characters)
+    if metadata:
+        records = enrich_records(records, missing=missing)
+    writers = open_writers(outputs, batch_size, shards)
+    total = write_all(count_rarities(records, rarity_counts), writers)
+    return {'total': total, 'rarity_counts': rarity_counts, 'writers': writers,
+            'missing': missing}
+
+
+def parse_outputs(value: str) -> tuple:
+    outputs = tuple(v.strip() for v in value.split(',') if v.strip())
+    unknown = [v for v in outputs if v not in OUTPUTS]
+    if unknown or not outputs:
+        raise argparse.ArgumentTypeError(
+            f"出力は {', '.join(OUTPUTS)} から選んでください: {value}")
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build Catalog - シールカタログの JSON / TS / SQL を1回で作る'
+    )
+    parser.add_argument('--characters', default=CHARACTERS_PATH, help='キャラクター一覧')
+    parser.add_argument('--scan', action='store_true',
+                        help='public/stickers を走査して一覧を作り直す')
+    parser.add_argument('--only', type=parse_outputs, default=OUTPUTS,
+                        help='書き出す出力 (json,ts,sql,batches)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='バッチ SQL 1ファイルあたりの件数')
+    parser.add_argument('--no-metadata', action='store_true',
+                        help='画像の寸法・バイト数・内容ハッシュを付けない')
+    parser.add_argument('--shards', action='store_true',
+                        help='シリーズごとの TS モジュールも書く')
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error('--batch-size は1以上にしてください')
+
+    start = time.perf_counter()
+    if args.scan:
+        characters = scan_characters()
+        if write_characters(args.characters, characters):
+            print(f"キャラクター一覧を更新しました: {args.characters}")
+    else:
+        with open(args.characters, 'r', encoding='utf-8') as f:
+            characters = json.load(f)
+
+    result = build_catalog(characters, args.only, args.batch_size, not args.no_metadata,
+                           args.shards)
+    elapsed = time.perf_counter() - start
+
+    print(f"シール {result['total']}枚 → {len(result['writers'])}出力 ({elapsed:.2f}s)")
+    for writer in result['writers']:
+        if isinstance(writer, BatchWriter):
+            print(f"  {writer.path} ({writer.files}ファイル)")
+        elif isinstance(writer, TsMasterWriter) and writer.shards:
+            print(f"  {writer.path} (+ シリーズ別 {len(writer.shards)}ファイル)")
+        else:
+            print(f"  {writer.path}")
+        if isinstance(writer, TsMasterWriter) and writer.removed_shards:
+            print(f"  古いシリーズ別ファイルを削除: {len(writer.removed_shards)}ファイル")
+    if result['missing']:
+        print(f"  画像が見つからないシール: {len(result['missing'])}枚 "
+              f"({', '.join(result['missing'][:5])}{' ...' if len(result['missing']) > 5 else ''})")
+    print_rarity_distribution(result['rarity_counts'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,680 @@
+"""
+Catalog Writers - シールカタログの出力を1件ずつ書き出す
+
+generated_stickers.json / stickerMasterData.ts / UPSERT マイグレーション /
+バッチ SQL の各出力を、ヘッダー → シール1件ごと → フッターの順に
+ファイルへ直接書きます。全体を文字列のリストに溜めて最後に結合しないので、
+シールが何万件になってもメモリは1件分で済みます。
+
+どの出力も一時ファイルに書いてから置き換えるので、途中で失敗しても
+古いファイルが半端に上書きされることはありません。内容が変わらなければ
+ファイル自体を置き換えないので、Next.js のビルドキャッシュも無効になりません。
+"""
+
+import json
+import os
+import tempfile
+from urllib.parse import quote
+
+from sync_writer import commit_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JSON_PATH = os.path.join(BASE_PATH, 'generated_stickers.json')
+TS_PATH = os.path.join(BASE_PATH, 'src', 'data', 'stickerMasterData.ts')
+SHARD_DIR = os.path.join(BASE_PATH, 'src', 'data', 'stickerSeries')
+MIGRATION_PATH = os.path.join(BASE_PATH, 'supabase', 'migrations', '024_seed_all_stickers.sql')
+BATCH_DIR = os.path.join(BASE_PATH, 'tools', 'sticker_batches')
+BATCH_SIZE = 100
+
+
+class CatalogWriter:
+    """
+    出力先を開き、write(シール) を1件ずつ受け取り、close() で確定する
+
+    close() は finish()（フッターを書いて一時ファイルを閉じる）と commit()
+    （置き換え）をまとめたもの。複数のファイルをまとめて確定したいときは
+    finish() だけ先に呼び、最後に commit() する。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        fd, self._temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        self._file = os.fdopen(fd, 'w', encoding='utf-8')
+        self._file.write(self.header())
+
+    def header(self) -> str:
+        return ''
+
+    def record(self, sticker: dict) -> str:
+        raise NotImplementedError
+
+    def footer(self) -> str:
+        return ''
+
+    def write(self, sticker: dict):
+        self._file.write(self.record(sticker))
+        self.count += 1
+
+    def finish(self):
+        """フッターを書いて一時ファイルを閉じる（元のファイルはまだそのまま）"""
+        if not self._file.closed:
+            self._file.write(self.footer())
+            self._file.close()
+
+    def commit(self):
+        """一時ファイルで置き換える（内容が同じなら置き換えない）"""
+        commit_atomic(self._temp_path, self.path)
+
+    def close(self):
+        try:
+            self.finish()
+            self.commit()
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """書きかけの一時ファイルを捨てる（元のファイルはそのまま）"""
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class JsonWriter(CatalogWriter):
+    """json.dump(stickers, ensure_ascii=False, indent=2) と同じ内容"""
+
+    def record(self, sticker: dict) -> str:
+        body = json.dumps(sticker, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        return ('[\n  ' if self.count == 0 else ',\n  ') + body
+
+    def footer(self) -> str:
+        return '\n]' if self.count else '[]'
+
+
+def sql_image_url(sticker: dict) -> str:
+    if sticker.get('subfolder'):
+        return (f"/stickers/{quote(sticker['folder'])}/{quote(sticker['subfolder'])}/"
+                f"{quote(sticker['fileName'])}")
+    return f"/stickers/{quote(sticker['folder'])}/{quote(sticker['fileName'])}"
+
+
+def sql_text(value: str) -> str:
+    """SQL の文字列リテラル内のシングルクォートをエスケープする"""
+    return value.replace("'", "''")
+
+
+# sticker_variants.sticker_url と同じ（JS の encodeURIComponent が残す文字）
+_URI_COMPONENT_SAFE = "-_.!~*'()"
+
+TS_HEADER = '''// シールマスターデータ（自動生成）
+// 全45キャラクター × 合計1,156枚
+
+export interface StickerMaster {
+  id: string
+  name: string
+  character: string
+  variant: number
+  rarity: 1 | 2 | 3 | 4 | 5
+  type: 'normal' | 'puffy' | 'sparkle'
+  stickerType: 'classic' | 'bondro' | 'marshmallow'
+  series: string
+  imageUrl: string
+  baseRate: number
+  gachaWeight: number
+  // 画像のヘッダーから（読み込み前のレイアウト確保・キャッシュ無効化用。画像がなければ null）
+  width: number | null
+  height: number | null
+  bytes: number | null
+  contentHash: string | null
+}
+
+// シールタイプの説明
+// classic: 旧フォーマット（直接フォルダ内）
+// bondro: ボンボンドロップ型シール
+// marshmallow: マシュマロ型シール
+
+// レアリティ設定
+// ★★★★★ (R5): レジェンド - 約3.3%
+// ★★★★ (R4): スーパーレア - 約10%
+// ★★★ (R3): レア - 約20%
+// ★★ (R2): アンコモン - 約33%
+// ★ (R1): コモン - 約33%
+
+// 全シールマスターデータ（imageUrl はエンコード済み）
+// 同じ内容のオブジェクトリテラルより JSON.parse の方がパースが速い（1行1件）
+export const ALL_STICKERS: StickerMaster[] = JSON.parse(`[
+'''
+
+TS_LOOKUPS = '''
+// 生成時に作った索引（値は ALL_STICKERS の位置）
+function pick(indices: number[] | undefined): StickerMaster[] {
+  return indices ? indices.map((i) => ALL_STICKERS[i]) : []
+}
+
+// ユーティリティ関数
+
+// キャラクター別シール取得
+export function getStickersByCharacter(character: string): StickerMaster[] {
+  return pick(CHARACTER_INDEX.get(character))
+}
+
+// レアリティ別シール取得
+export function getStickersByRarity(rarity: number): StickerMaster[] {
+  return pick(RARITY_INDEX.get(rarity))
+}
+
+// シリーズ別シール取得
+export function getStickersBySeries(series: string): StickerMaster[] {
+  return pick(SERIES_INDEX.get(series))
+}
+
+// シールタイプ別取得
+export function getStickersByStickerType(stickerType: 'classic' | 'bondro' | 'marshmallow'): StickerMaster[] {
+  return pick(STICKER_TYPE_INDEX.get(stickerType))
+}
+'''
+
+TS_GACHA = '''
+// ガチャプール取得（重み付き）
+export function getGachaPool(): StickerMaster[] {
+  return pick(GACHA_TABLE.indices)
+}
+
+// 抽選表から1枚引く（O(1)）
+function drawFromTable(table: GachaTable, random: () => number): StickerMaster {
+  const column = Math.floor(random() * table.indices.length)
+  const index = random() * table.total < table.threshold[column] ? column : table.alias[column]
+  return ALL_STICKERS[table.indices[index]]
+}
+
+// 重み付きランダム抽選（pool を渡したときだけ全件をなめる）
+export function weightedRandomPull(pool?: StickerMaster[]): StickerMaster {
+  if (!pool) {
+    return drawFromTable(GACHA_TABLE, Math.random)
+  }
+
+  const totalWeight = pool.reduce((sum, s) => sum + s.gachaWeight, 0)
+  let random = Math.random() * totalWeight
+
+  for (const sticker of pool) {
+    random -= sticker.gachaWeight
+    if (random <= 0) {
+      return sticker
+    }
+  }
+
+  return pool[pool.length - 1]
+}
+
+// まとめて引く（10連・100連やシミュレーション用。series / rarity でプールを絞れる）
+export function pullStickers(
+  count: number,
+  options: { series?: string; rarity?: number; random?: () => number } = {}
+): StickerMaster[] {
+  let table: GachaTable | undefined = GACHA_TABLE
+  if (options.series !== undefined) {
+    table = SERIES_GACHA_TABLES.get(options.series)
+  } else if (options.rarity !== undefined) {
+    table = RARITY_GACHA_TABLES.get(options.rarity)
+  }
+  if (!table || table.indices.length === 0) {
+    return []
+  }
+
+  const random = options.random ?? Math.random
+  const pulls: StickerMaster[] = new Array(count)
+  for (let i = 0; i < count; i++) {
+    pulls[i] = drawFromTable(table, random)
+  }
+  return pulls
+}
+
+// レアリティ別の排出確率を計算
+export function getGachaRates(): { rarity: number; rate: number; count: number }[] {
+  const pool = getGachaPool()
+  const totalWeight = pool.reduce((sum, s) => sum + s.gachaWeight, 0)
+
+  const rarityGroups = new Map<number, { weight: number; count: number }>()
+
+  for (const sticker of pool) {
+    const existing = rarityGroups.get(sticker.rarity) || { weight: 0, count: 0 }
+    rarityGroups.set(sticker.rarity, {
+      weight: existing.weight + sticker.gachaWeight,
+      count: existing.count + 1,
+    })
+  }
+
+  return Array.from(rarityGroups.entries())
+    .map(([rarity, data]) => ({
+      rarity,
+      rate: Math.round((data.weight / totalWeight) * 10000) / 100,
+      count: data.count,
+    }))
+    .sort((a, b) => b.rarity - a.rarity)
+}
+'''
+
+TS_GACHA_TABLES = '''
+// ガチャの抽選表（Vose のエイリアス法。生成時に計算済み）
+// 列 i を一様に選び、random * total < threshold[i] なら indices[i]、
+// そうでなければ indices[alias[i]] を出す。threshold は整数なので重みの比がそのまま再現される
+interface GachaTable {
+  indices: number[]
+  threshold: number[]
+  alias: number[]
+  total: number
+}
+
+'''
+
+TS_FOOTER = '''
+// シリーズ一覧取得
+export function getAllSeries(): string[] {
+  return Array.from(SERIES_INDEX.keys())
+}
+
+// キャラクター一覧取得
+export function getAllCharacters(): string[] {
+  return Array.from(CHARACTER_INDEX.keys())
+}
+
+// ID でシール取得
+export function getStickerById(id: string): StickerMaster | undefined {
+  const index = ID_INDEX.get(id)
+  return index === undefined ? undefined : ALL_STICKERS[index]
+}
+
+// シリーズ別のシャードを読み込む（シャードを生成していなければ ALL_STICKERS から）
+export function loadStickersBySeries(series: string): Promise<StickerMaster[]> {
+  const load = SERIES_SHARDS.get(series)
+  return load ? load() : Promise.resolve(getStickersBySeries(series))
+}
+
+export default ALL_STICKERS
+'''
+
+SHARD_HEADER = '''// シールマスターデータ: {series}（自動生成）
+// stickerMasterData.ts の loadStickersBySeries から動的 import される
+import type {{ StickerMaster }} from '../stickerMasterData'
+
+const STICKERS: StickerMaster[] = JSON.parse(`[
+'''
+
+SHARD_FOOTER = '''
+]`)
+
+export default STICKERS
+'''
+
+
+def encode_uri_component(value: str) -> str:
+    return quote(value, safe=_URI_COMPONENT_SAFE)
+
+
+def ts_image_url(sticker: dict) -> str:
+    """従来の encodeImageUrl(folder, subfolder, fileName) と同じ URL"""
+    parts = [sticker['folder']]
+    if sticker.get('subfolder'):
+        parts.append(sticker['subfolder'])
+    parts.append(sticker['fileName'])
+    return '/stickers/' + '/'.join(encode_uri_component(p) for p in parts)
+
+
+def ts_value(value) -> str:
+    """TS のリテラル（None は null、文字列はシングルクォート）"""
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+    return str(value)
+
+
+# StickerMaster のフィールド（この順で書く）
+TS_FIELDS = ('id', 'name', 'character', 'variant', 'rarity', 'type', 'stickerType', 'series',
+             'imageUrl', 'baseRate', 'gachaWeight', 'width', 'height', 'bytes', 'contentHash')
+
+
+def ts_record(s: dict) -> str:
+    """ALL_STICKERS の要素1件（JSON.parse するテンプレート文字列の中の1行）"""
+    values = dict(s, imageUrl=ts_image_url(s))
+    line = json.dumps({key: values.get(key) for key in TS_FIELDS},
+                      ensure_ascii=False, separators=(',', ':'))
+    # テンプレート文字列の中なので \ ` ${ をエスケープする
+    return line.replace('\\', '\\\\').replace('`', '\\`').replace('${', '\\${')
+
+
+def alias_table(weights: list) -> tuple:
+    """
+    Vose のエイリアス法の抽選表を整数で作る
+
+    列 i を 1/n で選び、[0, total) の一様乱数が threshold[i] 未満なら i、
+    そうでなければ alias[i] を出すと、i が出る確率は weights[i] / sum(weights) に
+    ちょうど一致する（浮動小数の丸めがないので、同じ重みからは常に同じ表になる）。
+
+    Returns:
+        (threshold, alias, total)
+    """
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n for w in weights]
+    threshold = [total] * n
+    alias = list(range(n))
+    small = [i for i in range(n) if scaled[i] < total]
+    large = [i for i in range(n) if scaled[i] >= total]
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        threshold[less] = scaled[less]
+        alias[less] = more
+        scaled[more] += scaled[less] - total
+        (small if scaled[more] < total else large).append(more)
+    return threshold, alias, total
+
+
+def ts_gacha_table(positions: list, weights: list) -> str:
+    """GachaTable のリテラル（重み 0 のシールは表に入れない）"""
+    pool = [i for i in positions if weights[i] > 0]
+    threshold, alias, total = alias_table([weights[i] for i in pool])
+
+    def numbers(values):
+        return '[' + ', '.join(str(v) for v in values) + ']'
+
+    return (f"{{ indices: {numbers(pool)}, threshold: {numbers(threshold)}, "
+            f"alias: {numbers(alias)}, total: {total} }}")
+
+
+def ts_index_map(name: str, key_type: str, value_type: str, entries: dict) -> str:
+    """const NAME = new Map<K, V>([...])（entries の挿入順 = 初出順）"""
+    lines = [f"const {name} = new Map<{key_type}, {value_type}>(["]
+    for key, value in entries.items():
+        if isinstance(value, list):
+            value = '[' + ', '.join(str(v) for v in value) + ']'
+        lines.append(f"  [{ts_value(key)}, {value}],")
+    lines.append("])\n")
+    return '\n'.join(lines)
+
+
+class _ShardWriter(CatalogWriter):
+    """src/data/stickerSeries/series_NN.ts（1シリーズ分）"""
+
+    def __init__(self, path: str, series: str):
+        self.series = series
+        super().__init__(path)
+
+    def header(self) -> str:
+        return SHARD_HEADER.format(series=self.series)
+
+    def record(self, s: dict) -> str:
+        return ('' if self.count == 0 else ',\n') + ts_record(s)
+
+    def footer(self) -> str:
+        return SHARD_FOOTER
+
+
+class TsMasterWriter(CatalogWriter):
+    """
+    src/data/stickerMasterData.ts
+
+    レコードを流しながら ID / キャラクター / レアリティ / シリーズ / シールタイプの
+    索引（ALL_STICKERS の位置）を集め、フッターに Map のリテラルとして書く。
+    検索関数は filter / find で全件をなめずに索引を引く。
+
+    ガチャの抽選表（全体・シリーズ別・レアリティ別）もここで作る。
+
+    shard_dir を渡すとシリーズごとのモジュール（series_NN.ts）も書き、
+    loadStickersBySeries から動的 import できるようにする。渡さないときは、
+    前に --shards で書いた（もう参照されない）シャードを消す。
+    """
+
+    def __init__(self, path: str, shard_dir: str = None):
+        self.shard_dir = shard_dir
+        self.indexes = {'id': {}, 'character': {}, 'rarity': {}, 'series': {}, 'stickerType': {}}
+        self.weights = []
+        self.shards = {}
+        self.removed_shards = []
+        super().__init__(path)
+
+    def header(self) -> str:
+        return TS_HEADER
+
+    def record(self, s: dict) -> str:
+        position = self.count
+        self.indexes['id'][s['id']] = position
+        for key in ('character', 'rarity', 'series', 'stickerType'):
+            self.indexes[key].setdefault(s[key], []).append(position)
+        self.weights.append(s['gachaWeight'])
+        return ('' if position == 0 else ',\n') + ts_record(s)
+
+    def write(self, sticker: dict):
+        super().write(sticker)
+        if self.shard_dir is not None:
+            shard = self.shards.get(sticker['series'])
+            if shard is None:
+                os.makedirs(self.shard_dir, exist_ok=True)
+                path = os.path.join(self.shard_dir, f"series_{len(self.shards):02d}.ts")
+                shard = self.shards[sticker['series']] = _ShardWriter(path, sticker['series'])
+            shard.write(sticker)
+
+    def footer(self) -> str:
+        shard_entries = {}
+        relative = None
+        if self.shard_dir is not None:
+            relative = os.path.relpath(self.shard_dir, os.path.dirname(self.path))
+            relative = relative.replace(os.sep, '/')
+        for series, shard in self.shards.items():
+            module = os.path.splitext(os.path.basename(shard.path))[0]
+            shard_entries[series] = f"() => import('./{relative}/{module}').then((m) => m.default)"
+        return ''.join([
+            '\n]`)\n\n',
+            ts_index_map('ID_INDEX', 'string', 'number', self.indexes['id']),
+            '\n',
+            ts_index_map('CHARACTER_INDEX', 'string', 'number[]', self.indexes['character']),
+            '\n',
+            ts_index_map('RARITY_INDEX', 'number', 'number[]', self.indexes['rarity']),
+            '\n',
+            ts_index_map('SERIES_INDEX', 'string', 'number[]', self.indexes['series']),
+            '\n',
+            ts_index_map('STICKER_TYPE_INDEX', 'string', 'number[]', self.indexes['stickerType']),
+            '\n// シリーズ別のシャード（build_catalog.py --shards で生成）\n',
+            ts_index_map('SERIES_SHARDS', 'string', '() => Promise<StickerMaster[]>',
+                         shard_entries),
+            TS_GACHA_TABLES,
+            f"const GACHA_TABLE: GachaTable = "
+            f"{ts_gacha_table(range(len(self.weights)), self.weights)}\n\n",
+            ts_index_map('SERIES_GACHA_TABLES', 'string', 'GachaTable',
+                         {series: ts_gacha_table(positions, self.weights)
+                          for series, positions in self.indexes['series'].items()}),
+            '\n',
+            ts_index_map('RARITY_GACHA_TABLES', 'number', 'GachaTable',
+                         {rarity: ts_gacha_table(positions, self.weights)
+                          for rarity, positions in self.indexes['rarity'].items()}),
+            TS_LOOKUPS,
+            TS_GACHA,
+            TS_FOOTER,
+        ])
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self._remove_stale_shards()
+        super().close()
+
+    def _remove_stale_shards(self):
+        """シリーズが減ったときや --shards なしで作り直したときに残る古いシャードを消す"""
+        shard_dir = self.shard_dir
+        if shard_dir is None:
+            # マスターの隣の stickerSeries（--shards の書き出し先）
+            shard_dir = os.path.join(os.path.dirname(self.path), os.path.basename(SHARD_DIR))
+        if not os.path.isdir(shard_dir):
+            return
+        written = {os.path.basename(shard.path) for shard in self.shards.values()}
+        for name in sorted(os.listdir(shard_dir)):
+            if name.startswith('series_') and name.endswith('.ts') and name not in written:
+                os.remove(os.path.join(shard_dir, name))
+                self.removed_shards.append(name)
+        if self.shard_dir is None and not os.listdir(shard_dir):
+            os.rmdir(shard_dir)
+
+    def abort(self):
+        for shard in self.shards.values():
+            shard.abort()
+        super().abort()
+
+
+MIGRATION_HEADER = '''-- =============================================
+-- シールマスターデータの更新マイグレーション
+-- 全45キャラクター × 合計1,156枚のシールを追加
+-- =============================================
+
+-- 既存のシールマスターデータを削除（user_stickersとの関連は維持）
+-- 注意: user_stickersに存在しないsticker_idは外部キー制約違反になる可能性あり
+-- そのため、既存データはUPSERTで更新し、新規データのみINSERTする
+
+-- sticker_type カラムを追加（まだ存在しない場合）
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'stickers' AND column_name = 'sticker_type'
+  ) THEN
+    ALTER TABLE stickers ADD COLUMN sticker_type TEXT DEFAULT 'classic';
+  END IF;
+END;
+$$;
+
+-- 全シールデータの投入（UPSERT）
+'''
+
+MIGRATION_FOOTER = '''
+-- =============================================
+-- 完了メッセージ
+-- =============================================
+DO $$
+DECLARE
+  sticker_count INTEGER;
+BEGIN
+  SELECT COUNT(*) INTO sticker_count FROM stickers;
+  RAISE NOTICE 'シールマスターデータ更新完了！ 合計: % 枚', sticker_count;
+END;
+$$;
+'''
+
+UPSERT_COLUMNS = ('INSERT INTO stickers (id, name, image_url, rarity, type, series, '
+                  'base_rate, gacha_weight, sticker_type)')
+
+UPSERT_UPDATE = '''ON CONFLICT (id) DO UPDATE SET
+  name = EXCLUDED.name,
+  image_url = EXCLUDED.image_url,
+  rarity = EXCLUDED.rarity,
+  type = EXCLUDED.type,
+  series = EXCLUDED.series,
+  base_rate = EXCLUDED.base_rate,
+  gacha_weight = EXCLUDED.gacha_weight,
+  sticker_type = EXCLUDED.sticker_type,
+  updated_at = NOW();'''
+
+
+def sql_values(s: dict) -> str:
+    """1件分の VALUES の組"""
+    return (f"('{s['id']}', '{sql_text(s['name'])}', '{sql_image_url(s)}', {s['rarity']}, "
+            f"'{s['type']}', '{sql_text(s['series'])}', {s['baseRate']}, {s['gachaWeight']}, "
+            f"'{s['stickerType']}')")
+
+
+class MigrationWriter(CatalogWriter):
+    """supabase/migrations/024_seed_all_stickers.sql（1件ずつの UPSERT）"""
+
+    def header(self) -> str:
+        return MIGRATION_HEADER
+
+    def record(self, s: dict) -> str:
+        return f"{UPSERT_COLUMNS}\nVALUES {sql_values(s)}\n{UPSERT_UPDATE}\n"
+
+    def footer(self) -> str:
+        return MIGRATION_FOOTER
+
+
+class _BatchFile(CatalogWriter):
+    """バッチ SQL 1ファイル（batch_size 件をまとめた1つの UPSERT）"""
+
+    def header(self) -> str:
+        return f"{UPSERT_COLUMNS}\nVALUES\n"
+
+    def record(self, s: dict) -> str:
+        return ('' if self.count == 0 else ',\n') + sql_values(s)
+
+    def footer(self) -> str:
+        return f"\n{UPSERT_UPDATE}"
+
+
+class BatchWriter:
+    """
+    tools/sticker_batches/batch_NN.sql（batch_size 件ごとに次のファイルへ）
+
+    埋まったバッチも close() まで一時ファイルのままにしておき、最後に全部
+    まとめて置き換える。途中で失敗したら、どのバッチも書き換えない。
+    """
+
+    def __init__(self, batch_dir: str = BATCH_DIR, batch_size: int = BATCH_SIZE):
+        self.path = batch_dir
+        self.batch_size = batch_size
+        self.count = 0
+        self.files = 0
+        self._batches = []
+        os.makedirs(batch_dir, exist_ok=True)
+
+    def write(self, sticker: dict):
+        if not self._batches or self._batches[-1].count == self.batch_size:
+            if self._batches:
+                self._batches[-1].finish()
+            self._batches.append(_BatchFile(
+                os.path.join(self.path, f'batch_{self.files:02d}.sql')))
+            self.files += 1
+        self._batches[-1].write(sticker)
+        self.count += 1
+
+    def close(self):
+        try:
+            for batch in self._batches:
+                batch.finish()
+            for batch in self._batches:
+                batch.commit()
+        except BaseException:
+            self.abort()
+            raise
+        self._batches = []
+        # 件数が減ったときに残る古いバッチを消す
+        index = self.files
+        while os.path.isfile(os.path.join(self.path, f'batch_{index:02d}.sql')):
+            os.remove(os.path.join(self.path, f'batch_{index:02d}.sql'))
+            index += 1
+
+    def abort(self):
+        for batch in self._batches:
+            batch.abort()
+        self._batches = []
+
+
+def write_all(stickers, writers: list) -> int:
+    """
+    シールを1件ずつ全ての出力へ流す（1回の走査）
+
+    失敗したときは全ての出力の一時ファイルを捨てる。
+
+    Returns:
+        書いた件数
+    """
+    count = 0
+    try:
+        for sticker in stickers:
+            for writer in writers:
+                writer.write(sticker)
+            count += 1
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    for writer in writers:
+        writer.close()
+    return count
@@ -0,0 +1,146 @@
+"""
+Color Key - ルックアップテーブルによる背景色の透過
+
+背景かどうかの判定は (B, G, R) と設定だけで決まるので、全 1677万色の判定結果を
+一度だけ表にしておけば、各ピクセルは表を引くだけで済みます。BGRA の1ピクセルを
+リトルエンディアンの uint32 として読むと下位24ビットがそのまま表の番号になるため、
+チャンネルの分解も不要です。
+
+表は設定ごとにビット単位で詰めて（2 MB）ディスクにキャッシュし、同じプロセス内では
+メモリに保持します。グレー以外の背景（白・グリーンバック・ブルーバック）も
+同じ仕組みで扱えます。
+"""
+
+import functools
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_LUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '.cache', 'keys')
+
+# color は BGR。neutral の背景は「R,G,B の差がどれも NEUTRAL_SPREAD 未満」も条件にする
+KEY_PRESETS = {
+    'gray': {'color': (128, 128, 128), 'neutral': True},
+    'white': {'color': (255, 255, 255), 'neutral': True},
+    'green': {'color': (0, 255, 0), 'neutral': False},
+    'blue': {'color': (255, 0, 0), 'neutral': False},
+}
+NEUTRAL_SPREAD = 20
+
+# 表を引くときに一度に処理する行数
+_LUT_CHUNK_ROWS = 256
+
+
+def build_key_lut(color: tuple, tolerance: int, neutral: bool) -> np.ndarray:
+    """
+    全色の背景判定表を作る
+
+    番号 (R << 16) | (G << 8) | B の色が背景なら True。背景の条件は
+    各チャンネルが color ± tolerance の範囲にあること（neutral なら加えて
+    max(R,G,B) - min(R,G,B) < NEUTRAL_SPREAD）。
+    """
+    values = np.arange(256, dtype=np.int16)
+    in_b, in_g, in_r = (np.abs(values - c) <= tolerance for c in color)
+    # 軸の順を R, G, B にすると平らにしたときの番号が (R << 16) | (G << 8) | B になる
+    lut = in_r[:, None, None] & in_g[None, :, None] & in_b[None, None, :]
+    if neutral:
+        r = values[:, None, None]
+        g = values[None, :, None]
+        b = values[None, None, :]
+        spread = np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)
+        lut &= spread < NEUTRAL_SPREAD
+    return lut.ravel()
+
+
+@functools.lru_cache(maxsize=8)
+def load_key_lut(color: tuple, tolerance: int, neutral: bool,
+                 lut_dir: str = DEFAULT_LUT_DIR) -> np.ndarray:
+    """判定表をディスクキャッシュから読む（なければ作って保存する）"""
+    name = f"key_{color[0]}_{color[1]}_{color[2]}_t{tolerance}{'_n' if neutral else ''}.npy"
+    path = os.path.join(lut_dir, name) if lut_dir else None
+
+    if path and os.path.isfile(path):
+        try:
+            return np.unpackbits(np.load(path)).view(bool)
+        except (OSError, ValueError):
+            pass  # 壊れていれば作り直す
+
+    lut = build_key_lut(color, tolerance, neutral)
+    if path:
+        os.makedirs(lut_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.packbits(lut))
+        os.replace(temp_path, path)
+    return lut
+
+
+def resolve_key(preset: str = 'gray', color: tuple = None) -> tuple:
+    """プリセット名（と色の上書き）から (BGR の色, neutral) を決める"""
+    if preset not in KEY_PRESETS:
+        raise ValueError(f"不明なキー: {preset} ({', '.join(KEY_PRESETS)})")
+    config = KEY_PRESETS[preset]
+    return tuple(int(c) for c in (color or config['color'])), config['neutral']
+
+
+def check_key_input(img: np.ndarray):
+    """
+    判定表を引ける画像か確かめる（8ビットのグレー / BGR / BGRA）。違えば ValueError
+
+    表の番号は1ピクセル4バイトの BGRA を前提にしているので、16ビットの PNG
+    （IMREAD_UNCHANGED で読むと uint16）をそのまま通すと無関係な番号で引いてしまう。
+    """
+    if img.dtype != np.uint8:
+        raise ValueError(f"8ビットの画像にしか対応していません（{img.dtype}）。"
+                         f"16ビットの PNG は 8ビットに変換してください")
+    if img.ndim == 2 or (img.ndim == 3 and img.shape[2] in (1, 3, 4)):
+        return
+    raise ValueError(f"グレー / BGR / BGRA の画像にしか対応していません（形状 {img.shape}）")
+
+
+def apply_key_lut(img: np.ndarray, lut: np.ndarray, inplace: bool = False) -> np.ndarray:
+    """
+    判定表で背景のアルファを0にした BGRA 画像を返す
+
+    Args:
+        img: 8ビットのグレー / BGR / BGRA の画像
+        lut: build_key_lut / load_key_lut の表
+        inplace: True なら BGRA の入力のアルファをそのまま書き換える
+    """
+    check_key_input(img)
+    if img.ndim == 2 or img.shape[2] == 1:
+        result = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+    elif img.shape[2] == 3:
+        result = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    else:
+        result = img if inplace and img.flags.c_contiguous else img.copy()
+
+    for y in range(0, result.shape[0], _LUT_CHUNK_ROWS):
+        block = result[y:y + _LUT_CHUNK_ROWS]
+        # BGRA を uint32 として読むと B | G << 8 | R << 16 | A << 24
+        index = block.view('<u4')[:, :, 0] & 0xFFFFFF
+        block[:, :, 3][lut[index]] = 0
+
+    return result
+
+
+def key_background(img: np.ndarray, preset: str = 'gray', tolerance: int = 30,
+                   color: tuple = None, inplace: bool = False,
+                   lut_dir: str = DEFAULT_LUT_DIR) -> np.ndarray:
+    """
+    プリセットの背景色を透過させる
+
+    Args:
+        img: 8ビットのグレー / BGR / BGRA の画像（それ以外は ValueError）
+        preset: 'gray' / 'white' / 'green' / 'blue'
+        tolerance: 各チャンネルの許容範囲
+        color: 背景色 (B, G, R) の上書き（例: グレー値 100 なら (100, 100, 100)）
+        inplace: True なら BGRA の入力のアルファをそのまま書き換える
+        lut_dir: 判定表のキャッシュ先（None ならディスクに保存しない）
+    """
+    check_key_input(img)
+    key_color, neutral = resolve_key(preset, color)
+    lut = load_key_lut(key_color, int(tolerance), neutral, lut_dir)
+    return apply_key_lut(img, lut, inplace)
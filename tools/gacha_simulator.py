@@ -0,0 +1,251 @@
+"""
+Gacha Simulator - ガチャの排出率を Monte-Carlo で確かめる
+
+generated_stickers.json の gachaWeight から、stickerMasterData.ts と同じ
+エイリアス法の抽選表（catalog_writers.alias_table）を作り、NumPy で
+まとめて引きます。1億回以上の抽選をチャンクに分けてプロセスプールで並列に回し、
+次を表示します。
+
+    - レアリティ別の排出率: 理論値 / 実測値 / 95% 信頼区間、
+      stickerMasterData.ts のヘッダーに書いてある「約○%」との比較
+    - キャラクター別の排出率（理論値 / 実測値）
+    - コンプリートまでの期待回数（全シール・キャラクター別）:
+      ∫(1 - Π(1 - e^(-p t))) dt の数値積分と、実際に引き切るシミュレーション
+
+乱数は SeedSequence をチャンクごとに分けて使うので、並列数を変えても
+同じ --seed なら同じ結果になります。
+
+使い方:
+    python gacha_simulator.py [オプション]
+
+オプション:
+    --pulls              抽選回数 (デフォルト: 100000000)
+    --chunk              1チャンクの抽選回数 (デフォルト: 2000000)
+    --completion-trials  コンプリートまで引くシミュレーションの回数 (デフォルト: 200。0 で省略)
+    --seed               乱数のシード (デフォルト: 0)
+    --input              シールデータ (デフォルト: generated_stickers.json)
+    -j                   並列プロセス数 (デフォルト: CPU数)
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog_writers import JSON_PATH, TS_HEADER, alias_table
+
+DEFAULT_PULLS = 100_000_000
+DEFAULT_CHUNK = 2_000_000
+DEFAULT_COMPLETION_TRIALS = 200
+# 95% 信頼区間
+Z_95 = 1.959963984540054
+# コンプリートの抽選で1回に引く枚数
+COMPLETION_BLOCK = 1 << 16
+# ヘッダーの「// ★★★★★ (R5): レジェンド - 約3.3%」
+_CLAIM_PATTERN = re.compile(r'\(R(\d)\):.*?約([\d.]+)%')
+
+
+def load_pool(path: str) -> list:
+    """gachaWeight > 0 のシール（ガチャプール）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        stickers = json.load(f)
+    return [s for s in stickers if s['gachaWeight'] > 0]
+
+
+def build_table(pool: list) -> dict:
+    """抽選表を NumPy 配列で"""
+    threshold, alias, total = alias_table([s['gachaWeight'] for s in pool])
+    return {'threshold': np.array(threshold, dtype=np.int64),
+            'alias': np.array(alias, dtype=np.int64), 'total': total}
+
+
+def draw(table: dict, size: int, rng: np.random.Generator) -> np.ndarray:
+    """抽選表から size 回引いたプール内の位置（TS の drawFromTable と同じ手順）"""
+    n = len(table['threshold'])
+    column = rng.integers(0, n, size)
+    # random * total < threshold と同じことを整数でやる（丸め誤差なし）
+    accept = rng.integers(0, table['total'], size) < table['threshold'][column]
+    return np.where(accept, column, table['alias'][column])
+
+
+def _count_chunk(table: dict, size: int, seed) -> np.ndarray:
+    """1チャンク分を引いて、シールごとの回数を返す（プロセスプールで実行）"""
+    rng = np.random.default_rng(seed)
+    return np.bincount(draw(table, size, rng), minlength=len(table['threshold']))
+
+
+def _complete_once(table: dict, seed) -> int:
+    """全シールが揃うまで引いた回数（プロセスプールで実行）"""
+    rng = np.random.default_rng(seed)
+    n = len(table['threshold'])
+    seen = np.zeros(n, dtype=bool)
+    remaining = n
+    pulls = 0
+    while True:
+        block = draw(table, COMPLETION_BLOCK, rng)
+        items, first = np.unique(block, return_index=True)
+        new = ~seen[items]
+        if new.any():
+            seen[items[new]] = True
+            remaining -= int(new.sum())
+            if remaining == 0:
+                return pulls + int(first[new].max()) + 1
+        pulls += COMPLETION_BLOCK
+
+
+def simulate_counts(table: dict, pulls: int, chunk: int, seed: int,
+                    workers: int = None) -> np.ndarray:
+    """pulls 回引いたシールごとの回数"""
+    sizes = [chunk] * (pulls // chunk) + ([pulls % chunk] if pulls % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    counts = np.zeros(len(table['threshold']), dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for result in pool.map(_count_chunk, [table] * len(sizes), sizes, seeds):
+            counts += result
+    return counts
+
+
+def simulate_completion(table: dict, trials: int, seed: int, workers: int = None) -> np.ndarray:
+    """trials 回ぶんの「コンプリートまでの回数」"""
+    seeds = np.random.SeedSequence([seed, 1]).spawn(trials)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return np.array(list(pool.map(_complete_once, [table] * trials, seeds)))
+
+
+def expected_completion(probabilities: np.ndarray, steps: int = 200_000) -> float:
+    """
+    確率 probabilities の全種類を揃えるまでの期待回数（対象外のシールが出た回も数える）
+
+    E = ∫0^∞ (1 - Π(1 - e^(-p t))) dt を台形則で積分する。同じ確率のシールは
+    まとめて (1 - e^(-p t))^個数 にするので、確率の種類数ぶんの計算で済む。
+    """
+    values, counts = np.unique(probabilities, return_counts=True)
+    # 一番出にくいシールが揃わない確率が 1e-12 を下回るまで
+    end = (math.log(len(probabilities)) + 28) / values.min()
+    t = np.linspace(0, end, steps)
+    log_all = (counts[:, None] * np.log1p(-np.exp(-values[:, None] * t[1:]))).sum(axis=0)
+    integrand = np.concatenate([[1.0], -np.expm1(log_all)])
+    # 等間隔なので台形則は (両端の半分 + 内側の和) × 刻み幅
+    return float((integrand.sum() - (integrand[0] + integrand[-1]) / 2) * (t[1] - t[0]))
+
+
+def header_claims(header: str = TS_HEADER) -> dict:
+    """stickerMasterData.ts のヘッダーに書いてあるレアリティ別の率 {レアリティ: %}"""
+    return {int(r): float(rate) for r, rate in _CLAIM_PATTERN.findall(header)}
+
+
+def rate_interval(hits: int, pulls: int) -> tuple:
+    """実測率と 95% 信頼区間（Wilson）"""
+    if pulls == 0:
+        return 0.0, 0.0, 0.0
+    rate = hits / pulls
+    denominator = 1 + Z_95 ** 2 / pulls
+    center = (rate + Z_95 ** 2 / (2 * pulls)) / denominator
+    spread = math.sqrt(rate * (1 - rate) / pulls + Z_95 ** 2 / (4 * pulls ** 2))
+    half = Z_95 * spread / denominator
+    return rate, center - half, center + half
+
+
+def group_rates(pool: list, counts: np.ndarray, key: str) -> list:
+    """
+    key（'rarity' / 'character'）ごとの理論値と実測値
+
+    Returns:
+        [{'group', 'stickers', 'analytic', 'rate', 'low', 'high', 'inside'}, ...]
+    """
+    total_weight = sum(s['gachaWeight'] for s in pool)
+    pulls = int(counts.sum())
+    groups = {}
+    for i, s in enumerate(pool):
+        entry = groups.setdefault(s[key], {'weight': 0, 'hits': 0, 'stickers': 0})
+        entry['weight'] += s['gachaWeight']
+        entry['hits'] += int(counts[i])
+        entry['stickers'] += 1
+
+    rows = []
+    for group, entry in groups.items():
+        analytic = entry['weight'] / total_weight
+        rate, low, high = rate_interval(entry['hits'], pulls)
+        rows.append({'group': group, 'stickers': entry['stickers'], 'analytic': analytic,
+                     'rate': rate, 'low': low, 'high': high, 'inside': low <= analytic <= high})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Gacha Simulator - ガチャの排出率を Monte-Carlo で確かめる'
+    )
+    parser.add_argument('--pulls', type=int, default=DEFAULT_PULLS, help='抽選回数')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='1チャンクの抽選回数')
+    parser.add_argument('--completion-trials', type=int, default=DEFAULT_COMPLETION_TRIALS,
+                        help='コンプリートまで引くシミュレーションの回数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--input', default=JSON_PATH, help='シールデータ')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='並列プロセス数')
+    args = parser.parse_args()
+    if args.pulls < 1 or args.chunk < 1:
+        parser.error('--pulls と --chunk は1以上にしてください')
+
+    pool = load_pool(args.input)
+    if not pool:
+        parser.error(f'ガチャプールが空です: {args.input}')
+    table = build_table(pool)
+    total_weight = sum(s['gachaWeight'] for s in pool)
+    probabilities = np.array([s['gachaWeight'] / total_weight for s in pool])
+
+    start = time.perf_counter()
+    counts = simulate_counts(table, args.pulls, args.chunk, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"ガチャプール: {len(pool)}枚 (重みの合計 {total_weight})")
+    print(f"抽選: {args.pulls:,}回 ({elapsed:.1f}s, {args.pulls / elapsed / 1e6:.0f}M回/秒)")
+
+    claims = header_claims()
+    print("\nレアリティ別の排出率 (理論値 / 実測値 [95%信頼区間] / ヘッダーの記載)")
+    rarity_rows = sorted(group_rates(pool, counts, 'rarity'), key=lambda r: -r['group'])
+    for row in rarity_rows:
+        claim = claims.get(row['group'])
+        claim_text = '記載なし' if claim is None else f"約{claim}%"
+        mismatch = claim is not None and abs(claim - row['analytic'] * 100) >= 0.5
+        print(f"  R{row['group']} ({row['stickers']:>4}枚): {row['analytic'] * 100:7.3f}% / "
+              f"{row['rate'] * 100:7.3f}% [{row['low'] * 100:.3f}, {row['high'] * 100:.3f}] / "
+              f"{claim_text}{'  [差あり]' if mismatch else ''}"
+              f"{'' if row['inside'] else '  [区間外]'}")
+
+    print("\nキャラクター別の排出率 (理論値 / 実測値)")
+    character_rows = sorted(group_rates(pool, counts, 'character'),
+                            key=lambda r: (-r['analytic'], r['group']))
+    for row in character_rows:
+        print(f"  {row['group']}: {row['analytic'] * 100:6.3f}% / {row['rate'] * 100:6.3f}%"
+              f"{'' if row['inside'] else '  [区間外]'}")
+    outside = [r for r in rarity_rows + character_rows if not r['inside']]
+    print(f"  信頼区間の外: {len(outside)} / {len(rarity_rows) + len(character_rows)}"
+          f"（95% 区間なので、数個なら偶然の範囲）")
+
+    print("\nコンプリートまでの期待回数")
+    expected = expected_completion(probabilities)
+    print(f"  全{len(pool)}枚: {expected:,.0f}回 (理論値)")
+    if args.completion_trials > 0:
+        start = time.perf_counter()
+        trials = simulate_completion(table, args.completion_trials, args.seed, args.workers)
+        elapsed = time.perf_counter() - start
+        half = Z_95 * trials.std(ddof=1) / math.sqrt(len(trials)) if len(trials) > 1 else 0.0
+        print(f"  全{len(pool)}枚: {trials.mean():,.0f}回 ±{half:,.0f} (実測 {len(trials)}回, "
+              f"中央値 {np.median(trials):,.0f} / 90%点 {np.percentile(trials, 90):,.0f}, "
+              f"{elapsed:.1f}s)")
+
+    by_character = {}
+    for i, s in enumerate(pool):
+        by_character.setdefault(s['character'], []).append(i)
+    rows = sorted(((expected_completion(probabilities[indices]), name, len(indices))
+                   for name, indices in by_character.items()), reverse=True)
+    for value, name, size in rows:
+        print(f"  {name} ({size}枚): {value:,.0f}回")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 import json
 import os
 
+from catalog_writers import BASE_PATH, JSON_PATH, JsonWriter, write_all
+from sticker_metadata import enrich_records
+
+CHARACTERS_PATH = os.path.join(BASE_PATH, 'all_characters.json')
+
 # Character rarity assignments
 RARITY_CONFIG = {
     # Old format characters (original rarity)
@@ -61,23 +66,23 @@ RARITY_CONFIG = {
     'ふわもちパン': {'rarity': 1, 'type': 'normal', 'series': 'スイーツコレクション', 'baseRate': 20, 'gachaWeight': 55},
 }
 
-def main():
-    # Load character data
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG = {'rarity': 1, 'type': 'normal', 'series': 'その他コレクション', 'baseRate': 20, 'gachaWeight': 55}
 
-    with open(os.path.join(base_path, 'all_characters.json'), 'r', encoding='utf-8') as f:
-        characters = json.load(f)
 
-    # Generate sticker data
-    all_stickers = []
+def iter_sticker_records(characters: list, rarity_config: dict = RARITY_CONFIG):
+    """
+    all_characters.json の各キャラクターからシールのレコードを1件ずつ作る
 
+    リストに溜めずに yield するので、書き出し側（catalog_writers）と
+    組み合わせればシールの総数に関係なく1件分のメモリで済む。
+    """
     for char in characters:
         name = char['name']
-        config = RARITY_CONFIG.get(name)
+        config = rarity_config.get(name)
 
         if not config:
             print(f"Warning: No config for {name}, using default R1")
-            config = {'rarity': 1, 'type': 'normal', 'series': 'その他コレクション', 'baseRate': 20, 'gachaWeight': 55}
+            config = DEFAULT_CONFIG
 
         if char['format'] == 'old':
             # Old format: files directly in character folder
@@ -89,7 +94,7 @@ def main():
                 else:
                     file_name = f"{name}_{i}.png"
 
-                all_stickers.append({
+                yield {
                     'id': sticker_id,
                     'name': f"{name} #{i}",
                     'character': name,
@@ -103,7 +108,7 @@ def main():
                     'folder': name,
                     'fileName': file_name,
                     'format': 'old'
-                })
+                }
         else:
             # New format: ボンドロ and マシュマロ subfolders
             # ボンドロ stickers (1-15)
@@ -111,7 +116,7 @@ def main():
                 sticker_id = f"{name.lower()}-bondro-{i}"
                 file_name = f"{name}_{i}.png"
 
-                all_stickers.append({
+                yield {
                     'id': sticker_id,
                     'name': f"{name} ボンドロ#{i}",
                     'character': name,
@@ -126,7 +131,7 @@ def main():
                     'subfolder': 'ボンドロ',
                     'fileName': file_name,
                     'format': 'new'
-                })
+                }
 
             # マシュマロ stickers (16-30)
             for i in range(1, char['marshmallow_count'] + 1):
@@ -134,7 +139,7 @@ def main():
                 sticker_id = f"{name.lower()}-marshmallow-{i}"
                 file_name = f"{name}_{variant_num}.png"
 
-                all_stickers.append({
+                yield {
                     'id': sticker_id,
                     'name': f"{name} マシュマロ#{i}",
                     'character': name,
@@ -149,25 +154,37 @@ def main():
                     'subfolder': 'マシュマロ',
                     'fileName': file_name,
                     'format': 'new'
-                })
+                }
 
-    print(f"Total stickers generated: {len(all_stickers)}")
 
-    # Save to JSON
-    with open(os.path.join(base_path, 'generated_stickers.json'), 'w', encoding='utf-8') as f:
-        json.dump(all_stickers, f, ensure_ascii=False, indent=2)
-
-    print("Saved to generated_stickers.json")
-
-    # Print rarity distribution
-    rarity_counts = {}
-    for s in all_stickers:
+def count_rarities(stickers, rarity_counts: dict):
+    """シールをそのまま流しながらレアリティ別の枚数を数える"""
+    for s in stickers:
         r = s['rarity']
         rarity_counts[r] = rarity_counts.get(r, 0) + 1
+        yield s
+
 
+def print_rarity_distribution(rarity_counts: dict):
     print("\nRarity distribution:")
     for r in sorted(rarity_counts.keys(), reverse=True):
         print(f"  R{r}: {rarity_counts[r]} stickers")
 
+
+def main():
+    # Load character data
+    with open(CHARACTERS_PATH, 'r', encoding='utf-8') as f:
+        characters = json.load(f)
+
+    # Generate sticker data and save to JSON
+    rarity_counts = {}
+    records = count_rarities(enrich_records(iter_sticker_records(characters)), rarity_counts)
+    total = write_all(records, [JsonWriter(JSON_PATH)])
+
+    print(f"Total stickers generated: {total}")
+    print("Saved to generated_stickers.json")
+
+    print_rarity_distribution(rarity_counts)
+
 if __name__ == '__main__':
     main()
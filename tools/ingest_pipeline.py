@@ -0,0 +1,192 @@
+"""
+Ingest Pipeline - シート1枚をメモリ上で通して処理する
+
+    グレー背景除去 → リサイズ → シール切り出し → PNG エンコード
+
+remove_gray_bg.py → resize_for_stability.py → process_stickers.py と
+順に実行すると、段ごとに原寸の PNG を書いて次の段でまたデコードします。
+このパイプラインはシートを1回だけデコードし、各段は配列のまま受け渡し、
+PNG にするのは最後の切り出し画像だけです（途中の画像は --debug-dir を
+指定したときだけ保存）。段ごとの処理時間を表示します。
+
+外部サービスでの透過処理はローカルでは行えないため含みません。
+透過済みのシートには --no-key を付けてください。
+
+使い方:
+    python ingest_pipeline.py <入力画像> -o <出力ディレクトリ> [オプション]
+
+オプション:
+    --output, -o    出力ディレクトリ（必須）
+    --prefix, -p    ファイル名の接頭辞 (デフォルト: sticker)
+    --start-num     連番の開始番号 (デフォルト: 1、マシュマロは 16 など)
+    --key           背景の種類 gray / white / green / blue (デフォルト: gray)
+    --gray-value    背景のグレー値 (デフォルト: 128, --key gray のとき)
+    --tolerance     グレーの許容範囲 (デフォルト: 30)
+    --no-key        背景除去を行わない（透過済みのシート）
+    --no-resize     リサイズを行わない
+    --max-pixels    リサイズ後の最大ピクセル数 (デフォルト: 4194304)
+    --png-preset    PNG 圧縮プリセット fast / balanced / smallest
+    --debug-dir     途中の画像（背景除去後・リサイズ後）を保存する場所
+    --variants      切り出し画像からサイズ違いの WebP / AVIF も作る
+                    (例: webp / webp,avif、出力先は <出力ディレクトリ>/variants)
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+import cv2
+import numpy as np
+
+from png_encode import DEFAULT_PRESET, PNG_PRESETS, encode_png, encode_pngs
+from perf_utils import peak_rss_mb
+from process_stickers import DETECT_PARAMS, detect_and_extract_stickers
+from color_key import KEY_PRESETS, key_background
+from remove_gray_bg import transparency_ratio
+from resize_for_stability import MAX_PIXELS, resize_to_limit
+from sticker_variants import FORMATS, VARIANT_DIR, check_format, make_variants, variant_name
+from sync_writer import format_sync_summary, sync_dir, write_atomic
+
+
+class StageTimer:
+    """段ごとの処理時間 (ms) を記録する"""
+
+    def __init__(self):
+        self.timings = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.timings.append((name, (time.perf_counter() - start) * 1000))
+
+    def report(self) -> str:
+        total = sum(ms for _, ms in self.timings)
+        lines = [f"  {name:<12} {ms:>9.1f} ms" for name, ms in self.timings]
+        lines.append(f"  {'合計':<12} {total:>9.1f} ms")
+        return '\n'.join(lines)
+
+
+def _save_debug(debug_dir: str, name: str, image: np.ndarray):
+    """途中の画像を保存する（速さ優先の圧縮で）"""
+    if debug_dir:
+        os.makedirs(debug_dir, exist_ok=True)
+        write_atomic(os.path.join(debug_dir, name), encode_png(image, 'fast')['data'])
+
+
+def run_pipeline(input_path: str, output_dir: str, prefix: str = "sticker",
+                 start_num: int = 1, key: str = 'gray', gray_value: int = 128,
+                 tolerance: int = 30, resize: bool = True,
+                 max_pixels: int = MAX_PIXELS, params: dict = None,
+                 preset: str = DEFAULT_PRESET, debug_dir: str = None,
+                 variant_formats: tuple = ()) -> dict:
+    """
+    シートを読み込み、背景除去・リサイズ・切り出し・エンコードをメモリ上で行う
+
+    key は背景の種類（color_key.KEY_PRESETS、None なら背景除去をしない）。
+    切り出しは process_stickers と同じ検出（DETECT_PARAMS）で、出力フォルダへは
+    sync_writer で変わったファイルだけを書き込む。variant_formats を指定すると
+    メモリ上の切り出し画像から sticker_variants のサイズ違いも作る。
+
+    Returns:
+        {'count': シール数, 'timings': [(段, ms), ...], 'sync': sync_dir の結果,
+         'variants_sync': バリエーションの sync_dir の結果（作らなければ None）}
+    """
+    timer = StageTimer()
+
+    with timer.stage('デコード'):
+        image = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+    print(f"入力: {input_path} ({image.shape[1]}x{image.shape[0]})")
+
+    if key:
+        with timer.stage('背景除去'):
+            color = (gray_value,) * 3 if key == 'gray' else None
+            image = key_background(image, key, tolerance, color=color, inplace=True)
+        print(f"  背景除去: 透過率 {transparency_ratio(image)*100:.1f}%")
+        _save_debug(debug_dir, '01_keyed.png', image)
+
+    if resize:
+        with timer.stage('リサイズ'):
+            resized = resize_to_limit(image, max_pixels)
+        if resized is not image:
+            print(f"  リサイズ: {resized.shape[1]}x{resized.shape[0]}")
+            image = resized
+            _save_debug(debug_dir, '02_resized.png', image)
+
+    with timer.stage('切り出し'):
+        stickers = detect_and_extract_stickers(image, **(params or DETECT_PARAMS))
+    print(f"  検出数: {len(stickers)}個")
+
+    with timer.stage('エンコード'):
+        encoded = encode_pngs([s['image'] for s in stickers], preset)
+
+    with timer.stage('書き込み'):
+        filenames = [f"{prefix}_{i}.png"
+                     for i in range(start_num, start_num + len(stickers))]
+        summary = sync_dir(output_dir, dict(zip(filenames, [e['data'] for e in encoded])))
+    print(f"  出力: {output_dir} ({format_sync_summary(summary)})")
+
+    variants_summary = None
+    if variant_formats:
+        with timer.stage('バリエーション'):
+            variant_files = {}
+            for name, sticker in zip(filenames, stickers):
+                for v in make_variants(sticker['image'], formats=variant_formats):
+                    variant_files[variant_name(name, v['size'], v['format'])] = v['data']
+            variants_summary = sync_dir(
+                os.path.join(output_dir, VARIANT_DIR), variant_files,
+                extensions=tuple(FORMATS[f]['ext'] for f in FORMATS))
+        print(f"  バリエーション: {len(variant_files)}ファイル "
+              f"({format_sync_summary(variants_summary)})")
+
+    print(timer.report())
+    return {'count': len(stickers), 'timings': timer.timings, 'sync': summary,
+            'variants_sync': variants_summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Ingest Pipeline - 背景除去からシール切り出しまでをメモリ上で実行'
+    )
+    parser.add_argument('input', help='入力画像のパス')
+    parser.add_argument('-o', '--output', required=True, help='出力ディレクトリ')
+    parser.add_argument('-p', '--prefix', default='sticker', help='ファイル名の接頭辞')
+    parser.add_argument('--start-num', type=int, default=1, help='連番の開始番号')
+    parser.add_argument('--key', choices=list(KEY_PRESETS), default='gray',
+                        help='背景の種類')
+    parser.add_argument('--gray-value', type=int, default=128, help='背景のグレー値')
+    parser.add_argument('--tolerance', type=int, default=30, help='グレーの許容範囲')
+    parser.add_argument('--no-key', action='store_true', help='背景除去を行わない')
+    parser.add_argument('--no-resize', action='store_true', help='リサイズを行わない')
+    parser.add_argument('--max-pixels', type=int, default=MAX_PIXELS,
+                        help='リサイズ後の最大ピクセル数')
+    parser.add_argument('--png-preset', choices=list(PNG_PRESETS), default=DEFAULT_PRESET,
+                        help='PNG 圧縮プリセット(fast / balanced / smallest)')
+    parser.add_argument('--debug-dir', help='途中の画像を保存する場所')
+    parser.add_argument('--variants', default='',
+                        help='サイズ違いを作るフォーマット（webp / avif、カンマ区切り）')
+
+    args = parser.parse_args()
+    variant_formats = tuple(f.strip() for f in args.variants.split(',') if f.strip())
+    for fmt in variant_formats:
+        try:
+            check_format(fmt)
+        except ValueError as e:
+            parser.error(str(e))
+
+    result = run_pipeline(
+        args.input, args.output, prefix=args.prefix, start_num=args.start_num,
+        key=None if args.no_key else args.key, gray_value=args.gray_value,
+        tolerance=args.tolerance,
+        resize=not args.no_resize, max_pixels=args.max_pixels,
+        preset=args.png_preset, debug_dir=args.debug_dir,
+        variant_formats=variant_formats
+    )
+    print(f"\n完了！ {result['count']}個 (ピークメモリ: {peak_rss_mb():.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Optimize PNGs - 配布する PNG の可逆再圧縮
+
+public/stickers と public/covers の PNG を、見た目（デコード後のピクセル）を
+一切変えずに小さくします。アプリのバンドル・Capacitor アプリのサイズ削減用です。
+
+1枚ごとに次の候補を作り、一番小さいものを採用します:
+    - 色の表現を減らせるなら減らす（無劣化のときだけ）
+        アルファが全部 255 → アルファなし / B=G=R → グレー(+アルファ)
+        色数が 256 以下 → パレット（透過は tRNS）
+    - 行ごとのフィルター（なし / Paeth / 行ごとに最適）と
+      zlib の戦略の組み合わせ
+    - OpenCV の最大圧縮
+出力には画像に必要なチャンク（IHDR, PLTE, tRNS, IDAT, IEND）だけを書くので、
+テキスト・日時・色空間などのメタデータは落ちます。
+採用前に候補をデコードして元画像とピクセルが完全一致することを確かめ、
+元ファイルより小さいときだけ置き換えます（更新日時は元のまま）。
+
+使い方:
+    python optimize_pngs.py [フォルダ ...] [オプション]
+
+オプション:
+    フォルダ        対象のフォルダ (デフォルト: public/stickers public/covers)
+    --dry-run       ファイルを書き換えずに削減量だけ表示する
+    --workers, -j   並列プロセス数 (デフォルト: CPUコア数)
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import struct
+import zlib
+
+import cv2
+import numpy as np
+
+from batch_runner import run_batch
+from sync_writer import write_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROOTS = (
+    os.path.join(BASE_PATH, 'public', 'stickers'),
+    os.path.join(BASE_PATH, 'public', 'covers'),
+)
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG の色タイプ
+GRAY, RGB, PALETTE, GRAY_ALPHA, RGBA = 0, 2, 3, 4, 6
+
+# 試すフィルターの決め方（数字は全行同じフィルター、'adaptive' は行ごとに選ぶ）
+# シールでは Sub / Up / Average だけの固定が行ごとの選択に勝つことはなかったので省く。
+# なしはパレット画像で、Paeth は写真的な画像で勝つことがある
+FILTER_CHOICES = (0, 4, 'adaptive')
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def filter_rows(pixels: np.ndarray, bpp: int) -> np.ndarray:
+    """
+    5種類のフィルターを全行に一度にかける
+
+    PNG のフィルターはフィルター前の隣の値から予測するので、行をまたいだ
+    依存がなく、画像全体をまとめて計算できる。
+
+    Args:
+        pixels: (高さ, 1行のバイト数) の uint8
+        bpp: 1ピクセルのバイト数
+
+    Returns:
+        (5, 高さ, 1行のバイト数) の uint8。先頭の軸がフィルターの種類 0-4
+    """
+    x = pixels.astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]          # 左
+    b = np.zeros_like(x)
+    b[1:] = x[:-1]                     # 上
+    c = np.zeros_like(x)
+    c[1:, bpp:] = x[:-1, :-bpp]        # 左上
+
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+    predictions = (0, a, b, (a + b) >> 1, paeth)
+    return np.stack([(x - pred).astype(np.uint8) for pred in predictions])
+
+
+def _scanlines(filtered: np.ndarray, choice) -> bytes:
+    """フィルター済みの行に、行頭のフィルター番号を付けて並べる"""
+    if choice == 'adaptive':
+        # 行ごとに「符号付きで見た絶対値の合計」が最小のフィルターを選ぶ（libpng と同じ目安）
+        cost = np.abs(filtered.view(np.int8).astype(np.int32)).sum(axis=2)
+        kinds = cost.argmin(axis=0)
+        rows = filtered[kinds, np.arange(filtered.shape[1])]
+    else:
+        kinds = np.full(filtered.shape[1], choice)
+        rows = filtered[choice]
+    return np.hstack([kinds.astype(np.uint8)[:, None], rows]).tobytes()
+
+
+def write_png(pixels: np.ndarray, color_type: int, palette: bytes = None,
+              trns: bytes = None, choices: tuple = FILTER_CHOICES,
+              strategies: tuple = ZLIB_STRATEGIES) -> bytes:
+    """
+    8ビットの PNG を書く（フィルターと zlib 戦略の組み合わせで一番小さいもの）
+
+    Args:
+        pixels: (高さ, 幅, チャンネル数) の uint8。色の順は PNG と同じ（RGB / グレー / パレット番号）
+        color_type: GRAY / RGB / PALETTE / GRAY_ALPHA / RGBA
+        palette: PLTE の中身（RGB の並び）
+        trns: tRNS の中身（パレットのアルファ）
+    """
+    height, width, channels = pixels.shape
+    filtered = filter_rows(pixels.reshape(height, width * channels), channels)
+
+    best = None
+    for choice in choices:
+        raw = _scanlines(filtered, choice)
+        for strategy in strategies:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+            data = compressor.compress(raw) + compressor.flush()
+            if best is None or len(data) < len(best):
+                best = data
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    chunks = [_chunk(b'IHDR', ihdr)]
+    if palette is not None:
+        chunks.append(_chunk(b'PLTE', palette))
+    if trns:
+        chunks.append(_chunk(b'tRNS', trns))
+    chunks.append(_chunk(b'IDAT', best))
+    chunks.append(_chunk(b'IEND', b''))
+    return _PNG_SIGNATURE + b''.join(chunks)
+
+
+def to_bgra(image: np.ndarray) -> np.ndarray:
+    """比較用に BGRA にそろえる"""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    if image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return image
+
+
+def reductions(image: np.ndarray) -> list:
+    """
+    無劣化で表せる PNG の形式（パレット・グレー・アルファなしなど）を返す
+
+    Args:
+        image: cv2.imread(IMREAD_UNCHANGED) の 8ビット画像
+
+    Returns:
+        [(名前, PNG の並びのピクセル, 色タイプ, PLTE, tRNS), ...]
+    """
+    bgra = to_bgra(image)
+    height, width = bgra.shape[:2]
+    opaque = bool((bgra[:, :, 3] == 255).all())
+    b, g, r, alpha = (bgra[:, :, i] for i in range(4))
+    gray = bool((b == g).all() and (g == r).all())
+
+    candidates = []
+    # パレット: BGRA を uint32 にして色を数える
+    packed = bgra.view('<u4')[:, :, 0]
+    colors, index = np.unique(packed, return_inverse=True)
+    if len(colors) <= 256:
+        entries = colors.view(np.uint8).reshape(-1, 4)
+        # tRNS を短くできるよう、透過のある色を先に並べる
+        order = np.argsort(entries[:, 3] == 255, kind='stable')
+        remap = np.empty(len(order), dtype=np.uint8)
+        remap[order] = np.arange(len(order))
+        entries = entries[order]
+        translucent = int((entries[:, 3] < 255).sum())
+        candidates.append((
+            'palette', remap[index.reshape(height, width)][:, :, None], PALETTE,
+            entries[:, [2, 1, 0]].tobytes(), entries[:translucent, 3].tobytes()))
+
+    if gray:
+        if opaque:
+            candidates.append(('gray', b[:, :, None], GRAY, None, None))
+        else:
+            candidates.append(('gray_alpha', np.dstack([b, alpha]), GRAY_ALPHA, None, None))
+    elif opaque:
+        candidates.append(('rgb', np.dstack([r, g, b]), RGB, None, None))
+    else:
+        candidates.append(('rgba', np.dstack([r, g, b, alpha]), RGBA, None, None))
+    return candidates
+
+
+def optimize_png(data: bytes) -> dict:
+    """
+    PNG のバイト列を可逆に再圧縮する
+
+    Returns:
+        {'data': 一番小さいバイト列（元のままのこともある）, 'mode': 採用した形式,
+         'before', 'after': バイト数}
+    """
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError('PNG として読めません')
+    result = {'data': data, 'mode': 'original', 'before': len(data), 'after': len(data)}
+    if image.dtype != np.uint8:
+        return result  # 16ビットはそのまま
+
+    reference = to_bgra(image)
+    candidates = [(name, write_png(pixels, color_type, palette, trns))
+                  for name, pixels, color_type, palette, trns in reductions(image)]
+    ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if ok:
+        candidates.append(('opencv', encoded.tobytes()))
+
+    for name, candidate in sorted(candidates, key=lambda c: len(c[1])):
+        if len(candidate) >= result['after']:
+            break
+        decoded = cv2.imdecode(np.frombuffer(candidate, np.uint8), cv2.IMREAD_UNCHANGED)
+        if decoded is not None and np.array_equal(to_bgra(decoded), reference):
+            result.update(data=candidate, mode=name, after=len(candidate))
+            break
+    return result
+
+
+def optimize_file(path: str, dry_run: bool = False) -> dict:
+    """1ファイルを再圧縮し、小さくなったら置き換える（権限・更新日時は元のまま）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    result = optimize_png(data)
+    if result['after'] < result['before'] and not dry_run:
+        stat = os.stat(path)
+        write_atomic(path, result['data'])
+        os.chmod(path, stat.st_mode & 0o7777)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return {'mode': result['mode'], 'before': result['before'], 'after': result['after']}
+
+
+def collect_pngs(roots: list) -> list:
+    """フォルダ以下の PNG を (ルート, パス) で集める（名前順）"""
+    files = []
+    for root in roots:
+        for current, dirs, names in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d != 'variants')
+            files.extend((root, os.path.join(current, name))
+                         for name in sorted(names) if name.lower().endswith('.png'))
+    return files
+
+
+def group_name(root: str, path: str) -> str:
+    """レポートの集計単位（ルート直下のフォルダ = キャラクター）"""
+    relative = os.path.relpath(path, root).split(os.sep)
+    return '/'.join([os.path.basename(root)] + relative[:-1][:1])
+
+
+def size_report(rows: list) -> str:
+    """[(集計単位, 元バイト数, 後バイト数), ...] を表にする"""
+    groups = {}
+    for name, before, after in rows:
+        count, total_before, total_after = groups.get(name, (0, 0, 0))
+        groups[name] = (count + 1, total_before + before, total_after + after)
+
+    width = max([len(name) for name in groups] + [4])
+    lines = [f"  {'フォルダ':<{width - 2}} {'枚数':>4} {'前 (KB)':>10} {'後 (KB)':>10} {'削減':>6}"]
+    for name, (count, before, after) in sorted(groups.items()) + [
+            ('合計', (len(rows), sum(r[1] for r in rows), sum(r[2] for r in rows)))]:
+        saved = (1 - after / before) * 100 if before else 0.0
+        lines.append(f"  {name:<{width}} {count:>4} {before / 1024:>10.0f} "
+                     f"{after / 1024:>10.0f} {saved:>5.1f}%")
+    return '\n'.join(lines)
+
+
+def _optimize_job(path: str, dry_run: bool) -> dict:
+    """一括処理の1枚分（ワーカープロセスで実行）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return optimize_file(path, dry_run)
+
+
+def _describe(info: dict) -> str:
+    return f"{info['before'] / 1024:.0f} KB -> {info['after'] / 1024:.0f} KB ({info['mode']})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Optimize PNGs - PNG をピクセルを変えずに再圧縮する'
+    )
+    parser.add_argument('roots', nargs='*', default=list(DEFAULT_ROOTS),
+                        help='対象のフォルダ')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='ファイルを書き換えずに削減量だけ表示する')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='並列プロセス数(デフォルト: CPUコア数)')
+    args = parser.parse_args()
+
+    files = collect_pngs(args.roots)
+    if not files:
+        parser.error('PNG が見つかりません')
+
+    jobs = [(path, args.dry_run) for _, path in files]
+    results = run_batch(_optimize_job, jobs, args.workers, describe=_describe)
+
+    rows = [(group_name(root, path), r['result']['before'], r['result']['after'])
+            for (root, path), r in zip(files, results) if r['ok']]
+    print(f"\n{'削減できる量' if args.dry_run else '削減量'}:")
+    print(size_report(rows))
+
+    failed = [r for r in results if not r['ok']]
+    for r in failed:
+        print(f"  失敗: {r['args'][0]}: {r['error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+PNG Stream - PNG を行ストリップ単位で読み込むリーダー
+
+cv2.imread は画像全体を一度にデコードするため、16K 以上の印刷用シートでは
+RGBA バッファだけで 1GB を超えます。このモジュールは IDAT を zlib で少しずつ
+展開し、指定した行数ごとに cv2.imread(IMREAD_UNCHANGED) と同じ並び
+（BGR / BGRA / グレー）の配列を返します。メモリ使用量はストリップ 1 本分で済みます。
+
+対応: 非インターレースの PNG（全カラータイプ・全ビット深度）
+非対応: Adam7 インターレース（ValueError）
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# カラータイプ -> 1ピクセルあたりのサンプル数
+_SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# IDAT を読み進める単位（巨大な IDAT 1個でも一度に読まない）
+_READ_SIZE = 1 << 16
+
+
+class PngStripReader:
+    """
+    PNG を行ストリップ単位でデコードする
+
+    使い方:
+        with PngStripReader(path) as reader:
+            for y0, strip in reader.strips(256):
+                ...  # strip は (行数, 幅[, チャンネル]) の配列
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def channels(self) -> int:
+        """出力配列のチャンネル数（cv2.imread(IMREAD_UNCHANGED) と同じ）"""
+        if self.color_type == 3:
+            return self.palette.shape[1]
+        if self.color_type in (4, 6) or self.transparent is not None:
+            return 4
+        return 1 if self.color_type == 0 else 3
+
+    @property
+    def dtype(self):
+        return np.uint16 if self.bit_depth == 16 else np.uint8
+
+    def _read_chunk_header(self) -> tuple:
+        header = self._file.read(8)
+        if len(header) < 8:
+            raise ValueError(f"PNG が途中で終わっています: {self.path}")
+        length, chunk_type = struct.unpack('>I4s', header)
+        return length, chunk_type
+
+    def _read_header(self):
+        if self._file.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"PNG ファイルではありません: {self.path}")
+
+        palette = None
+        trns = None
+        self.palette = None
+        self.transparent = None
+
+        while True:
+            length, chunk_type = self._read_chunk_header()
+            if chunk_type == b'IDAT':
+                # IDAT の先頭で止めて、以降はストリーミングで読む
+                self._idat_remaining = length
+                break
+
+            data = self._file.read(length)
+            self._file.read(4)  # CRC
+
+            if chunk_type == b'IHDR':
+                (self.width, self.height, self.bit_depth, self.color_type,
+                 _, _, self.interlace) = struct.unpack('>IIBBBBB', data)
+            elif chunk_type == b'PLTE':
+                palette = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            elif chunk_type == b'tRNS':
+                trns = data
+            elif chunk_type == b'IEND':
+                raise ValueError(f"IDAT がありません: {self.path}")
+
+        if self.interlace:
+            raise ValueError(f"インターレース PNG はストリーミング非対応です: {self.path}")
+        if self.color_type not in _SAMPLES:
+            raise ValueError(f"未対応のカラータイプ: {self.color_type}")
+
+        bits_per_pixel = _SAMPLES[self.color_type] * self.bit_depth
+        self._row_bytes = (self.width * bits_per_pixel + 7) // 8
+        # フィルタが参照する左隣のバイト距離
+        self._filter_bpp = max(1, bits_per_pixel // 8)
+
+        if self.color_type == 3:
+            if palette is None:
+                raise ValueError(f"PLTE がありません: {self.path}")
+            # cv2 と同じ BGR(A) 順のパレットにしておく
+            bgr = palette[:, ::-1]
+            if trns is not None:
+                alpha = np.full(len(palette), 255, dtype=np.uint8)
+                alpha[:len(trns)] = np.frombuffer(trns, dtype=np.uint8)[:len(palette)]
+                self.palette = np.concatenate([bgr, alpha[:, None]], axis=1)
+            else:
+                self.palette = np.ascontiguousarray(bgr)
+        elif trns is not None and self.color_type in (0, 2):
+            # 単色透過（tRNS）は cv2 と同じくアルファに展開する
+            self.transparent = np.frombuffer(trns, dtype='>u2').astype(np.uint16)
+
+    def _compressed_pieces(self):
+        """IDAT の中身を少しずつ返す（複数の IDAT をまたいで連結）"""
+        while True:
+            while self._idat_remaining > 0:
+                piece = self._file.read(min(_READ_SIZE, self._idat_remaining))
+                if not piece:
+                    raise ValueError(f"IDAT が途中で終わっています: {self.path}")
+                self._idat_remaining -= len(piece)
+                yield piece
+            self._file.read(4)  # CRC
+
+            length, chunk_type = self._read_chunk_header()
+            if chunk_type != b'IDAT':
+                return
+            self._idat_remaining = length
+
+    def _inflated_pieces(self):
+        """展開済みのバイト列を一定サイズ以下ずつ返す（高圧縮の透明部分でも膨らまない）"""
+        inflater = zlib.decompressobj()
+        for data in self._compressed_pieces():
+            while True:
+                out = inflater.decompress(data, _READ_SIZE)
+                if out:
+                    yield out
+                data = inflater.unconsumed_tail
+                if not data and len(out) < _READ_SIZE:
+                    break
+        yield inflater.flush()
+
+    def _filtered_rows(self, rows: int):
+        """フィルタ種別付きの生の行を rows 行ずつ (行数, 1+row_bytes) で返す"""
+        stride = self._row_bytes + 1
+        remaining = self.height
+        buffer = bytearray()
+
+        for piece in self._inflated_pieces():
+            buffer += piece
+            while remaining and len(buffer) >= min(rows, remaining) * stride:
+                count = min(rows, remaining)
+                size = count * stride
+                block = np.frombuffer(bytes(buffer[:size]), dtype=np.uint8)
+                del buffer[:size]
+                remaining -= count
+                yield block.reshape(count, stride)
+            if not remaining:
+                return
+
+        raise ValueError(f"画像データが不足しています: {self.path}")
+
+    def strips(self, rows: int = 256):
+        """
+        (先頭の y 座標, ストリップ配列) を上から順に返す
+
+        ストリップ配列は cv2.imread(path, IMREAD_UNCHANGED) の該当行と同じ値・並び
+        """
+        prev = np.zeros(self._row_bytes, dtype=np.uint8)
+        y0 = 0
+        for block in self._filtered_rows(rows):
+            recon = unfilter_rows(block, prev, self._filter_bpp)
+            prev = recon[-1]
+            yield y0, self._to_pixels(recon)
+            y0 += len(recon)
+
+    def _to_pixels(self, recon: np.ndarray) -> np.ndarray:
+        """復元済みの行バイト列を cv2 と同じレイアウトの画素配列に変換"""
+        count = recon.shape[0]
+        samples = _SAMPLES[self.color_type]
+
+        if self.bit_depth < 8:
+            values = np.unpackbits(recon, axis=1)
+            values = values.reshape(count, -1, self.bit_depth)
+            weights = 1 << np.arange(self.bit_depth - 1, -1, -1, dtype=np.uint8)
+            values = (values * weights).sum(axis=2, dtype=np.uint8)[:, :self.width]
+            if self.color_type == 3:
+                return self.palette[values]
+            raw = values
+            # グレーの低ビット深度は 0-255 に伸長（libpng と同じ）
+            scale = 255 // ((1 << self.bit_depth) - 1)
+            gray = raw * np.uint8(scale)
+            if self.transparent is not None:
+                return _gray_to_bgra(gray, raw != self.transparent[0])
+            return gray
+
+        if self.bit_depth == 16:
+            pixels = recon.view('>u2').astype(np.uint16)
+        else:
+            pixels = recon
+        pixels = pixels.reshape(count, self.width, samples)
+
+        if self.color_type == 3:
+            return self.palette[pixels[:, :, 0]]
+        if self.color_type == 0:
+            gray = pixels[:, :, 0]
+            if self.transparent is not None:
+                return _gray_to_bgra(gray, gray != self.transparent[0])
+            return np.ascontiguousarray(gray)
+        if self.color_type == 4:
+            return _gray_to_bgra(pixels[:, :, 0], None, pixels[:, :, 1])
+        if self.color_type == 2:
+            bgr = pixels[:, :, ::-1]
+            if self.transparent is not None:
+                key = self.transparent[::-1]
+                opaque = np.any(bgr != key, axis=2)
+                alpha = np.where(opaque, np.iinfo(pixels.dtype).max, 0)
+                return np.concatenate([bgr, alpha[:, :, None].astype(pixels.dtype)], axis=2)
+            return np.ascontiguousarray(bgr)
+        # color_type 6: RGBA -> BGRA
+        return np.ascontiguousarray(pixels[:, :, [2, 1, 0, 3]])
+
+
+def _gray_to_bgra(gray: np.ndarray, opaque: np.ndarray = None,
+                  alpha: np.ndarray = None) -> np.ndarray:
+    out = np.empty(gray.shape + (4,), dtype=gray.dtype)
+    out[:, :, 0] = gray
+    out[:, :, 1] = gray
+    out[:, :, 2] = gray
+    if alpha is not None:
+        out[:, :, 3] = alpha
+    else:
+        out[:, :, 3] = np.where(opaque, np.iinfo(gray.dtype).max, 0)
+    return out
+
+
+def unfilter_rows(block: np.ndarray, prev: np.ndarray, bpp: int) -> np.ndarray:
+    """
+    PNG のフィルタを外して元のバイト列に戻す
+
+    Args:
+        block: (行数, 1+row_bytes) 先頭がフィルタ種別
+        prev: 直前の行（復元済み）。先頭行なら 0 埋め
+        bpp: 左隣として参照するバイト距離
+
+    None/Sub/Up だけの行は行単位のベクトル演算で復元する。Average/Paeth は
+    左隣に逐次依存するため、行方向をずらした斜めの波面（wavefront）で
+    ストリップ内の全行をまとめて 1 列ずつ復元する。
+    """
+    types = block[:, 0]
+    filtered = block[:, 1:]
+    count, row_bytes = filtered.shape
+
+    if types.max(initial=0) <= 2:
+        recon = np.empty_like(filtered)
+        for i in range(count):
+            line = filtered[i]
+            kind = types[i]
+            if kind == 0:
+                recon[i] = line
+            elif kind == 1:
+                pixels = line.reshape(-1, bpp)
+                recon[i] = np.cumsum(pixels, axis=0, dtype=np.uint8).ravel()
+            elif kind == 2:
+                recon[i] = line + prev
+            else:
+                raise ValueError(f"不正なフィルタ種別: {kind}")
+            prev = recon[i]
+        return recon
+
+    if types.max() > 4:
+        raise ValueError(f"不正なフィルタ種別: {types.max()}")
+    return _unfilter_wavefront(types, filtered, prev, bpp)
+
+
+def _unfilter_wavefront(types: np.ndarray, filtered: np.ndarray,
+                        prev: np.ndarray, bpp: int) -> np.ndarray:
+    """
+    行 j の画素 x を斜め座標 (j, x + j) に並べ替えて復元する
+
+    画素 (j, x) が参照する左 (j, x-1)・上 (j-1, x)・左上 (j-1, x-1) は
+    斜め座標ではすべて 1 つ前の列にあるため、列ごとに全行を同時に計算できる。
+    """
+    count, row_bytes = filtered.shape
+    pixels = row_bytes // bpp
+    lanes = count + 1
+    columns = pixels + count + 1
+
+    # lane 0 は直前の行、lane j (1..count) はストリップの j 行目。
+    # 列 x + j + 1 に配置し、x < 0 の部分は 0 のまま残す。
+    skew = np.zeros((lanes, columns, bpp), dtype=np.int16)
+    source = np.zeros((lanes, columns, bpp), dtype=np.int16)
+    skew[0, 1:pixels + 1] = prev.reshape(pixels, bpp)
+    for j in range(1, lanes):
+        source[j, j + 1:j + 1 + pixels] = filtered[j - 1].reshape(pixels, bpp)
+    kinds = types.astype(np.intp)[:, None]
+
+    for col in range(2, columns):
+        lo = max(1, col - pixels)
+        hi = min(count, col - 1)
+        if lo > hi:
+            continue
+        a = skew[lo:hi + 1, col - 1]
+        b = skew[lo - 1:hi, col - 1]
+        c = skew[lo - 1:hi, col - 2]
+
+        pa = np.abs(b - c)
+        pb = np.abs(a - c)
+        pc = np.abs(a + b - c - c)
+        paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+        kind = kinds[lo - 1:hi]
+        predictor = np.choose(kind, (0, a, b, (a + b) >> 1, paeth))
+        skew[lo:hi + 1, col] = (source[lo:hi + 1, col] + predictor) & 0xFF
+
+    recon = np.empty((count, row_bytes), dtype=np.uint8)
+    for j in range(1, lanes):
+        recon[j - 1] = skew[j, j + 1:j + 1 + pixels].ravel()
+    return recon
+
@@ -2,75 +2,30 @@
 しゅわぴーシール処理スクリプト
 """
 
-import cv2
 import numpy as np
 import os
-import shutil
-from collections import deque
 
-OUTPUT_BASE = r"C:\Users\elmod\Desktop\CursorApp\pokeseal\public\stickers"
-
-
-def flood_fill_find_bounds(start_x: int, start_y: int, alpha: np.ndarray,
-                           visited: np.ndarray, threshold: int) -> dict:
-    height, width = alpha.shape
-    min_x, max_x = start_x, start_x
-    min_y, max_y = start_y, start_y
-
-    queue = deque([(start_x, start_y)])
-    visited[start_y, start_x] = 1
-
-    neighbors = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+from sticker_detect import find_components, crop_components
+from png_encode import format_encode_stats
+from result_cache import load_or_extract
+from sticker_hash_index import check_new_stickers
+from sync_writer import format_sync_summary, merge_summaries, sync_dir
 
-    while queue:
-        x, y = queue.popleft()
-        min_x = min(min_x, x)
-        max_x = max(max_x, x)
-        min_y = min(min_y, y)
-        max_y = max(max_y, y)
-
-        for dx, dy in neighbors:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < width and 0 <= ny < height:
-                if visited[ny, nx] == 0 and alpha[ny, nx] >= threshold:
-                    visited[ny, nx] = 1
-                    queue.append((nx, ny))
+OUTPUT_BASE = r"C:\Users\elmod\Desktop\CursorApp\pokeseal\public\stickers"
 
-    return {'x': min_x, 'y': min_y, 'w': max_x - min_x + 1, 'h': max_y - min_y + 1}
+# 検出パラメータ（結果キャッシュの鍵にも使う）
+DETECT_PARAMS = dict(threshold=10, min_size=100, padding=5, top_k=15)
+# 並び順の違う検出結果を区別するための名前
+DETECTOR = 'area_top_k'
 
 
 def detect_and_extract_stickers(image: np.ndarray, threshold: int = 10,
-                                 min_size: int = 100, padding: int = 5) -> list:
-    if image.shape[2] == 4:
-        alpha = image[:, :, 3]
-    else:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        alpha = np.where(gray < 250, 255, 0).astype(np.uint8)
-
-    height, width = alpha.shape
-    visited = np.zeros((height, width), dtype=np.uint8)
-    stickers = []
-
-    for y in range(height):
-        for x in range(width):
-            if visited[y, x] == 0 and alpha[y, x] >= threshold:
-                box = flood_fill_find_bounds(x, y, alpha, visited, threshold)
-
-                if box['w'] >= min_size and box['h'] >= min_size:
-                    x1 = max(0, box['x'] - padding)
-                    y1 = max(0, box['y'] - padding)
-                    x2 = min(width, box['x'] + box['w'] + padding)
-                    y2 = min(height, box['y'] + box['h'] + padding)
-
-                    sticker = image[y1:y2, x1:x2].copy()
-                    stickers.append({
-                        'image': sticker,
-                        'width': sticker.shape[1],
-                        'height': sticker.shape[0],
-                        'area': sticker.shape[0] * sticker.shape[1]
-                    })
-
-    stickers = sorted(stickers, key=lambda s: s['area'], reverse=True)[:15]
+                                 min_size: int = 100, padding: int = 5,
+                                 top_k: int = 15) -> list:
+    boxes = find_components(image, threshold, min_size)
+    stickers = crop_components(image, boxes, padding)
+
+    stickers = sorted(stickers, key=lambda s: s['area'], reverse=True)[:top_k]
     return stickers
 
 
@@ -85,51 +40,39 @@ def process_both(char_name: str, bondro_path: str, marshmallow_path: str):
     bondro_dir = os.path.join(char_dir, "ボンドロ")
     marsh_dir = os.path.join(char_dir, "マシュマロ")
 
-    # フォルダ削除・再作成
-    if os.path.exists(char_dir):
-        print(f"[DELETE] {char_dir}")
-        shutil.rmtree(char_dir)
-    os.makedirs(bondro_dir, exist_ok=True)
-    os.makedirs(marsh_dir, exist_ok=True)
-
     # ボンドロ処理
     print(f"\n[BONDRO] {bondro_path}")
-    bondro_img = cv2.imread(bondro_path, cv2.IMREAD_UNCHANGED)
-    if bondro_img is None:
-        raise FileNotFoundError(f"Cannot read: {bondro_path}")
-
-    bondro_stickers = detect_and_extract_stickers(bondro_img)
-    print(f"[DETECT] {len(bondro_stickers)} stickers")
-
-    for i, sticker in enumerate(bondro_stickers, 1):
-        filename = f"{char_name}_{i}.png"
-        filepath = os.path.join(bondro_dir, filename)
-        is_success, buffer = cv2.imencode('.png', sticker['image'])
-        if is_success:
-            with open(filepath, 'wb') as f:
-                f.write(buffer)
-        print(f"   OK: {filename}")
+    bondro_stickers, cached = load_or_extract(bondro_path, detect_and_extract_stickers,
+                                              DETECT_PARAMS, DETECTOR)
+    print(f"[DETECT] {len(bondro_stickers)} stickers{' (キャッシュ)' if cached else ''}")
+
+    filenames = [f"{char_name}_{i}.png" for i in range(1, len(bondro_stickers) + 1)]
+    files = dict(zip(filenames, [s['data'] for s in bondro_stickers]))
+    bondro_sync = sync_dir(bondro_dir, files)
+    new_paths = [os.path.join(bondro_dir, name) for name in files]
+    for filename, sticker in zip(filenames, bondro_stickers):
+        print(f"   OK: {filename} ({sticker['bytes'] / 1024:.1f} KB, {sticker['ms']:.1f} ms)")
+    print(f"   PNG: {format_encode_stats(bondro_stickers)}")
 
     # マシュマロ処理
     print(f"\n[MARSHMALLOW] {marshmallow_path}")
-    marsh_img = cv2.imread(marshmallow_path, cv2.IMREAD_UNCHANGED)
-    if marsh_img is None:
-        raise FileNotFoundError(f"Cannot read: {marshmallow_path}")
-
-    marsh_stickers = detect_and_extract_stickers(marsh_img)
-    print(f"[DETECT] {len(marsh_stickers)} stickers")
+    marsh_stickers, cached = load_or_extract(marshmallow_path, detect_and_extract_stickers,
+                                             DETECT_PARAMS, DETECTOR)
+    print(f"[DETECT] {len(marsh_stickers)} stickers{' (キャッシュ)' if cached else ''}")
 
     start_num = len(bondro_stickers) + 1
-    for i, sticker in enumerate(marsh_stickers, start_num):
-        filename = f"{char_name}_{i}.png"
-        filepath = os.path.join(marsh_dir, filename)
-        is_success, buffer = cv2.imencode('.png', sticker['image'])
-        if is_success:
-            with open(filepath, 'wb') as f:
-                f.write(buffer)
-        print(f"   OK: {filename}")
+    filenames = [f"{char_name}_{i}.png"
+                 for i in range(start_num, start_num + len(marsh_stickers))]
+    files = dict(zip(filenames, [s['data'] for s in marsh_stickers]))
+    marsh_sync = sync_dir(marsh_dir, files)
+    new_paths += [os.path.join(marsh_dir, name) for name in files]
+    for filename, sticker in zip(filenames, marsh_stickers):
+        print(f"   OK: {filename} ({sticker['bytes'] / 1024:.1f} KB, {sticker['ms']:.1f} ms)")
+    print(f"   PNG: {format_encode_stats(marsh_stickers)}")
 
     print(f"\n[DONE] Total: {len(bondro_stickers) + len(marsh_stickers)} stickers")
+    print(f"[SYNC] {format_sync_summary(merge_summaries(bondro_sync, marsh_sync))}")
+    check_new_stickers(new_paths, OUTPUT_BASE)
     return len(bondro_stickers), len(marsh_stickers)
 
 
@@ -2,90 +2,333 @@
 Gray Background Remover - グレー背景除去ツール
 
 Gemini生成画像のグレー背景(#808080)を透過させます。
+--key で白・グリーンバック・ブルーバックの背景も透過できます（color_key の判定表を使用）。
+
+使い方:
+    python remove_gray_bg.py <入力画像> <出力画像> [グレー値] [許容範囲] [--key gray|white|green|blue]
+    python remove_gray_bg.py <画像/ディレクトリ/グロブ ...> -o <出力ディレクトリ> [オプション]   (一括処理)
+    python remove_gray_bg.py --benchmark <入力画像> [グレー値] [許容範囲]
+
+一括処理のオプション:
+    --workers, -j   並列プロセス数 (デフォルト: CPUコア数)
+    --gray-value    背景のグレー値 (デフォルト: 128)
+    --tolerance     許容範囲 (デフォルト: 30)
+    --force         出力が入力より新しい画像も処理し直す（デフォルトはスキップ）
 """
 
 import cv2
 import numpy as np
 import os
-import sys
+import argparse
+import time
+import tracemalloc
 
-def remove_gray_background(input_path: str, output_path: str,
-                           gray_value: int = 128, tolerance: int = 30):
+from batch_runner import expand_inputs, output_paths, run_batch
+from color_key import KEY_PRESETS, key_background
+
+# キーイングで一度に処理する行数（一時配列をこの行数分に抑える）
+_KEY_CHUNK_ROWS = 256
+
+
+def key_gray_background(img: np.ndarray, gray_value: int = 128,
+                        tolerance: int = 30, inplace: bool = False) -> np.ndarray:
     """
-    グレー背景を除去して透過PNGを作成
+    グレー背景のアルファを0にした BGRA 画像を返す（ファイルを介さない版）
+
+    背景の条件は「R,G,B がすべて gray_value±tolerance の範囲」かつ
+    「R,G,B の差がどれも20未満」。後者は max(R,G,B) - min(R,G,B) < 20 と同じなので、
+    行ブロックごとに uint8 のまま範囲判定と最大・最小を求め、アルファに直接書き込む
+    （int64 への変換やチャンネルの split/merge によるコピーをしない）。
 
     Args:
-        input_path: 入力画像パス
-        output_path: 出力画像パス
+        img: BGR または BGRA の画像
         gray_value: 背景のグレー値 (0-255, デフォルト128=#808080)
         tolerance: 許容範囲 (デフォルト30)
+        inplace: True なら BGRA の入力のアルファをそのまま書き換える
     """
-    print(f"\n入力: {input_path}")
+    # BGRからBGRAに変換（アルファチャンネル追加）
+    if img.shape[2] == 3:
+        result = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    else:
+        result = img if inplace else img.copy()
 
-    # 画像読み込み
-    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
-    if img is None:
-        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+    # グレー背景の条件: R≒G≒B かつ 値がgray_value付近
+    lower = (gray_value - tolerance,) * 3
+    upper = (gray_value + tolerance,) * 3
 
-    print(f"サイズ: {img.shape[1]}x{img.shape[0]}")
+    for y in range(0, result.shape[0], _KEY_CHUNK_ROWS):
+        block = result[y:y + _KEY_CHUNK_ROWS]
+        bgr = block[:, :, :3]
+        # 各チャンネルがグレー範囲内か（範囲外の境界値も inRange がそのまま扱う）
+        in_range = cv2.inRange(bgr, lower, upper)
+        # R,G,Bの差が小さい（グレーに近い）
+        spread = np.maximum(np.maximum(bgr[:, :, 0], bgr[:, :, 1]), bgr[:, :, 2])
+        spread -= np.minimum(np.minimum(bgr[:, :, 0], bgr[:, :, 1]), bgr[:, :, 2])
+        gray_mask = (spread < 20) & (in_range != 0)
+        # 背景部分のアルファを0に
+        block[:, :, 3][gray_mask] = 0
 
-    # BGRからBGRAに変換（アルファチャンネル追加）
+    return result
+
+
+def key_gray_background_reference(img: np.ndarray, gray_value: int = 128,
+                                  tolerance: int = 30) -> np.ndarray:
+    """従来の split / int 変換 / merge による実装（比較・ベンチマーク用）"""
     if img.shape[2] == 3:
         img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
 
-    # グレー背景のマスクを作成
-    # 各チャンネルがgray_value±toleranceの範囲にあるピクセルを検出
     b, g, r, a = cv2.split(img)
-
-    # グレー背景の条件: R≒G≒B かつ 値がgray_value付近
     lower = gray_value - tolerance
     upper = gray_value + tolerance
-
-    # 各チャンネルがグレー範囲内かチェック
     gray_mask = (
         (b >= lower) & (b <= upper) &
         (g >= lower) & (g <= upper) &
         (r >= lower) & (r <= upper) &
-        # R,G,Bの差が小さい（グレーに近い）
         (np.abs(r.astype(int) - g.astype(int)) < 20) &
         (np.abs(g.astype(int) - b.astype(int)) < 20) &
         (np.abs(r.astype(int) - b.astype(int)) < 20)
     )
-
-    # マスクを反転して背景を透過
-    # 背景部分のアルファを0に
     a[gray_mask] = 0
+    return cv2.merge([b, g, r, a])
+
+
+def benchmark_keying(img: np.ndarray, gray_value: int = 128, tolerance: int = 30,
+                     repeat: int = 3) -> dict:
+    """
+    従来実装・一括処理版・判定表版の速度と一時メモリのピークを比べる
+
+    一時メモリは tracemalloc で数える（NumPy / OpenCV の配列も含まれる）。
+    """
+    def measure(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(img, gray_value, tolerance)
+            best = min(best, time.perf_counter() - start)
+            del result
+        tracemalloc.start()
+        result = func(img, gray_value, tolerance)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return best, peak, result
+
+    def lut_keying(image, value, tol):
+        return key_background(image, 'gray', tol, color=(value,) * 3)
+
+    lut_keying(img[:1], gray_value, tolerance)  # 判定表の作成・読み込みは計測から除く
+
+    megapixels = img.shape[0] * img.shape[1] / 1e6
+    result = {}
+    for name, func in (('reference', key_gray_background_reference),
+                       ('fused', key_gray_background), ('lut', lut_keying)):
+        sec, peak, keyed = measure(func)
+        result[f'{name}_ms'] = sec * 1000
+        result[f'{name}_mpps'] = megapixels / sec
+        result[f'{name}_peak_mb'] = peak / 1024 / 1024
+        if name == 'reference':
+            reference = keyed
+        else:
+            result[f'{name}_match'] = np.array_equal(reference, keyed)
+    result['match'] = result['fused_match'] and result['lut_match']
+    return result
+
+
+def transparency_ratio(img: np.ndarray) -> float:
+    """アルファが0のピクセルの割合 (0-1)"""
+    alpha = img[:, :, 3]
+    return np.count_nonzero(alpha == 0) / alpha.size
+
+
+def key_file(input_path: str, output_path: str, gray_value: int = 128,
+             tolerance: int = 30, key: str = 'gray') -> dict:
+    """
+    1枚の背景を透過して保存する（表示なし）
+
+    Returns:
+        {'width', 'height', 'transparency': 透過率 (0-1)}
+    """
+    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
 
-    # 画像を再構成
-    result = cv2.merge([b, g, r, a])
+    color = (gray_value,) * 3 if key == 'gray' else None
+    result = key_background(img, key, tolerance, color=color, inplace=True)
 
     # 出力ディレクトリ作成
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
 
     # 保存
-    cv2.imwrite(output_path, result)
+    if not cv2.imwrite(output_path, result):
+        raise OSError(f"保存できません: {output_path}")
+
+    return {
+        'width': result.shape[1],
+        'height': result.shape[0],
+        'transparency': transparency_ratio(result),
+    }
+
+
+def remove_gray_background(input_path: str, output_path: str,
+                           gray_value: int = 128, tolerance: int = 30,
+                           key: str = 'gray'):
+    """
+    グレー背景を除去して透過PNGを作成
+
+    Args:
+        input_path: 入力画像パス
+        output_path: 出力画像パス
+        gray_value: 背景のグレー値 (0-255, デフォルト128=#808080, key='gray' のときのみ)
+        tolerance: 許容範囲 (デフォルト30)
+        key: 背景の種類（'gray' / 'white' / 'green' / 'blue'）
+    """
+    print(f"\n入力: {input_path}")
+
+    info = key_file(input_path, output_path, gray_value, tolerance, key)
+
+    print(f"サイズ: {info['width']}x{info['height']}")
     print(f"出力: {output_path}")
 
     # 透過率を表示
-    total_pixels = a.shape[0] * a.shape[1]
-    transparent_pixels = np.sum(a == 0)
-    print(f"透過率: {transparent_pixels/total_pixels*100:.1f}%")
+    print(f"透過率: {info['transparency']*100:.1f}%")
 
     return output_path
 
 
+def is_up_to_date(input_path: str, output_path: str) -> bool:
+    """出力が入力より新しければ True（処理をスキップしてよい）"""
+    return (os.path.isfile(output_path)
+            and os.path.getmtime(output_path) >= os.path.getmtime(input_path))
+
+
+def transparency_report(results: list, outlier: float = 0.15) -> list:
+    """
+    一括処理の結果を透過率の昇順に並べ、外れ値に印を付けた行のリストを返す
+
+    透過率が全体の中央値から outlier 以上離れているもの、またはほぼ透過して
+    いないもの（1%未満）を「要確認」とする。
+    """
+    done = [(r['args'][0], r['result']['transparency']) for r in results if r['ok']]
+    if not done:
+        return []
+    ratios = sorted(ratio for _, ratio in done)
+    median = ratios[len(ratios) // 2]
+
+    lines = [f"  中央値: {median*100:.1f}%"]
+    for path, ratio in sorted(done, key=lambda item: item[1]):
+        flag = '  <- 要確認' if abs(ratio - median) >= outlier or ratio < 0.01 else ''
+        bar = '#' * int(round(ratio * 20))
+        lines.append(f"  {ratio*100:5.1f}% {bar:<20} {os.path.basename(path)}{flag}")
+    return lines
+
+
+def remove_background_batch(input_paths: list, output_root: str, workers: int = None,
+                            gray_value: int = 128, tolerance: int = 30,
+                            key: str = 'gray', force: bool = False) -> list:
+    """
+    複数の画像の背景をプロセスプールで並列に透過し、<出力先>/<画像名>.png に保存する
+
+    出力が入力より新しい画像は force=False ならスキップする。
+
+    Returns:
+        run_batch の結果リスト（スキップしたものは含まない）
+    """
+    outputs = output_paths(input_paths, output_root, '.png')
+    jobs = []
+    skipped = []
+    for path, out in zip(input_paths, outputs):
+        if not force and os.path.isfile(path) and is_up_to_date(path, out):
+            skipped.append(path)
+        else:
+            jobs.append((path, out, gray_value, tolerance, key))
+
+    print(f"\n{'='*50}")
+    print(f"Gray Background Remover - 一括処理 ({len(jobs)}枚, スキップ {len(skipped)}枚, "
+          f"並列数: {workers or os.cpu_count()})")
+    print(f"{'='*50}\n")
+
+    start = time.perf_counter()
+    results = run_batch(key_file, jobs, workers,
+                        describe=lambda info: f"透過率 {info['transparency']*100:.1f}%")
+
+    failed = [r for r in results if not r['ok']]
+    print(f"\n{'='*50}")
+    print(f"完了！ {len(results) - len(failed)}/{len(results)}枚 "
+          f"({time.perf_counter() - start:.1f}s), スキップ {len(skipped)}枚")
+    report = transparency_report(results)
+    if report:
+        print("\n透過率:")
+        print('\n'.join(report))
+    for r in failed:
+        print(f"  失敗: {r['args'][0]}: {r['error']}")
+    print(f"{'='*50}\n")
+
+    return results
+
+
 def main():
-    if len(sys.argv) < 3:
-        print("使い方: python remove_gray_bg.py <入力画像> <出力画像> [グレー値] [許容範囲]")
-        print("例: python remove_gray_bg.py input.png output.png 128 30")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Gray Background Remover - 背景色を透過させる')
+    parser.add_argument('paths', nargs='+',
+                        help='<入力画像> <出力画像> [グレー値] [許容範囲]、'
+                             'または -o 指定時は入力（複数・ディレクトリ・グロブ可）')
+    parser.add_argument('-o', '--output-dir',
+                        help='一括処理の出力ディレクトリ（<画像名>.png で保存）')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='一括処理の並列プロセス数(デフォルト: CPUコア数)')
+    parser.add_argument('--gray-value', type=int, default=None,
+                        help='背景のグレー値 (デフォルト: 128)')
+    parser.add_argument('--tolerance', type=int, default=None,
+                        help='許容範囲 (デフォルト: 30)')
+    parser.add_argument('--key', choices=list(KEY_PRESETS), default='gray',
+                        help='背景の種類 (デフォルト: gray)')
+    parser.add_argument('--force', action='store_true',
+                        help='出力が入力より新しくても処理し直す')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='保存せずに、従来実装との速度・メモリを比較する')
+    args = parser.parse_args()
+
+    # 従来の位置引数 <入力> <出力> [グレー値] [許容範囲]
+    inputs = args.paths
+    positional = []
+    if not args.output_dir:
+        inputs, positional = args.paths[:1], args.paths[1:]
+        if args.benchmark:
+            positional = [None] + positional
+    try:
+        extra = [int(v) for v in positional[1:3]]
+    except ValueError:
+        parser.error('グレー値・許容範囲は整数で指定してください')
+    if len(positional) > 3:
+        parser.error('引数が多すぎます（複数の入力は -o で出力先を指定）')
+    gray_value = args.gray_value if args.gray_value is not None else (
+        extra[0] if len(extra) > 0 else 128)
+    tolerance = args.tolerance if args.tolerance is not None else (
+        extra[1] if len(extra) > 1 else 30)
+
+    if args.benchmark:
+        img = cv2.imread(inputs[0], cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise FileNotFoundError(f"画像を読み込めません: {inputs[0]}")
+        result = benchmark_keying(img, gray_value, tolerance)
+        print(f"画像サイズ: {img.shape[1]}x{img.shape[0]}")
+        for name, label in (('reference', '従来  '), ('fused', '一括処理'), ('lut', '判定表 ')):
+            print(f"  {label}: {result[name + '_ms']:8.1f} ms "
+                  f"({result[name + '_mpps']:6.1f} MP/s), "
+                  f"一時メモリ {result[name + '_peak_mb']:7.1f} MB")
+        print(f"  結果一致: {'OK' if result['match'] else 'NG'}")
+        return
+
+    if args.output_dir:
+        input_paths = expand_inputs(inputs)
+        if not input_paths:
+            parser.error('入力画像が見つかりません')
+        remove_background_batch(input_paths, args.output_dir, args.workers,
+                                gray_value, tolerance, args.key, args.force)
+        return
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
-    gray_value = int(sys.argv[3]) if len(sys.argv) > 3 else 128
-    tolerance = int(sys.argv[4]) if len(sys.argv) > 4 else 30
+    if not positional:
+        parser.error('出力画像を指定してください（複数の入力は -o で出力先を指定）')
 
-    remove_gray_background(input_path, output_path, gray_value, tolerance)
+    remove_gray_background(inputs[0], positional[0], gray_value, tolerance, args.key)
     print("\n完了!")
 
 
@@ -1,79 +1,217 @@
 """
 Stability AI用に画像をリサイズするスクリプト
 最大4,194,304ピクセル（約2048x2048）以内にリサイズ
+
+速く済ませるための近道:
+    - 制限内の PNG はデコードせずファイルをそのままコピーする
+      （サイズはヘッダーだけ読んで判定）
+    - 2倍以上縮小する JPEG は縮小デコード（IMREAD_REDUCED_*）してから仕上げる
+    - 補間方法を選べる（area: 縮小向きで速い / lanczos: 従来どおり）
+
+使い方:
+    python resize_for_stability.py <画像/ディレクトリ/グロブ ...> -o <出力ディレクトリ> [オプション]
+
+オプション:
+    --output, -o     出力ディレクトリ (デフォルト: 入力画像と同じ場所)
+                     <画像名>_resized.png で保存
+    --interpolation  補間方法 area / lanczos (デフォルト: lanczos)
+    --max-pixels     最大ピクセル数 (デフォルト: 4194304)
+    --no-reduced     JPEG の縮小デコードを使わない
+    --workers, -j    並列プロセス数 (デフォルト: CPUコア数)
 """
 
 import cv2
 import numpy as np
 import os
+import argparse
+import contextlib
+import io
+import shutil
 from pathlib import Path
 
+from batch_runner import expand_inputs, output_paths, run_batch
+from image_header import read_image_header
+
 MAX_PIXELS = 4_194_304  # Stability AI制限
 
-def resize_for_stability(input_path: str, output_path: str) -> str:
-    """画像をStability AI制限内にリサイズ"""
+INTERPOLATIONS = {
+    'area': cv2.INTER_AREA,
+    'lanczos': cv2.INTER_LANCZOS4,
+}
 
-    # 画像読み込み
-    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
-    if img is None:
-        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+_REDUCED_FLAGS = {
+    False: {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8},
+    True: {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+           8: cv2.IMREAD_REDUCED_GRAYSCALE_8},
+}
 
-    height, width = img.shape[:2]
-    current_pixels = height * width
 
-    print(f"入力: {input_path}")
-    print(f"  元サイズ: {width}x{height} = {current_pixels:,} pixels")
-
-    if current_pixels <= MAX_PIXELS:
-        print(f"  リサイズ不要（制限内）")
-        # そのままコピー
-        is_success, buffer = cv2.imencode('.png', img)
-        if is_success:
-            with open(output_path, 'wb') as f:
-                f.write(buffer)
-        return output_path
+def fit_size(width: int, height: int, max_pixels: int = MAX_PIXELS) -> tuple:
+    """max_pixels 以内に収まる (幅, 高さ)。収まっていればそのまま"""
+    current_pixels = width * height
+    if current_pixels <= max_pixels:
+        return width, height
 
     # リサイズ比率計算
-    scale = (MAX_PIXELS / current_pixels) ** 0.5
-    new_width = int(width * scale)
-    new_height = int(height * scale)
+    scale = (max_pixels / current_pixels) ** 0.5
+    return int(width * scale), int(height * scale)
+
 
-    print(f"  新サイズ: {new_width}x{new_height} = {new_width * new_height:,} pixels")
+def resize_to_limit(img: np.ndarray, max_pixels: int = MAX_PIXELS,
+                    interpolation: str = 'lanczos') -> np.ndarray:
+    """画像を max_pixels 以内に縮小する（制限内ならそのまま返す）"""
+    height, width = img.shape[:2]
+    new_width, new_height = fit_size(width, height, max_pixels)
+    if (new_width, new_height) == (width, height):
+        return img
+    return cv2.resize(img, (new_width, new_height),
+                      interpolation=INTERPOLATIONS[interpolation])
+
+
+def reduction_factor(width: int, height: int, new_width: int, new_height: int) -> int:
+    """縮小デコードに使える最大の縮小率（2, 4, 8。使えなければ 1）"""
+    for factor in (8, 4, 2):
+        # 縮小デコードの結果が最終サイズを下回らない（拡大にならない）こと
+        if width // factor >= new_width and height // factor >= new_height:
+            return factor
+    return 1
+
+
+def resize_file(input_path: str, output_path: str, max_pixels: int = MAX_PIXELS,
+                interpolation: str = 'lanczos', reduced_decode: bool = True) -> dict:
+    """
+    1枚をリサイズして PNG で保存する（表示なし）
+
+    Returns:
+        {'mode': 'copy' | 'encode' | 'resize' | 'reduced',
+         'width', 'height': 元サイズ, 'new_width', 'new_height': 出力サイズ}
+    """
+    if not os.path.isfile(input_path):
+        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
 
-    # リサイズ実行
-    resized = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+    header = read_image_header(input_path)
+    img = None
+    if header is None:
+        img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+        width, height = img.shape[1], img.shape[0]
+    else:
+        width, height = header['width'], header['height']
+
+    new_width, new_height = fit_size(width, height, max_pixels)
+    info = {'width': width, 'height': height,
+            'new_width': new_width, 'new_height': new_height}
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    if (new_width, new_height) == (width, height):
+        if header is not None and header['format'] == 'png':
+            # 制限内の PNG はデコード・再エンコードせずにそのままコピー
+            shutil.copyfile(input_path, output_path)
+            return dict(info, mode='copy')
+        mode = 'encode'
+        if img is None:
+            img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+            if img is None:
+                raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+        resized = img
+    else:
+        mode = 'resize'
+        factor = 1
+        if reduced_decode and header is not None and header['format'] == 'jpeg':
+            factor = reduction_factor(width, height, new_width, new_height)
+        if factor > 1 and header['channels'] in (1, 3):
+            # JPEG は libjpeg の縮小デコードで 1/factor のサイズを直接得る
+            flags = _REDUCED_FLAGS[header['channels'] == 1][factor]
+            img = cv2.imread(input_path, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+            mode = 'reduced'
+        elif img is None:
+            img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+        resized = cv2.resize(img, (new_width, new_height),
+                             interpolation=INTERPOLATIONS[interpolation])
 
     # 保存
     is_success, buffer = cv2.imencode('.png', resized)
-    if is_success:
-        with open(output_path, 'wb') as f:
-            f.write(buffer)
-        print(f"  出力: {output_path}")
+    if not is_success:
+        raise OSError(f"PNG エンコードに失敗しました: {input_path}")
+    with open(output_path, 'wb') as f:
+        f.write(buffer)
+    return dict(info, mode=mode)
 
-    return output_path
 
+def resize_for_stability(input_path: str, output_path: str,
+                         interpolation: str = 'lanczos',
+                         max_pixels: int = MAX_PIXELS,
+                         reduced_decode: bool = True) -> str:
+    """画像をStability AI制限内にリサイズ"""
 
-if __name__ == '__main__':
-    import sys
+    print(f"入力: {input_path}")
+    info = resize_file(input_path, output_path, max_pixels, interpolation,
+                       reduced_decode)
+
+    width, height = info['width'], info['height']
+    print(f"  元サイズ: {width}x{height} = {width * height:,} pixels")
 
-    # コマンドライン引数があれば使用、なければデフォルト
-    downloads = r"C:\Users\elmod\Downloads"
-    output_dir = r"C:\Users\elmod\Downloads\resized"
+    if info['mode'] in ('copy', 'encode'):
+        print(f"  リサイズ不要（制限内{'、そのままコピー' if info['mode'] == 'copy' else ''}）")
+        return output_path
+
+    new_width, new_height = info['new_width'], info['new_height']
+    print(f"  新サイズ: {new_width}x{new_height} = {new_width * new_height:,} pixels"
+          f"{'（縮小デコード）' if info['mode'] == 'reduced' else ''}")
+    print(f"  出力: {output_path}")
 
-    os.makedirs(output_dir, exist_ok=True)
+    return output_path
 
-    # しゅわぴー用の処理
-    images = [
-        ("Gemini_Generated_Image_3nd6dw3nd6dw3nd6.png", "shuwapii_bondro_resized.png"),
-        ("Gemini_Generated_Image_olbws0olbws0olbw.png", "shuwapii_marshmallow_resized.png"),
-    ]
 
-    for input_name, output_name in images:
-        input_path = os.path.join(downloads, input_name)
-        output_path = os.path.join(output_dir, output_name)
+def _resize_job(input_path: str, output_path: str, options: dict) -> dict:
+    """一括処理の1枚分（ワーカープロセスで実行）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return resize_file(input_path, output_path, **options)
+
+
+def _describe(info: dict) -> str:
+    labels = {'copy': 'コピー', 'encode': 'PNG化', 'resize': 'リサイズ',
+              'reduced': 'リサイズ(縮小デコード)'}
+    return (f"{info['width']}x{info['height']} -> {info['new_width']}x{info['new_height']} "
+            f"{labels[info['mode']]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Stability AI の制限内に画像をリサイズする'
+    )
+    parser.add_argument('input', nargs='+',
+                        help='入力画像のパス（複数・ディレクトリ・グロブ可）')
+    parser.add_argument('-o', '--output', help='出力ディレクトリ')
+    parser.add_argument('--interpolation', choices=list(INTERPOLATIONS), default='lanczos',
+                        help='補間方法(area / lanczos)')
+    parser.add_argument('--max-pixels', type=int, default=MAX_PIXELS,
+                        help='最大ピクセル数')
+    parser.add_argument('--no-reduced', action='store_true',
+                        help='JPEG の縮小デコードを使わない')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='並列プロセス数(デフォルト: CPUコア数)')
+    args = parser.parse_args()
+
+    input_paths = expand_inputs(args.input)
+    if not input_paths:
+        parser.error('入力画像が見つかりません')
+
+    options = dict(max_pixels=args.max_pixels, interpolation=args.interpolation,
+                   reduced_decode=not args.no_reduced)
+    outputs = output_paths(input_paths, args.output, '_resized.png')
+    jobs = [(path, out, options) for path, out in zip(input_paths, outputs)]
+    results = run_batch(_resize_job, jobs, args.workers, describe=_describe)
+
+    failed = [r for r in results if not r['ok']]
+    print(f"\n完了！ {len(results) - len(failed)}/{len(results)}枚")
+    for r in failed:
+        print(f"  失敗: {r['args'][0]}: {r['error']}")
 
-        try:
-            resize_for_stability(input_path, output_path)
-            print()
-        except Exception as e:
-            print(f"エラー: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Result Cache - キャラクター処理スクリプトの結果キャッシュ
+
+シート画像の内容ハッシュと検出パラメータ（threshold, min_size, padding, top_k）、
+検出方式、PNG プリセットから鍵を作り、検出したボックスとエンコード済みの
+シール PNG を保存します。同じ入力での再実行はハッシュの確認だけで終わり、
+検出もエンコードもしません。
+
+シート画像が変わると鍵が変わるので、そのシートのエントリだけが作り直されます
+（同じシート・同じパラメータの古いエントリは削除します）。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import cv2
+
+from png_encode import DEFAULT_PRESET, encode_pngs
+from sheet_cache import file_digest
+
+DEFAULT_RESULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  '.cache', 'results')
+
+# 検出・切り出しの結果が変わる修正をしたら上げる（古いエントリを無効にする）
+CACHE_VERSION = 1
+
+_MANIFEST = 'manifest.json'
+
+
+def load_or_extract(sheet_path: str, extract, params: dict, detector: str,
+                    preset: str = DEFAULT_PRESET,
+                    cache_dir: str = DEFAULT_RESULT_DIR) -> tuple:
+    """
+    キャッシュがあればそれを返し、なければ検出・エンコードして保存する
+
+    Args:
+        sheet_path: シート画像のパス
+        extract: extract(image, **params) -> crop_components 形式のリスト
+        params: extract に渡す検出パラメータ
+        detector: 検出方式の名前（並び順の違うスクリプトを区別する）
+        preset: PNG 圧縮プリセット
+        cache_dir: キャッシュ先（None ならキャッシュしない）
+
+    Returns:
+        (stickers, キャッシュを使ったか)
+        stickers は [{'x', 'y', 'width', 'height', 'area', 'data', 'bytes', 'ms'}, ...]
+        （'data' はエンコード済み PNG。png_encode.write_pngs でそのまま書ける）
+    """
+    if not os.path.isfile(sheet_path):
+        raise FileNotFoundError(f"画像を読み込めません: {sheet_path}")
+
+    source = os.path.normcase(os.path.abspath(sheet_path))
+    identity = {
+        'version': CACHE_VERSION,
+        'detector': detector,
+        'params': params,
+        'preset': preset,
+    }
+    key = hashlib.sha256(json.dumps(
+        dict(identity, sheet=file_digest(sheet_path)), sort_keys=True
+    ).encode('utf-8')).hexdigest()
+
+    if cache_dir:
+        stickers = _load_entry(os.path.join(cache_dir, key))
+        if stickers is not None:
+            return stickers, True
+
+    image = cv2.imread(sheet_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"画像を読み込めません: {sheet_path}")
+
+    crops = extract(image, **params)
+    encoded = encode_pngs([c['image'] for c in crops], preset)
+    stickers = []
+    for crop, result in zip(crops, encoded):
+        sticker = {k: crop[k] for k in ('x', 'y', 'width', 'height', 'area')}
+        sticker.update(result)
+        stickers.append(sticker)
+
+    if cache_dir:
+        _store_entry(cache_dir, key, dict(identity, source=source), stickers)
+    return stickers, False
+
+
+def _load_entry(entry_dir: str):
+    """エントリを読み、PNG のハッシュがすべて一致すれば stickers を返す"""
+    try:
+        with open(os.path.join(entry_dir, _MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+        stickers = []
+        for item in manifest['stickers']:
+            with open(os.path.join(entry_dir, item['file']), 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != item['sha256']:
+                return None
+            sticker = {k: item[k] for k in ('x', 'y', 'width', 'height', 'area')}
+            sticker.update(data=data, bytes=len(data), ms=0.0)
+            stickers.append(sticker)
+        return stickers
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _store_entry(cache_dir: str, key: str, identity: dict, stickers: list):
+    """一時ディレクトリに書いてから置き換え、同じシート・条件の古いエントリを消す"""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, key)
+    temp_dir = tempfile.mkdtemp(dir=cache_dir, suffix='.tmp')
+    try:
+        items = []
+        for i, sticker in enumerate(stickers, 1):
+            filename = f"{i}.png"
+            with open(os.path.join(temp_dir, filename), 'wb') as f:
+                f.write(sticker['data'])
+            item = {k: sticker[k] for k in ('x', 'y', 'width', 'height', 'area')}
+            item.update(file=filename, sha256=hashlib.sha256(sticker['data']).hexdigest())
+            items.append(item)
+
+        with open(os.path.join(temp_dir, _MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(dict(identity, stickers=items), f, indent=2, ensure_ascii=False)
+
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir)  # ハッシュ不一致などで壊れていたエントリ
+        os.replace(temp_dir, entry_dir)
+    finally:
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    _remove_superseded(cache_dir, key, identity)
+
+
+def _remove_superseded(cache_dir: str, key: str, identity: dict):
+    """シートの内容が変わる前の、同じパス・同じ条件のエントリを削除する"""
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if name == key or not os.path.isdir(entry_dir):
+            continue
+        try:
+            with open(os.path.join(entry_dir, _MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if all(manifest.get(k) == v for k, v in identity.items()):
+            shutil.rmtree(entry_dir, ignore_errors=True)
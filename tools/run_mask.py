@@ -0,0 +1,209 @@
+"""
+Run Mask - ランレングス表現のシールマスク
+
+アルファをしきい値で二値化したマスクを、行ごとの (開始x, 長さ) のランで
+保持します。シートの大半は透明なので、密な uint8/int32 配列の代わりに
+ランだけを持てばメモリもラベリングの手間も桁違いに小さくなります。
+
+ラベリングは上下の行で重なるラン同士をつなぐ（4近傍と同じ連結）ことで行い、
+各シールの正確なマスク・面積・バウンディングボックスを同じ構造から取り出せます。
+"""
+
+import numpy as np
+
+from sticker_detect import foreground_mask
+
+# マスク化するときに一度に処理する行数（一時配列の大きさを抑える）
+_CHUNK_ROWS = 256
+
+
+class RunMask:
+    """
+    行ごとのランで表した二値マスク
+
+    rows / starts / lengths はラスタ順（行→開始x）に並んだ同じ長さの配列。
+    ラン i は行 rows[i] の [starts[i], starts[i] + lengths[i]) を覆う。
+    """
+
+    def __init__(self, height: int, width: int, rows: np.ndarray,
+                 starts: np.ndarray, lengths: np.ndarray):
+        self.height = height
+        self.width = width
+        self.rows = rows
+        self.starts = starts
+        self.lengths = lengths
+        self._labels = None
+
+    @classmethod
+    def from_image(cls, image: np.ndarray, threshold: int = 10) -> 'RunMask':
+        """画像から detect_stickers と同じ判定（alpha >= threshold）でランを作る"""
+        height, width = image.shape[:2]
+        return cls.from_strips(
+            ((y, image[y:y + _CHUNK_ROWS])
+             for y in range(0, height, _CHUNK_ROWS)),
+            height, width, threshold)
+
+    @classmethod
+    def from_strips(cls, strips, height: int, width: int,
+                    threshold: int = 10) -> 'RunMask':
+        """行ストリップ（png_stream.PngStripReader.strips など）からランを作る"""
+        rows, starts, lengths = [], [], []
+        for y0, strip in strips:
+            r, s, n = _runs_of(foreground_mask(strip, threshold))
+            rows.append(r + y0)
+            starts.append(s)
+            lengths.append(n)
+
+        if not rows:
+            empty = np.zeros(0, dtype=np.int32)
+            return cls(height, width, empty, empty, empty)
+        return cls(height, width, np.concatenate(rows),
+                   np.concatenate(starts), np.concatenate(lengths))
+
+    @property
+    def nbytes(self) -> int:
+        """ランの保持に使っているバイト数"""
+        return self.rows.nbytes + self.starts.nbytes + self.lengths.nbytes
+
+    @property
+    def run_count(self) -> int:
+        return len(self.rows)
+
+    def to_dense(self) -> np.ndarray:
+        """密な 0/1 の uint8 マスクに戻す"""
+        return _paint(np.zeros((self.height, self.width), dtype=np.uint8),
+                      self.rows, self.starts, self.lengths)
+
+    def labels(self) -> np.ndarray:
+        """
+        ランごとの成分番号（0 始まり、ラスタ順で最初に現れた順）を返す
+
+        隣り合う行で x 範囲が重なるランを辺として、最小ラベルの伝播と
+        ポインタジャンプでまとめる。ピクセルではなくランの数だけ処理する。
+        """
+        if self._labels is not None:
+            return self._labels
+
+        upper, lower = self._overlapping_pairs()
+        parent = np.arange(self.run_count, dtype=np.int64)
+
+        while len(upper):
+            roots_u = parent[upper]
+            roots_l = parent[lower]
+            differ = roots_u != roots_l
+            if not differ.any():
+                break
+            roots_u = roots_u[differ]
+            roots_l = roots_l[differ]
+            low = np.minimum(roots_u, roots_l)
+            # 根を小さい方の根へつなぐ（番号は常に減る方向なので循環しない）
+            np.minimum.at(parent, roots_u, low)
+            np.minimum.at(parent, roots_l, low)
+            # ポインタジャンプで全ランを根まで縮める
+            while True:
+                jumped = parent[parent]
+                if np.array_equal(jumped, parent):
+                    break
+                parent = jumped
+
+        # 根はその成分の中でラスタ順最初のラン -> 根の昇順がそのまま発見順
+        _, labels = np.unique(parent, return_inverse=True)
+        self._labels = labels.astype(np.int32)
+        return self._labels
+
+    def components(self, min_size: int = 0) -> list:
+        """
+        成分ごとのバウンディングボックス・面積・重心を返す
+
+        形式と並び順は sticker_detect.find_components と同じ。
+        各要素には run_mask 内での成分番号 'label' も入る（component_mask 用）。
+        """
+        if self.run_count == 0:
+            return []
+
+        labels = self.labels()
+        count = int(labels.max()) + 1
+        ends = self.starts + self.lengths - 1
+        lengths = self.lengths.astype(np.float64)
+
+        area = np.bincount(labels, weights=lengths, minlength=count)
+        # 各ランの x 座標の合計 = 長さ × ランの中央
+        sum_x = np.bincount(labels, weights=lengths * (self.starts + ends) / 2,
+                            minlength=count)
+        sum_y = np.bincount(labels, weights=lengths * self.rows, minlength=count)
+
+        min_x = np.full(count, self.width, dtype=np.int64)
+        max_x = np.full(count, -1, dtype=np.int64)
+        min_y = np.full(count, self.height, dtype=np.int64)
+        max_y = np.full(count, -1, dtype=np.int64)
+        np.minimum.at(min_x, labels, self.starts)
+        np.maximum.at(max_x, labels, ends)
+        np.minimum.at(min_y, labels, self.rows)
+        np.maximum.at(max_y, labels, self.rows)
+
+        widths = max_x - min_x + 1
+        heights = max_y - min_y + 1
+        components = []
+        for label in np.nonzero((widths >= min_size) & (heights >= min_size))[0]:
+            components.append({
+                'x': int(min_x[label]),
+                'y': int(min_y[label]),
+                'w': int(widths[label]),
+                'h': int(heights[label]),
+                'area': int(area[label]),
+                'cx': float(sum_x[label] / area[label]),
+                'cy': float(sum_y[label] / area[label]),
+                'label': int(label),
+            })
+        return components
+
+    def component_mask(self, component: dict) -> np.ndarray:
+        """成分のバウンディングボックス内の正確なマスク（0/1 の uint8）を返す"""
+        selected = self.labels() == component['label']
+        mask = np.zeros((component['h'], component['w']), dtype=np.uint8)
+        return _paint(mask, self.rows[selected] - component['y'],
+                      self.starts[selected] - component['x'],
+                      self.lengths[selected])
+
+    def _overlapping_pairs(self) -> tuple:
+        """隣り合う行で x 範囲が重なるランの組 (上のラン, 下のラン) を列挙する"""
+        stride = np.int64(self.width + 1)
+        rows = self.rows.astype(np.int64)
+        start_keys = rows * stride + self.starts
+        end_keys = start_keys + self.lengths
+
+        # 下のラン [s, e) と重なる上の行のランは、ソート済み配列上で連続した範囲
+        # [終端 > s となる最初, 始端 < e となる最後] になる
+        above = (rows - 1) * stride
+        first = np.searchsorted(end_keys, above + self.starts, side='right')
+        last = np.searchsorted(start_keys, above + self.starts + self.lengths,
+                               side='left')
+        counts = np.maximum(last - first, 0)
+
+        lower = np.repeat(np.arange(self.run_count), counts)
+        offsets = np.arange(len(lower)) - np.repeat(np.cumsum(counts) - counts, counts)
+        upper = np.repeat(first, counts) + offsets
+        return upper, lower
+
+
+def _runs_of(mask: np.ndarray) -> tuple:
+    """0/1 マスクのストリップからランの (行, 開始x, 長さ) を取り出す"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return (rows.astype(np.int32), starts.astype(np.int32),
+            (ends - starts).astype(np.int32))
+
+
+def _paint(mask: np.ndarray, rows: np.ndarray, starts: np.ndarray,
+           lengths: np.ndarray) -> np.ndarray:
+    """ランを密なマスクに書き込む（差分を置いて行方向に累積和）"""
+    if len(rows) == 0:
+        return mask
+    delta = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=np.int32)
+    np.add.at(delta, (rows, starts), 1)
+    np.add.at(delta, (rows, starts + lengths), -1)
+    mask[:] = np.cumsum(delta, axis=1)[:, :-1] > 0
+    return mask
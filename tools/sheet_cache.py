@@ -0,0 +1,111 @@
+"""
+Sheet Cache - デコード済みシートのキャッシュ
+
+しきい値やパディングを変えて何度も切り出すとき、毎回同じ PNG を
+cv2.imread でデコードし直さずに済むよう、デコード結果を .npy（生の配列）で
+保存します。次回はファイル内容のハッシュで探し、np.load(mmap_mode='r') で
+メモリマップとして開くので、デコードも全体コピーも発生しません。
+
+キャッシュの合計サイズには上限があり、超えたら最後に使ってから
+時間が経ったものから削除します（LRU）。
+"""
+
+import hashlib
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '.cache', 'sheets')
+DEFAULT_MAX_MB = 2048
+
+
+def file_digest(path: str) -> str:
+    """ファイル内容の SHA-256（16進）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_sheet(path: str, cache_dir: str = DEFAULT_CACHE_DIR,
+               max_mb: int = DEFAULT_MAX_MB, alpha_only: bool = False) -> np.ndarray:
+    """
+    シートを読み込む。キャッシュにあればメモリマップで開き、なければデコードして保存する
+
+    Args:
+        path: 画像のパス
+        cache_dir: キャッシュディレクトリ
+        max_mb: キャッシュ全体の上限 (MB)
+        alpha_only: True ならアルファチャンネルだけを扱う（検出だけ試すとき用）
+
+    Returns:
+        cv2.imread(path, IMREAD_UNCHANGED) と同じ内容（alpha_only なら
+        そのアルファ面）の配列。キャッシュから開いた場合は読み取り専用
+    """
+    key = file_digest(path) + ('-alpha' if alpha_only else '')
+    cached = os.path.join(cache_dir, key + '.npy')
+
+    try:
+        image = np.load(cached, mmap_mode='r')
+        os.utime(cached)  # LRU のため最終使用時刻を更新
+        return image
+    except (FileNotFoundError, ValueError):
+        pass
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"画像を読み込めません: {path}")
+    if alpha_only:
+        if image.ndim != 3 or image.shape[2] != 4:
+            raise ValueError(f"アルファチャンネルがありません: {path}")
+        image = np.ascontiguousarray(image[:, :, 3])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # 別プロセスが同じシートを同時に書いても壊れないよう、一時ファイル経由で置き換える
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, image)
+        os.replace(temp_path, cached)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    evict(cache_dir, max_mb, keep=cached)
+    return image
+
+
+def evict(cache_dir: str, max_mb: int, keep: str = None) -> list:
+    """
+    合計が max_mb を超えていれば、使われていない順に削除する
+
+    Returns:
+        削除したファイルのパス
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.npy') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 * 1024
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # 別プロセスが削除済み、または使用中（Windows）
+        total -= size
+        removed.append(path)
+    return removed
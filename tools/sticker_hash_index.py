@@ -0,0 +1,283 @@
+"""
+Sticker Hash Index - 知覚ハッシュによる重複シールの検出
+
+シートを作り直して process_both / process_marshmallow_only を再実行すると、
+同じキャラクター内や別のキャラクターとの間で、ほとんど同じシールが
+できてしまうことがあります。全シール PNG の知覚ハッシュ（256ビットの pHash）を
+ディスクに保存し、BK木（ハミング距離の木）で近いものだけをたどるので、
+新しい切り出しを全カタログと数ミリ秒で照合できます。
+
+pHash は不透明な範囲に切り詰め、透過部分を白で塗ってからグレーにし、
+64x64 に縮小した DCT の低周波 16x16 を中央値で2値化したものです。
+ハッシュは (サイズ, 更新日時) が変わったファイルだけ計算し直します。
+
+使い方:
+    python sticker_hash_index.py [オプション]           全カタログの重複レポート
+    python sticker_hash_index.py <画像 ...> [オプション]  画像をカタログと照合
+
+オプション:
+    --max-distance  重複とみなすハミング距離 (デフォルト: 10)
+    --root          シール画像のフォルダ (デフォルト: public/stickers)
+    --index         インデックスの保存先 (デフォルト: tools/.cache/sticker_hashes.json)
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from sync_writer import write_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STICKERS_DIR = os.path.join(BASE_PATH, 'public', 'stickers')
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '.cache', 'sticker_hashes.json')
+# 低周波 16x16 = 256ビット。64ビットだと同じキャラの表情違いが距離 2〜4 になり、
+# 切り出し直したもの（距離 2 前後）と区別できない。256ビットなら切り出し直しが
+# 距離 6 前後、別のシール同士はカタログ全体で 26 以上離れる
+HASH_SIZE = 16
+ALPHA_THRESHOLD = 16
+DEFAULT_MAX_DISTANCE = 10
+INDEX_VERSION = 1
+
+
+def phash(image: np.ndarray) -> int:
+    """画像の 256ビット知覚ハッシュ"""
+    if image.ndim == 3 and image.shape[2] == 4:
+        # 切り出しの余白の違いで位置がずれないよう、不透明な範囲に切り詰める
+        ys, xs = np.nonzero(image[:, :, 3] > ALPHA_THRESHOLD)
+        if len(ys):
+            image = image[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+    if image.ndim == 2:
+        gray = image.astype(np.float32)
+    else:
+        color = image[:, :, :3].astype(np.float32)
+        if image.shape[2] == 4:
+            # 透過部分に残っている色に左右されないよう白の上に合成する
+            alpha = image[:, :, 3:4].astype(np.float32) / 255
+            color = color * alpha + 255 * (1 - alpha)
+        gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+
+    small = cv2.resize(gray, (HASH_SIZE * 4, HASH_SIZE * 4), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # 直流成分（明るさの平均）を除いた中央値で2値化
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """ハミング距離の BK木。距離 d 以内の検索では、三角不等式で枝を刈る"""
+
+    def __init__(self, items: list = ()):
+        self.root = None  # [ハッシュ, キーのリスト, {距離: 子}]
+        for value, key in items:
+            self.add(value, key)
+
+    def add(self, value: int, key: str):
+        if self.root is None:
+            self.root = [value, [key], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> list:
+        """距離 max_distance 以内の [(距離, キー), ...]（近い順）"""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, key) for key in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(results)
+
+
+class HashIndex:
+    """
+    public/stickers 以下の全 PNG のハッシュ
+
+    キーは root からの相対パス（/ 区切り）。ディスクには
+    {キー: [サイズ, 更新日時(ns), ハッシュ(16進)]} の JSON で保存する。
+    """
+
+    def __init__(self, root: str = STICKERS_DIR, index_path: str = DEFAULT_INDEX):
+        self.root = root
+        self.index_path = index_path
+        self.entries = {}
+        self._tree = None
+        if index_path and os.path.isfile(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('version') == INDEX_VERSION and saved.get('root') == root:
+                    self.entries = saved['entries']
+            except (OSError, ValueError, KeyError):
+                pass  # 壊れていれば作り直す
+
+    def refresh(self) -> dict:
+        """
+        フォルダと突き合わせて、変わったファイルだけハッシュを計算し直す
+
+        Returns:
+            {'hashed': 計算した枚数, 'removed': 消えた枚数}
+        """
+        seen = set()
+        hashed = 0
+        for current, dirs, names in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if d != 'variants')
+            for name in sorted(names):
+                if not name.lower().endswith('.png'):
+                    continue
+                path = os.path.join(current, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                stat = os.stat(path)
+                seen.add(key)
+                entry = self.entries.get(key)
+                if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                    continue
+                image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                if image is None:
+                    continue
+                digest = f"{phash(image):0{HASH_SIZE * HASH_SIZE // 4}x}"
+                self.entries[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                hashed += 1
+
+        removed = [key for key in self.entries if key not in seen]
+        for key in removed:
+            del self.entries[key]
+        if hashed or removed:
+            self._tree = None
+            self.save()
+        return {'hashed': hashed, 'removed': len(removed)}
+
+    def save(self):
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        data = {'version': INDEX_VERSION, 'root': self.root, 'entries': self.entries}
+        write_atomic(self.index_path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def hashes(self) -> dict:
+        return {key: int(entry[2], 16) for key, entry in self.entries.items()}
+
+    @property
+    def tree(self) -> BKTree:
+        if self._tree is None:
+            self._tree = BKTree((value, key) for key, value in self.hashes().items())
+        return self._tree
+
+    def query(self, image_or_hash, max_distance: int = DEFAULT_MAX_DISTANCE,
+              exclude: str = None) -> list:
+        """画像（またはハッシュ）に近いシールの [(距離, キー), ...]"""
+        value = image_or_hash if isinstance(image_or_hash, int) else phash(image_or_hash)
+        return [(d, key) for d, key in self.tree.search(value, max_distance) if key != exclude]
+
+    def duplicate_pairs(self, max_distance: int = DEFAULT_MAX_DISTANCE) -> list:
+        """カタログ全体で距離 max_distance 以内の組 [(距離, キー1, キー2), ...]"""
+        pairs = []
+        for key, value in sorted(self.hashes().items()):
+            for distance, other in self.tree.search(value, max_distance):
+                if other > key:
+                    pairs.append((distance, key, other))
+        return sorted(pairs)
+
+
+def check_new_stickers(paths: list, root: str, max_distance: int = DEFAULT_MAX_DISTANCE,
+                       index_path: str = DEFAULT_INDEX) -> list:
+    """
+    書き込んだばかりのシールを全カタログと照合し、似ているものを表示する
+
+    process_stickers などの出力後に呼ぶ。インデックスの更新（書き込んだ分の
+    ハッシュ計算）もここで行う。root の外のファイルは照合しない。
+
+    Returns:
+        [(距離, 新しいシールのキー, 似ているシールのキー), ...]
+    """
+    if not os.path.isdir(root):
+        return []
+    index = HashIndex(root, index_path)
+    index.refresh()
+
+    found = []
+    for path in paths:
+        key = os.path.relpath(path, root).replace(os.sep, '/')
+        if key not in index.entries:
+            continue
+        value = int(index.entries[key][2], 16)
+        found.extend((d, key, other) for d, other in index.query(value, max_distance, key))
+
+    print(f"   重複チェック: {len(paths)}枚を {len(index.entries)}枚と照合 → "
+          f"{'似ているシールなし' if not found else f'{len(found)}組が似ています'}")
+    for distance, key, other in found:
+        print(f"   [DUP?] {key} ≈ {other} (距離 {distance})")
+    return found
+
+
+def _group(key: str) -> str:
+    return key.split('/')[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sticker Hash Index - 知覚ハッシュで似ているシールを探す'
+    )
+    parser.add_argument('images', nargs='*', help='カタログと照合する画像')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help='重複とみなすハミング距離')
+    parser.add_argument('--root', default=STICKERS_DIR, help='シール画像のフォルダ')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help='インデックスの保存先')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = HashIndex(args.root, args.index)
+    refreshed = index.refresh()
+    print(f"インデックス: {len(index.entries)}枚 (計算 {refreshed['hashed']} / "
+          f"削除 {refreshed['removed']}, {time.perf_counter() - start:.1f}s)")
+
+    if args.images:
+        for path in args.images:
+            image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                print(f"  読み込めません: {path}")
+                continue
+            start = time.perf_counter()
+            matches = index.query(image, args.max_distance)
+            ms = (time.perf_counter() - start) * 1000
+            print(f"\n{path} ({ms:.1f} ms)")
+            for distance, key in matches:
+                print(f"  距離 {distance:>2}: {key}")
+            if not matches:
+                print("  似ているシールはありません")
+        return
+
+    pairs = index.duplicate_pairs(args.max_distance)
+    same = [p for p in pairs if _group(p[1]) == _group(p[2])]
+    print(f"\n似ている組: {len(pairs)}組 (同じキャラ {len(same)} / "
+          f"別のキャラ {len(pairs) - len(same)}, 距離 {args.max_distance} 以内)")
+    for distance, a, b in pairs:
+        label = '同じキャラ' if _group(a) == _group(b) else '別のキャラ'
+        print(f"  距離 {distance:>2} [{label}] {a} ≈ {b}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""
+Sticker Inventory - public/stickers からキャラクター一覧を作る
+
+all_characters.json の bondro_count / marshmallow_count / file_count は手で
+書いていたため、実際の public/stickers と食い違うことがありました。
+このスクリプトはシールのフォルダを os.scandir で並列に走査し、ファイルごとの
+サイズ・更新日時・SHA-256 を SQLite のインデックスに保存して、そこから
+all_characters.json を作り直します。
+
+2回目以降は、更新日時が変わったフォルダ（ファイルの追加・削除・名前変更が
+あったフォルダ）だけを読み直し、その中でもサイズか更新日時が変わった
+ファイルだけハッシュを計算し直します。変わっていなければフォルダの stat と
+SQLite の読み出しだけで終わるので数ミリ秒です。ファイルを同じ名前のまま
+上書きしてもフォルダの更新日時は変わらないので、その場合は --full を
+付けてください。
+
+使い方:
+    python sticker_inventory.py [オプション]
+
+オプション:
+    --root    シール画像のフォルダ (デフォルト: public/stickers)
+    --index   インデックスの保存先 (デフォルト: tools/.cache/sticker_inventory.sqlite)
+    --output  キャラクター一覧の出力先 (デフォルト: all_characters.json)
+    --full    全ファイルのサイズ・更新日時を確かめ直す
+    --check   書き出さずに、今の一覧との差分だけ表示する（差分があれば終了コード 1）
+    -j        並列数 (デフォルト: CPU数)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sync_writer import write_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STICKERS_DIR = os.path.join(BASE_PATH, 'public', 'stickers')
+CHARACTERS_PATH = os.path.join(BASE_PATH, 'all_characters.json')
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '.cache', 'sticker_inventory.sqlite')
+INDEX_VERSION = 1
+
+BONDRO_DIR = 'ボンドロ'
+MARSHMALLOW_DIR = 'マシュマロ'
+# sticker_variants.py の出力など、シール本体ではないフォルダ
+SKIP_DIRS = {'variants'}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+'''
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _join(parent: str, name: str) -> str:
+    """インデックスのキー（root からの相対パス、/ 区切り。root 自身は ''）"""
+    return f"{parent}/{name}" if parent else name
+
+
+def _scan_dir(root: str, rel: str, known: dict) -> dict:
+    """
+    フォルダ1つを読む（スレッドで並列に呼ばれる）
+
+    Args:
+        known: インデックスにある {ファイル名: (サイズ, 更新日時)}
+
+    Returns:
+        {'mtime_ns', 'subdirs': [名前], 'files': {名前: (サイズ, 更新日時, ハッシュ or None)}}
+        ハッシュが None のファイルは前回から変わっていない
+    """
+    path = os.path.join(root, rel) if rel else root
+    mtime_ns = os.stat(path).st_mtime_ns
+    subdirs = []
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                if entry.name not in SKIP_DIRS:
+                    subdirs.append(entry.name)
+            elif entry.is_file():
+                stat = entry.stat()
+                current = (stat.st_size, stat.st_mtime_ns)
+                digest = None if known.get(entry.name) == current else file_sha256(entry.path)
+                files[entry.name] = current + (digest,)
+    return {'mtime_ns': mtime_ns, 'subdirs': sorted(subdirs), 'files': files}
+
+
+class Inventory:
+    """public/stickers のファイル一覧の SQLite インデックス"""
+
+    def __init__(self, root: str = STICKERS_DIR, index_path: str = DEFAULT_INDEX):
+        self.root = root
+        self.index_path = index_path
+        if index_path != ':memory:':
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self.db = sqlite3.connect(index_path)
+        self.db.executescript(_SCHEMA)
+        meta = dict(self.db.execute('SELECT key, value FROM meta'))
+        if meta.get('version') != str(INDEX_VERSION) or meta.get('root') != root:
+            # 別のフォルダのインデックスや古い形式なら作り直す
+            with self.db:
+                self.db.execute('DELETE FROM dirs')
+                self.db.execute('DELETE FROM files')
+                self.db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                    [('version', str(INDEX_VERSION)), ('root', root)])
+
+    def close(self):
+        self.db.close()
+
+    def _known_files(self, rel: str) -> dict:
+        return {name: (size, mtime_ns) for name, size, mtime_ns in self.db.execute(
+            'SELECT name, size, mtime_ns FROM files WHERE dir = ?', (rel,))}
+
+    def _forget(self, rel: str):
+        """消えたフォルダとその下のエントリを削除する"""
+        pattern = rel.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
+        self.db.execute("DELETE FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'",
+                        (rel, pattern))
+        self.db.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                        (rel, pattern))
+
+    def refresh(self, full: bool = False, workers: int = None) -> dict:
+        """
+        フォルダと突き合わせてインデックスを更新する
+
+        上の階層から1段ずつ、更新日時が変わったフォルダだけを並列に読み直す。
+
+        Returns:
+            {'dirs': 確かめたフォルダ数, 'scanned': 読み直したフォルダ数,
+             'hashed': ハッシュを計算したファイル数, 'removed': 消えたファイル数}
+        """
+        stored = {path: (mtime_ns, json.loads(subdirs)) for path, mtime_ns, subdirs in
+                  self.db.execute('SELECT path, mtime_ns, subdirs FROM dirs')}
+        stats = {'dirs': 0, 'scanned': 0, 'hashed': 0, 'removed': 0}
+        workers = workers or os.cpu_count() or 1
+
+        level = [''] if os.path.isdir(self.root) else []
+        with ThreadPoolExecutor(max_workers=workers) as pool, self.db:
+            while level:
+                stats['dirs'] += len(level)
+                changed = []
+                next_level = []
+                for rel in level:
+                    path = os.path.join(self.root, rel) if rel else self.root
+                    try:
+                        mtime_ns = os.stat(path).st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+                    previous = stored.get(rel)
+                    if not full and previous and previous[0] == mtime_ns:
+                        next_level.extend(_join(rel, name) for name in previous[1])
+                    else:
+                        changed.append(rel)
+
+                jobs = [(rel, pool.submit(_scan_dir, self.root, rel, self._known_files(rel)))
+                        for rel in changed]
+                for rel, job in jobs:
+                    result = job.result()
+                    stats['scanned'] += 1
+                    self._apply(rel, result, stored.get(rel), stats)
+                    next_level.extend(_join(rel, name) for name in result['subdirs'])
+                level = next_level
+        return stats
+
+    def _apply(self, rel: str, result: dict, previous: tuple, stats: dict):
+        """_scan_dir の結果をインデックスに書く"""
+        if previous:
+            for name in set(previous[1]) - set(result['subdirs']):
+                self._forget(_join(rel, name))
+
+        known = self._known_files(rel)
+        for name in known.keys() - result['files'].keys():
+            self.db.execute('DELETE FROM files WHERE path = ?', (_join(rel, name),))
+            stats['removed'] += 1
+        for name, (size, mtime_ns, digest) in result['files'].items():
+            if digest is None:
+                continue
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                            (_join(rel, name), rel, name, size, mtime_ns, digest))
+            stats['hashed'] += 1
+        self.db.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)',
+                        (rel, result['mtime_ns'], json.dumps(result['subdirs'],
+                                                             ensure_ascii=False)))
+
+    def files(self, pattern: str = '%.png') -> list:
+        """[(相対パス, サイズ, 更新日時, SHA-256), ...]（パス順）"""
+        return self.db.execute(
+            'SELECT path, size, mtime_ns, sha256 FROM files WHERE name LIKE ? ORDER BY path',
+            (pattern,)).fetchall()
+
+    def lookup(self, paths: list) -> dict:
+        """{相対パス: (サイズ, 更新日時, SHA-256)}（インデックスにないパスは含まない）"""
+        found = {}
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            found.update((path, (size, mtime_ns, digest))
+                         for path, size, mtime_ns, digest in self.db.execute(
+                f"SELECT path, size, mtime_ns, sha256 FROM files "
+                f"WHERE path IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def update_files(self, entries: list):
+        """
+        [(相対パス, サイズ, 更新日時, SHA-256), ...] をインデックスに書く
+
+        同じ名前のまま上書きされたファイル（フォルダの更新日時が変わらないので
+        refresh では見つからない）を、呼び出し側が stat で見つけたときに使う。
+        """
+        with self.db:
+            for path, size, mtime_ns, digest in entries:
+                rel, _, name = path.rpartition('/')
+                self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                                (path, rel, name, size, mtime_ns, digest))
+
+    def characters(self) -> list:
+        """
+        all_characters.json と同じ形のキャラクター一覧
+
+        ボンドロ / マシュマロ のフォルダがあれば新フォーマット、
+        なければキャラクターのフォルダ直下の PNG を数える旧フォーマット。
+        """
+        counts = {}
+        for rel, count in self.db.execute(
+                "SELECT dir, COUNT(*) FROM files WHERE lower(name) LIKE '%.png' GROUP BY dir"):
+            counts[rel] = count
+
+        characters = []
+        subdirs = dict(self.db.execute("SELECT path, subdirs FROM dirs WHERE path = ''"))
+        for name in sorted(json.loads(subdirs.get('', '[]'))):
+            children = json.loads(self.db.execute(
+                'SELECT subdirs FROM dirs WHERE path = ?', (name,)).fetchone()[0])
+            if BONDRO_DIR in children or MARSHMALLOW_DIR in children:
+                bondro = counts.get(_join(name, BONDRO_DIR), 0)
+                marshmallow = counts.get(_join(name, MARSHMALLOW_DIR), 0)
+                characters.append({'name': name, 'format': 'new', 'bondro_count': bondro,
+                                   'marshmallow_count': marshmallow,
+                                   'total': bondro + marshmallow})
+            else:
+                file_count = counts.get(name, 0)
+                characters.append({'name': name, 'format': 'old', 'file_count': file_count,
+                                   'total': file_count})
+        return characters
+
+
+def scan_characters(root: str = STICKERS_DIR, index_path: str = DEFAULT_INDEX,
+                    full: bool = False, workers: int = None) -> list:
+    """インデックスを更新してキャラクター一覧を返す"""
+    inventory = Inventory(root, index_path)
+    try:
+        inventory.refresh(full, workers)
+        return inventory.characters()
+    finally:
+        inventory.close()
+
+
+def characters_json(characters: list) -> str:
+    """all_characters.json の中身（json.dump(indent=2) と同じ）"""
+    return json.dumps(characters, ensure_ascii=False, indent=2)
+
+
+def write_characters(path: str, characters: list) -> bool:
+    """
+    キャラクター一覧を書く。内容が同じなら書かない
+
+    Returns:
+        書き換えたか
+    """
+    data = characters_json(characters).encode('utf-8')
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    write_atomic(path, data)
+    return True
+
+
+def diff_characters(old: list, new: list) -> list:
+    """['もっちも: file_count 15 → 30', ...]"""
+    old_by_name = {c['name']: c for c in old}
+    new_by_name = {c['name']: c for c in new}
+    lines = []
+    for name in sorted(old_by_name.keys() | new_by_name.keys()):
+        before = old_by_name.get(name)
+        after = new_by_name.get(name)
+        if before is None:
+            lines.append(f"{name}: 追加 ({after['format']}, {after['total']}枚)")
+        elif after is None:
+            lines.append(f"{name}: フォルダなし")
+        else:
+            for key in sorted(before.keys() | after.keys()):
+                if key != 'total' and before.get(key) != after.get(key):
+                    lines.append(f"{name}: {key} {before.get(key)} → {after.get(key)}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sticker Inventory - public/stickers からキャラクター一覧を作る'
+    )
+    parser.add_argument('--root', default=STICKERS_DIR, help='シール画像のフォルダ')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help='インデックスの保存先')
+    parser.add_argument('--output', default=CHARACTERS_PATH, help='キャラクター一覧の出力先')
+    parser.add_argument('--full', action='store_true',
+                        help='全ファイルのサイズ・更新日時を確かめ直す')
+    parser.add_argument('--check', action='store_true',
+                        help='書き出さずに差分だけ表示する')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='並列数')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    inventory = Inventory(args.root, args.index)
+    try:
+        stats = inventory.refresh(args.full, args.workers)
+        characters = inventory.characters()
+        total_files = len(inventory.files())
+    finally:
+        inventory.close()
+    ms = (time.perf_counter() - start) * 1000
+
+    print(f"インデックス: {len(characters)}キャラ / {total_files}枚 ({ms:.1f} ms)")
+    print(f"  フォルダ {stats['dirs']} (読み直し {stats['scanned']}) / "
+          f"ハッシュ計算 {stats['hashed']} / 削除 {stats['removed']}")
+
+    old = []
+    if os.path.isfile(args.output):
+        with open(args.output, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+    changes = diff_characters(old, characters)
+    for line in changes:
+        print(f"  [差分] {line}")
+
+    if args.check:
+        if changes:
+            sys.exit(1)
+        print("差分なし")
+        return
+    if write_characters(args.output, characters):
+        print(f"書き出しました: {args.output}")
+    else:
+        print(f"変更なし: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Sticker Metadata - カタログのレコードに画像の寸法・バイト数・内容ハッシュを付ける
+
+画像はデコードせず、ヘッダー（PNG の IHDR、WebP / AVIF の各ヘッダー）だけを
+スレッドで並列に読みます。バイト数と SHA-256 は sticker_inventory の SQLite
+インデックスから取るので、変わっていないファイルは読み直しません。
+同じ名前のまま上書きされたファイルはフォルダの更新日時が変わらず refresh では
+見つからないため、レコードごとに stat してサイズか更新日時がインデックスと
+違えばハッシュを計算し直し、インデックスも更新します。
+アプリは width / height で読み込み前にレイアウトの場所を確保でき、
+contentHash でキャッシュを無効にできます。
+
+レコードは chunk 件ずつ処理して順番どおりに yield するので、
+build_catalog の1回の走査にそのまま挟めます。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from image_header import read_image_header
+from sticker_inventory import DEFAULT_INDEX, STICKERS_DIR, Inventory, file_sha256
+
+METADATA_KEYS = ('width', 'height', 'bytes', 'contentHash')
+CHUNK_SIZE = 256
+
+
+def sticker_rel_path(sticker: dict) -> str:
+    """public/stickers からの相対パス（/ 区切り）"""
+    parts = [sticker['folder']]
+    if sticker.get('subfolder'):
+        parts.append(sticker['subfolder'])
+    parts.append(sticker['fileName'])
+    return '/'.join(parts)
+
+
+def _read_file(path: str, known: tuple) -> tuple:
+    """
+    画像1枚の stat とヘッダー（スレッドで並列に呼ばれる）
+
+    Args:
+        known: インデックスの (サイズ, 更新日時, SHA-256)
+
+    Returns:
+        ((幅, 高さ) or None, サイズ, 更新日時, SHA-256, ハッシュを計算し直したか)
+        ファイルが読めなければ None
+    """
+    try:
+        stat = os.stat(path)
+        header = read_image_header(path)
+        current = (stat.st_size, stat.st_mtime_ns)
+        rehashed = current != known[:2]
+        digest = file_sha256(path) if rehashed else known[2]
+    except OSError:
+        return None
+    size = (header['width'], header['height']) if header else None
+    return (size,) + current + (digest, rehashed)
+
+
+def enrich_records(stickers, stickers_dir: str = STICKERS_DIR,
+                   index_path: str = DEFAULT_INDEX, workers: int = None,
+                   chunk_size: int = CHUNK_SIZE, missing: list = None):
+    """
+    シールのレコードに width / height / bytes / contentHash を足して1件ずつ返す
+
+    画像がないレコードは4つとも None（JSON では null）にし、
+    missing を渡していればその ID を追加する。
+    """
+    inventory = Inventory(stickers_dir, index_path)
+    try:
+        inventory.refresh(workers=workers)
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            chunk = []
+            for sticker in stickers:
+                chunk.append(sticker)
+                if len(chunk) == chunk_size:
+                    yield from _enrich_chunk(chunk, stickers_dir, inventory, pool, missing)
+                    chunk = []
+            yield from _enrich_chunk(chunk, stickers_dir, inventory, pool, missing)
+    finally:
+        inventory.close()
+
+
+def _enrich_chunk(chunk: list, stickers_dir: str, inventory: Inventory, pool,
+                  missing: list) -> list:
+    rel_paths = [sticker_rel_path(s) for s in chunk]
+    indexed = inventory.lookup(rel_paths)
+    targets = [rel for rel in rel_paths if rel in indexed]
+    results = dict(zip(targets, pool.map(
+        _read_file, [os.path.join(stickers_dir, *rel.split('/')) for rel in targets],
+        [indexed[rel] for rel in targets])))
+    # 上書きされていたファイルはインデックスも直しておく
+    inventory.update_files([(rel,) + result[1:4] for rel, result in results.items()
+                            if result and result[4]])
+
+    enriched = []
+    for sticker, rel in zip(chunk, rel_paths):
+        result = results.get(rel)
+        if result is None:
+            if missing is not None:
+                missing.append(sticker['id'])
+            size, file_bytes, digest = None, None, None
+        else:
+            size, file_bytes, _, digest, _ = result
+        width, height = size or (None, None)
+        enriched.append(dict(sticker, width=width, height=height,
+                             bytes=file_bytes, contentHash=digest))
+    return enriched
@@ -6,96 +6,99 @@ Gemini版と同等の機能をローカルで実行できます。
 
 使い方:
     python sticker_splitter.py <入力画像> [オプション]
+    python sticker_splitter.py <画像/ディレクトリ/グロブ ...> [オプション]   (一括処理)
 
 オプション:
     --output, -o    出力ディレクトリ (デフォルト: 入力画像と同じ場所)
+                    一括処理では <出力ディレクトリ>/<画像名>/ に保存
+    --workers, -j   一括処理の並列プロセス数 (デフォルト: CPUコア数)
     --prefix, -p    ファイル名の接頭辞 (デフォルト: sticker)
     --padding       余白のピクセル数 (デフォルト: 0)
     --threshold     アルファしきい値 1-254 (デフォルト: 10, 低いほど高感度)
     --min-size      最小サイズ (デフォルト: 20)
+    --stream        行ストリップ単位で読み込む省メモリモード (PNGのみ)
+    --strip-rows    ストリーミング時のストリップ行数 (デフォルト: 256)
+    --engine        ラベリング方式 cc=OpenCV / runs=ランレングス (デフォルト: cc)
+    --pyramid       縮小画像で候補を探し、候補周辺だけを原寸で検出するモード
+    --pyramid-factor  ピラミッドモードの縮小率 4 または 8 (デフォルト: 4)
+    --benchmark     切り出さずに、通常検出とピラミッド検出の速度を比較する
+    --cache [DIR]   デコード済みシートをキャッシュし、次回はデコードせずに開く
+                    (デフォルト: tools/.cache/sheets)
+    --cache-size    キャッシュ全体の上限 MB (デフォルト: 2048, 古いものから削除)
+    --png-preset    PNG 圧縮プリセット fast / balanced / smallest (デフォルト: balanced)
 """
 
 import cv2
 import numpy as np
 import os
 import argparse
+import contextlib
+import io
+import time
 from pathlib import Path
-from collections import deque
 
-
-def flood_fill_find_bounds(start_x: int, start_y: int, alpha: np.ndarray,
-                           visited: np.ndarray, threshold: int) -> dict:
-    """
-    フラッドフィル（BFS）で連結成分を探索し、バウンディングボックスを返す
-    """
-    height, width = alpha.shape
-    min_x, max_x = start_x, start_x
-    min_y, max_y = start_y, start_y
-
-    queue = deque([(start_x, start_y)])
-    visited[start_y, start_x] = 1
-
-    # 4方向の隣接ピクセル
-    neighbors = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-
-    while queue:
-        x, y = queue.popleft()
-
-        # バウンディングボックス更新
-        min_x = min(min_x, x)
-        max_x = max(max_x, x)
-        min_y = min(min_y, y)
-        max_y = max(max_y, y)
-
-        # 隣接ピクセルをチェック
-        for dx, dy in neighbors:
-            nx, ny = x + dx, y + dy
-
-            # 範囲チェック
-            if 0 <= nx < width and 0 <= ny < height:
-                if visited[ny, nx] == 0 and alpha[ny, nx] >= threshold:
-                    visited[ny, nx] = 1
-                    queue.append((nx, ny))
-
-    return {
-        'x': min_x,
-        'y': min_y,
-        'w': max_x - min_x + 1,
-        'h': max_y - min_y + 1
-    }
+from sticker_detect import (find_components, find_components_pyramid,
+                            find_components_streaming, crop_components_streaming)
+from run_mask import RunMask
+from png_stream import PngStripReader
+from perf_utils import peak_rss_mb
+from batch_runner import expand_inputs, output_paths, run_batch
+from sheet_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, load_sheet
+from png_encode import DEFAULT_PRESET, PNG_PRESETS, format_encode_stats, save_pngs
 
 
 def detect_stickers(image: np.ndarray, threshold: int = 10,
-                    min_size: int = 20) -> list:
+                    min_size: int = 20, engine: str = 'cc',
+                    pyramid_factor: int = 0) -> list:
     """
     画像内のシール（連結成分）を検出してバウンディングボックスのリストを返す
-    """
-    # アルファチャンネルを取得
-    if image.shape[2] == 4:
-        alpha = image[:, :, 3]
-    else:
-        # アルファチャンネルがない場合は白を透明として扱う
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        alpha = np.where(gray < 250, 255, 0).astype(np.uint8)
 
-    height, width = alpha.shape
-    visited = np.zeros((height, width), dtype=np.uint8)
-    boxes = []
+    各ボックスは x, y, w, h に加えて area（ピクセル数）と重心 cx, cy を持つ。
+    engine='runs' ではランレングスのマスク（run_mask.RunMask）でラベリングする。
+    pyramid_factor を指定すると、1/pyramid_factor の縮小マスクで候補を探してから
+    候補の周りだけを原寸で検出する（結果は通常検出と同じ）。
+    """
+    height, width = image.shape[:2]
 
     print(f"画像サイズ: {width}x{height}")
     print(f"しきい値: {threshold}, 最小サイズ: {min_size}px")
 
-    # 全ピクセルをスキャン
-    for y in range(height):
-        for x in range(width):
-            # 未訪問で、しきい値以上のアルファ値を持つピクセル
-            if visited[y, x] == 0 and alpha[y, x] >= threshold:
-                # 新しい島を発見
-                box = flood_fill_find_bounds(x, y, alpha, visited, threshold)
+    if pyramid_factor:
+        print(f"ピラミッド検出: 1/{pyramid_factor}")
+        boxes = find_components_pyramid(image, threshold, min_size, pyramid_factor)
+    elif engine == 'runs':
+        runs = RunMask.from_image(image, threshold)
+        print(f"ラン数: {runs.run_count:,} ({runs.nbytes / 1024:.0f} KB)")
+        boxes = runs.components(min_size)
+    else:
+        boxes = find_components(image, threshold, min_size)
 
-                # 最小サイズチェック
-                if box['w'] >= min_size and box['h'] >= min_size:
-                    boxes.append(box)
+    # 左上から右下の順にソート（読み順）
+    boxes.sort(key=lambda b: (b['y'] // 100, b['x']))
+
+    return boxes
+
+
+def detect_stickers_streaming(input_path: str, threshold: int = 10,
+                              min_size: int = 20, strip_rows: int = 256,
+                              engine: str = 'cc') -> list:
+    """
+    PNG を行ストリップ単位で読みながらシールを検出する（省メモリ版）
+
+    画像全体をデコードせず、ストリップごとのラベルを境目で統合して
+    バウンディングボックスだけを保持する。結果は detect_stickers と同じ。
+    """
+    with PngStripReader(input_path) as reader:
+        print(f"画像サイズ: {reader.width}x{reader.height} (ストリップ: {strip_rows}行)")
+        print(f"しきい値: {threshold}, 最小サイズ: {min_size}px")
+        if engine == 'runs':
+            runs = RunMask.from_strips(reader.strips(strip_rows), reader.height,
+                                       reader.width, threshold)
+            print(f"ラン数: {runs.run_count:,} ({runs.nbytes / 1024:.0f} KB)")
+            boxes = runs.components(min_size)
+        else:
+            boxes = find_components_streaming(reader.strips(strip_rows),
+                                              threshold, min_size)
 
     # 左上から右下の順にソート（読み順）
     boxes.sort(key=lambda b: (b['y'] // 100, b['x']))
@@ -103,6 +106,17 @@ def detect_stickers(image: np.ndarray, threshold: int = 10,
     return boxes
 
 
+def extract_stickers_streaming(input_path: str, boxes: list, padding: int = 0,
+                               strip_rows: int = 256) -> list:
+    """
+    PNG をもう一度ストリップ単位で読み、ボックスの範囲だけを切り出す
+    """
+    with PngStripReader(input_path) as reader:
+        stickers = crop_components_streaming(reader.strips(strip_rows), boxes,
+                                             reader.width, reader.height, padding)
+    return [s['image'] for s in stickers]
+
+
 def extract_stickers(image: np.ndarray, boxes: list, padding: int = 0) -> list:
     """
     検出したボックスからシール画像を切り出す
@@ -124,25 +138,63 @@ def extract_stickers(image: np.ndarray, boxes: list, padding: int = 0) -> list:
     return stickers
 
 
-def save_stickers(stickers: list, output_dir: str, prefix: str = "sticker"):
+def benchmark_detection(image: np.ndarray, threshold: int = 10,
+                        min_size: int = 20, factor: int = 4,
+                        repeat: int = 5) -> dict:
+    """
+    原寸の全面検出とピラミッド検出の所要時間を比較し、結果の一致も確認する
+    """
+    def best_of(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    full_time, full_boxes = best_of(
+        lambda: find_components(image, threshold, min_size))
+    pyramid_time, pyramid_boxes = best_of(
+        lambda: find_components_pyramid(image, threshold, min_size, factor))
+
+    def key(boxes):
+        return [(b['x'], b['y'], b['w'], b['h'], b['area']) for b in boxes]
+
+    return {
+        'full_ms': full_time * 1000,
+        'pyramid_ms': pyramid_time * 1000,
+        'speedup': full_time / pyramid_time if pyramid_time else 0.0,
+        'match': key(full_boxes) == key(pyramid_boxes),
+        'count': len(full_boxes),
+    }
+
+
+def save_stickers(stickers: list, output_dir: str, prefix: str = "sticker",
+                  preset: str = DEFAULT_PRESET, workers: int = None):
     """
-    シール画像を保存する
+    シール画像を保存する（PNG エンコードはスレッドで並列に行う）
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    saved_files = []
-    for i, sticker in enumerate(stickers, 1):
-        filename = f"{prefix}_{i}.png"
-        filepath = os.path.join(output_dir, filename)
-        cv2.imwrite(filepath, sticker)
-        saved_files.append(filepath)
-        print(f"  保存: {filename} ({sticker.shape[1]}x{sticker.shape[0]})")
+    filenames = [f"{prefix}_{i}.png" for i in range(1, len(stickers) + 1)]
+    saved_files = [os.path.join(output_dir, name) for name in filenames]
+    results = save_pngs(stickers, saved_files, preset, workers)
+
+    for filename, sticker, result in zip(filenames, stickers, results):
+        print(f"  保存: {filename} ({sticker.shape[1]}x{sticker.shape[0]}, "
+              f"{result['bytes'] / 1024:.1f} KB, {result['ms']:.1f} ms)")
+    print(f"  PNG ({preset}): {format_encode_stats(results)}")
 
     return saved_files
 
 
 def split_stickers(input_path: str, output_dir: str = None, prefix: str = "sticker",
-                   padding: int = 0, threshold: int = 10, min_size: int = 20) -> list:
+                   padding: int = 0, threshold: int = 10, min_size: int = 20,
+                   stream: bool = False, strip_rows: int = 256,
+                   engine: str = 'cc', pyramid_factor: int = 0,
+                   cache_dir: str = None, cache_mb: int = DEFAULT_MAX_MB,
+                   png_preset: str = DEFAULT_PRESET, encode_workers: int = None,
+                   image: np.ndarray = None) -> list:
     """
     メイン処理：画像からシールを検出して切り出し、保存する
 
@@ -153,6 +205,15 @@ def split_stickers(input_path: str, output_dir: str = None, prefix: str = "stick
         padding: 余白のピクセル数
         threshold: アルファしきい値（1-254, 低いほど高感度）
         min_size: 最小サイズ（これより小さいものはゴミとして除外）
+        stream: True の場合、PNG を行ストリップ単位で読む省メモリモード
+        strip_rows: ストリーミング時に一度に読む行数
+        engine: ラベリング方式（'cc'=OpenCV, 'runs'=ランレングス）
+        pyramid_factor: 0 以外ならその縮小率でピラミッド検出する
+        cache_dir: デコード済みシートのキャッシュ先（None ならキャッシュしない）
+        cache_mb: キャッシュ全体の上限 (MB)
+        png_preset: PNG 圧縮プリセット（'fast' / 'balanced' / 'smallest'）
+        encode_workers: PNG エンコードのスレッド数（None なら CPU コア数）
+        image: デコード済みの画像（一括処理の先読み用。None ならファイルから読む）
 
     Returns:
         保存したファイルパスのリスト
@@ -161,25 +222,34 @@ def split_stickers(input_path: str, output_dir: str = None, prefix: str = "stick
     print(f"Sticker Splitter - シール切り出しツール")
     print(f"{'='*50}")
 
-    # 画像読み込み（アルファチャンネル付き）
     print(f"\n入力: {input_path}")
-    image = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
-
-    if image is None:
-        raise FileNotFoundError(f"画像を読み込めません: {input_path}")
-
-    print(f"チャンネル数: {image.shape[2] if len(image.shape) > 2 else 1}")
 
     # 出力ディレクトリの設定
     if output_dir is None:
         input_dir = os.path.dirname(input_path)
         output_dir = os.path.join(input_dir, prefix)
 
-    print(f"出力先: {output_dir}")
+    if stream:
+        # 画像全体はデコードせず、ストリップ単位で検出→切り出しの2パス
+        print(f"出力先: {output_dir}")
+        print(f"\nシールを検出中... (ストリーミング)")
+        boxes = detect_stickers_streaming(input_path, threshold, min_size,
+                                          strip_rows, engine)
+    else:
+        # 画像読み込み（アルファチャンネル付き）
+        if image is None:
+            image = read_sheet(input_path, cache_dir, cache_mb)
+
+        if image is None:
+            raise FileNotFoundError(f"画像を読み込めません: {input_path}")
+
+        print(f"チャンネル数: {image.shape[2] if len(image.shape) > 2 else 1}")
+        print(f"出力先: {output_dir}")
+
+        # シール検出
+        print(f"\nシールを検出中...")
+        boxes = detect_stickers(image, threshold, min_size, engine, pyramid_factor)
 
-    # シール検出
-    print(f"\nシールを検出中...")
-    boxes = detect_stickers(image, threshold, min_size)
     print(f"検出数: {len(boxes)}個")
 
     if len(boxes) == 0:
@@ -188,41 +258,164 @@ def split_stickers(input_path: str, output_dir: str = None, prefix: str = "stick
 
     # シール切り出し
     print(f"\n切り出し中...")
-    stickers = extract_stickers(image, boxes, padding)
+    if stream:
+        stickers = extract_stickers_streaming(input_path, boxes, padding, strip_rows)
+    else:
+        stickers = extract_stickers(image, boxes, padding)
 
     # 保存
     print(f"\n保存中...")
-    saved_files = save_stickers(stickers, output_dir, prefix)
+    saved_files = save_stickers(stickers, output_dir, prefix, png_preset,
+                                encode_workers)
 
     print(f"\n{'='*50}")
     print(f"完了！ {len(saved_files)}個のシールを保存しました")
+    print(f"ピークメモリ: {peak_rss_mb():.1f} MB")
     print(f"{'='*50}\n")
 
     return saved_files
 
 
+def read_sheet(input_path: str, cache_dir: str = None,
+               cache_mb: int = DEFAULT_MAX_MB) -> np.ndarray:
+    """シートを読み込む（cache_dir 指定時はデコード済みキャッシュを使う）"""
+    if cache_dir:
+        return load_sheet(input_path, cache_dir, cache_mb)
+    return cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+
+
+def _split_sheet_job(input_path: str, output_dir: str, options: dict,
+                     prefetched: np.ndarray = None) -> int:
+    """一括処理の1枚分（ワーカープロセスで実行）。保存した枚数を返す"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved_files = split_stickers(input_path, output_dir, image=prefetched,
+                                     **options)
+    return len(saved_files)
+
+
+def _decode_sheet(job: tuple) -> np.ndarray:
+    """次のシートを先にデコードしておく（1プロセス実行時の先読み）"""
+    options = job[2]
+    return read_sheet(job[0], options.get('cache_dir'),
+                      options.get('cache_mb', DEFAULT_MAX_MB))
+
+
+def batch_output_dirs(input_paths: list, output_root: str = None) -> list:
+    """各シートの出力先 <出力ルート>/<画像名>/ を決める（batch_runner.output_paths）"""
+    return output_paths(input_paths, output_root)
+
+
+def split_batch(input_paths: list, output_root: str = None, workers: int = None,
+                **options) -> list:
+    """
+    複数のシートをプロセスプールで並列に切り出す
+
+    1枚ごとに進捗・エラーを表示し、失敗したシートがあっても残りは続ける。
+
+    Returns:
+        run_batch の結果リスト（入力と同じ順）
+    """
+    output_dirs = batch_output_dirs(input_paths, output_root)
+    if (workers or os.cpu_count() or 1) > 1:
+        # シートごとにプロセスを分けるので、エンコードのスレッドは増やさない
+        options.setdefault('encode_workers', 1)
+    jobs = [(path, out, options) for path, out in zip(input_paths, output_dirs)]
+
+    print(f"\n{'='*50}")
+    print(f"Sticker Splitter - 一括処理 ({len(jobs)}枚, 並列数: {workers or os.cpu_count()})")
+    print(f"{'='*50}\n")
+
+    start = time.perf_counter()
+    prefetch = None if options.get('stream') else _decode_sheet
+    results = run_batch(_split_sheet_job, jobs, workers,
+                        describe=lambda n: f"{n}個", prefetch=prefetch)
+
+    failed = [r for r in results if not r['ok']]
+    total = sum(r['result'] for r in results if r['ok'])
+    print(f"\n{'='*50}")
+    print(f"完了！ {len(results) - len(failed)}/{len(results)}枚, "
+          f"合計 {total}個のシール ({time.perf_counter() - start:.1f}s)")
+    for r in failed:
+        print(f"  失敗: {r['args'][0]}: {r['error']}")
+    print(f"{'='*50}\n")
+
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Sticker Splitter - 背景透過画像からシールを自動切り出し'
     )
-    parser.add_argument('input', help='入力画像のパス')
+    parser.add_argument('input', nargs='+',
+                        help='入力画像のパス（複数・ディレクトリ・グロブ可）')
     parser.add_argument('-o', '--output', help='出力ディレクトリ')
     parser.add_argument('-p', '--prefix', default='sticker', help='ファイル名の接頭辞')
     parser.add_argument('--padding', type=int, default=0, help='余白(px)')
     parser.add_argument('--threshold', type=int, default=10, help='アルファしきい値(1-254)')
     parser.add_argument('--min-size', type=int, default=20, help='最小サイズ(px)')
+    parser.add_argument('--stream', action='store_true',
+                        help='行ストリップ単位で読む省メモリモード(PNGのみ)')
+    parser.add_argument('--strip-rows', type=int, default=256,
+                        help='ストリーミング時のストリップ行数')
+    parser.add_argument('--engine', choices=['cc', 'runs'], default='cc',
+                        help='ラベリング方式(cc=OpenCV, runs=ランレングス)')
+    parser.add_argument('--pyramid', action='store_true',
+                        help='縮小画像で候補を探してから原寸で検出する')
+    parser.add_argument('--pyramid-factor', type=int, choices=[4, 8], default=4,
+                        help='ピラミッド検出の縮小率')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='通常検出とピラミッド検出の速度を比較する')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='一括処理の並列プロセス数(デフォルト: CPUコア数)')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, default=None,
+                        metavar='DIR', help='デコード済みシートのキャッシュ先')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_MB,
+                        help='キャッシュ全体の上限(MB)')
+    parser.add_argument('--png-preset', choices=list(PNG_PRESETS), default=DEFAULT_PRESET,
+                        help='PNG 圧縮プリセット(fast / balanced / smallest)')
 
     args = parser.parse_args()
 
-    split_stickers(
-        input_path=args.input,
-        output_dir=args.output,
+    if args.pyramid and (args.stream or args.engine != 'cc'):
+        parser.error('--pyramid は --stream / --engine runs と同時に使えません')
+
+    input_paths = expand_inputs(args.input)
+    if not input_paths:
+        parser.error('入力画像が見つかりません')
+
+    if args.benchmark:
+        image = read_sheet(input_paths[0], args.cache, args.cache_size)
+        if image is None:
+            raise FileNotFoundError(f"画像を読み込めません: {input_paths[0]}")
+        result = benchmark_detection(image, args.threshold, args.min_size,
+                                     args.pyramid_factor)
+        print(f"画像サイズ: {image.shape[1]}x{image.shape[0]}, 検出数: {result['count']}個")
+        print(f"  原寸検出:     {result['full_ms']:.1f} ms")
+        print(f"  ピラミッド(1/{args.pyramid_factor}): {result['pyramid_ms']:.1f} ms")
+        print(f"  速度比: {result['speedup']:.2f}x, 結果一致: {'OK' if result['match'] else 'NG'}")
+        return
+
+    options = dict(
         prefix=args.prefix,
         padding=args.padding,
         threshold=args.threshold,
-        min_size=args.min_size
+        min_size=args.min_size,
+        stream=args.stream,
+        strip_rows=args.strip_rows,
+        engine=args.engine,
+        pyramid_factor=args.pyramid_factor if args.pyramid else 0,
+        cache_dir=args.cache,
+        cache_mb=args.cache_size,
+        png_preset=args.png_preset
     )
 
+    # 1枚だけのファイル指定は従来通りの出力先・表示
+    single = len(args.input) == 1 and os.path.isfile(args.input[0])
+    if single:
+        split_stickers(input_path=input_paths[0], output_dir=args.output, **options)
+    else:
+        split_batch(input_paths, args.output, args.workers, **options)
+
 
 if __name__ == '__main__':
     main()
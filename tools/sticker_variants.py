@@ -0,0 +1,293 @@
+"""
+Sticker Variants - シール画像のサイズ違い・軽量フォーマット版の生成
+
+アプリの一覧やコレクション画面ではシールを小さく表示するだけなのに、
+原寸の PNG（1枚あたり平均 約320 KB）を読み込んでいます。各シールから
+長辺 128 / 256 / 512 px と原寸の WebP（指定すれば AVIF も）を作り、
+シールID → バリエーションの URL・サイズの対応表（マニフェスト）を書き出します。
+
+縮小はアルファを乗算した色で行うので、透明部分の色が縁ににじみません。
+バリエーションは元画像と同じフォルダの variants/ に置きます。
+
+使い方:
+    python sticker_variants.py [オプション]   (generated_stickers.json の全シール)
+
+オプション:
+    --sizes         長辺のサイズ（カンマ区切り、full=原寸）(デフォルト: 128,256,512,full)
+    --formats       webp / avif（カンマ区切り）(デフォルト: webp)
+    --quality       品質 1-100 (デフォルト: WebP 85, AVIF 60)
+    --force         元画像より新しいバリエーションも作り直す
+    --manifest      マニフェストの出力先 (デフォルト: public/stickers/variants.json)
+    --stickers-dir  シール画像のフォルダ (デフォルト: public/stickers)
+    --workers, -j   並列スレッド数 (デフォルト: CPUコア数)
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import cv2
+import numpy as np
+
+from image_header import read_image_header
+from sync_writer import write_atomic
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STICKERS_DIR = os.path.join(BASE_PATH, 'public', 'stickers')
+DEFAULT_MANIFEST = os.path.join(STICKERS_DIR, 'variants.json')
+
+DEFAULT_SIZES = (128, 256, 512, None)   # None は原寸
+VARIANT_DIR = 'variants'
+
+# AVIF は OpenCV 4.11 以降（それより前のビルドではフラグがなく None）
+FORMATS = {
+    'webp': {'ext': '.webp', 'quality': cv2.IMWRITE_WEBP_QUALITY, 'default': 85},
+    'avif': {'ext': '.avif', 'quality': getattr(cv2, 'IMWRITE_AVIF_QUALITY', None),
+             'default': 60},
+}
+
+
+def check_format(fmt: str):
+    """フォーマットを使えるか確かめる。使えなければ ValueError"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不明なフォーマット: {fmt}")
+    if FORMATS[fmt]['quality'] is None:
+        raise ValueError(f"この OpenCV ({cv2.__version__}) は {fmt} の書き出しに"
+                         f"対応していません（OpenCV 4.11 以降が必要です）")
+
+
+def size_label(size: int) -> str:
+    return 'full' if size is None else str(size)
+
+
+def variant_size(width: int, height: int, size: int) -> tuple:
+    """長辺を size に縮めたときの (幅, 高さ)。拡大はしない"""
+    if size is None or max(width, height) <= size:
+        return width, height
+    scale = size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def resize_premultiplied(image: np.ndarray, width: int, height: int) -> np.ndarray:
+    """
+    アルファを乗算した色で縮小する（BGRA のとき）
+
+    そのまま縮小すると、透明ピクセルに残っている色（多くは黒やグレー）が
+    縁に混ざる。乗算済みで平均してからアルファで割り戻す。
+    """
+    if image.shape[1] == width and image.shape[0] == height:
+        return image
+    if image.ndim != 3 or image.shape[2] != 4:
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+    alpha = image[:, :, 3:4].astype(np.float32) / 255
+    premultiplied = np.concatenate([image[:, :, :3] * alpha, alpha * 255], axis=2)
+    small = cv2.resize(premultiplied, (width, height), interpolation=cv2.INTER_AREA)
+    small_alpha = small[:, :, 3:4]
+    color = np.where(small_alpha > 0, small[:, :, :3] * 255 / np.maximum(small_alpha, 1e-6), 0)
+    return np.concatenate([color, small_alpha], axis=2).round().clip(0, 255).astype(np.uint8)
+
+
+def planned_sizes(width: int, height: int, sizes: tuple = DEFAULT_SIZES) -> list:
+    """
+    実際に作るサイズ
+
+    長辺が元画像以上のサイズは原寸版と同じ画像になるので作らない。
+    """
+    return [size for size in sizes if size is None or max(width, height) > size]
+
+
+def make_variants(image: np.ndarray, sizes: tuple = DEFAULT_SIZES,
+                  formats: tuple = ('webp',), quality: int = None) -> list:
+    """
+    1枚のシールからサイズ・フォーマット違いを作る
+
+    Returns:
+        [{'size': 128 | ... | None, 'format', 'width', 'height', 'data', 'bytes'}, ...]
+    """
+    height, width = image.shape[:2]
+    variants = []
+    for size in planned_sizes(width, height, sizes):
+        new_width, new_height = variant_size(width, height, size)
+        resized = resize_premultiplied(image, new_width, new_height)
+        for fmt in formats:
+            check_format(fmt)
+            config = FORMATS[fmt]
+            params = [config['quality'], quality or config['default']]
+            ok, buffer = cv2.imencode(config['ext'], resized, params)
+            if not ok:
+                raise ValueError(f"{fmt} エンコードに失敗しました")
+            variants.append({
+                'size': size, 'format': fmt, 'width': new_width, 'height': new_height,
+                'data': buffer.tobytes(), 'bytes': len(buffer),
+            })
+    return variants
+
+
+def variant_name(file_name: str, size: int, fmt: str) -> str:
+    """sticker_1.png -> sticker_1_256.webp"""
+    stem = os.path.splitext(file_name)[0]
+    return f"{stem}_{size_label(size)}{FORMATS[fmt]['ext']}"
+
+
+def write_variants(output_dir: str, file_name: str, image: np.ndarray,
+                   sizes: tuple = DEFAULT_SIZES, formats: tuple = ('webp',),
+                   quality: int = None) -> list:
+    """
+    メモリ上の切り出し画像から作ったバリエーションを <output_dir>/variants/ に書く
+
+    Returns:
+        make_variants の結果（'data' を除き 'path' を加えたもの）
+    """
+    variant_dir = os.path.join(output_dir, VARIANT_DIR)
+    os.makedirs(variant_dir, exist_ok=True)
+    variants = make_variants(image, sizes, formats, quality)
+    for variant in variants:
+        variant['path'] = os.path.join(
+            variant_dir, variant_name(file_name, variant['size'], variant['format']))
+        write_atomic(variant['path'], variant.pop('data'))
+    return variants
+
+
+def sticker_url(*parts: str) -> str:
+    """stickerMasterData.ts の encodeImageUrl と同じ形式の URL"""
+    return '/stickers/' + '/'.join(quote(p, safe="-_.!~*'()") for p in parts)
+
+
+def sticker_parts(sticker: dict) -> list:
+    """generated_stickers.json の1件から public/stickers 以下のパス要素"""
+    parts = [sticker['folder']]
+    if sticker.get('subfolder'):
+        parts.append(sticker['subfolder'])
+    return parts
+
+
+def _process_sticker(sticker: dict, sizes: tuple, formats: tuple, quality: int,
+                     force: bool, stickers_dir: str) -> dict:
+    """1枚分のバリエーションを（必要なら）作り、マニフェストの項目を返す"""
+    parts = sticker_parts(sticker)
+    source_dir = os.path.join(stickers_dir, *parts)
+    source = os.path.join(source_dir, sticker['fileName'])
+    if not os.path.isfile(source):
+        return None
+
+    def expected_paths(width, height):
+        return [(size, fmt, os.path.join(source_dir, VARIANT_DIR,
+                                         variant_name(sticker['fileName'], size, fmt)))
+                for size in planned_sizes(width, height, sizes) for fmt in formats]
+
+    # サイズはヘッダーだけで分かるので、作り直し不要なら元画像をデコードしない
+    header = read_image_header(source)
+    source_mtime = os.path.getmtime(source)
+    up_to_date = header is not None and not force and all(
+        os.path.isfile(path) and os.path.getmtime(path) >= source_mtime
+        for _, _, path in expected_paths(header['width'], header['height']))
+
+    if not up_to_date:
+        image = cv2.imread(source, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        header = {'width': image.shape[1], 'height': image.shape[0]}
+        write_variants(source_dir, sticker['fileName'], image, sizes, formats, quality)
+    expected = expected_paths(header['width'], header['height'])
+
+    entry = {
+        'original': {
+            'url': sticker_url(*parts, sticker['fileName']),
+            'bytes': os.path.getsize(source),
+            'width': header['width'],
+            'height': header['height'],
+        },
+        'variants': {},
+    }
+    for size, fmt, path in expected:
+        if not os.path.isfile(path):
+            continue
+        width, height = variant_size(header['width'], header['height'], size)
+        entry['variants'].setdefault(size_label(size), {})[fmt] = {
+            'url': sticker_url(*parts, VARIANT_DIR, os.path.basename(path)),
+            'bytes': os.path.getsize(path),
+            'width': width,
+            'height': height,
+        }
+    return entry
+
+
+def build_variants(stickers: list, sizes: tuple = DEFAULT_SIZES,
+                   formats: tuple = ('webp',), quality: int = None,
+                   force: bool = False, workers: int = None,
+                   stickers_dir: str = STICKERS_DIR) -> dict:
+    """
+    全シールのバリエーションを作り、{シールID: マニフェストの項目} を返す
+
+    元画像より新しいバリエーションは作り直さない（force=True なら作り直す）。
+    エンコード中は GIL が外れるので、シールごとにスレッドで並列に処理する。
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(
+            lambda s: _process_sticker(s, sizes, formats, quality, force, stickers_dir),
+            stickers))
+    return {s['id']: e for s, e in zip(stickers, entries) if e is not None}
+
+
+def parse_sizes(text: str) -> tuple:
+    return tuple(None if v.strip() == 'full' else int(v) for v in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sticker Variants - シールのサイズ違い・WebP/AVIF 版とマニフェストを作る'
+    )
+    parser.add_argument('--sizes', default='128,256,512,full',
+                        help='長辺のサイズ（カンマ区切り、full=原寸）')
+    parser.add_argument('--formats', default='webp', help='webp / avif（カンマ区切り）')
+    parser.add_argument('--quality', type=int, default=None, help='品質 1-100')
+    parser.add_argument('--force', action='store_true',
+                        help='元画像より新しいバリエーションも作り直す')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST, help='マニフェストの出力先')
+    parser.add_argument('--stickers-dir', default=STICKERS_DIR,
+                        help='シール画像のフォルダ（public/stickers）')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='並列スレッド数(デフォルト: CPUコア数)')
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    formats = tuple(f.strip() for f in args.formats.split(','))
+    for fmt in formats:
+        try:
+            check_format(fmt)
+        except ValueError as e:
+            parser.error(str(e))
+
+    with open(os.path.join(BASE_PATH, 'generated_stickers.json'), 'r', encoding='utf-8') as f:
+        stickers = json.load(f)
+
+    start = time.perf_counter()
+    entries = build_variants(stickers, sizes, formats, args.quality, args.force,
+                             args.workers, args.stickers_dir)
+
+    manifest = {
+        'sizes': [size_label(s) for s in sizes],
+        'formats': list(formats),
+        'stickers': entries,
+    }
+    write_atomic(args.manifest,
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    original = sum(e['original']['bytes'] for e in entries.values())
+    print(f"シール数: {len(entries)} / {len(stickers)} ({time.perf_counter() - start:.1f}s)")
+    print(f"  原寸 PNG: {original / 1024 / 1024:8.1f} MB")
+    for size in sizes:
+        for fmt in formats:
+            total = sum(e['variants'].get(size_label(size), {}).get(fmt, {}).get('bytes', 0)
+                        for e in entries.values())
+            print(f"  {size_label(size):>4} {fmt:<5}: {total / 1024 / 1024:8.1f} MB")
+    print(f"マニフェスト: {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Sync Writer - 出力フォルダの差分書き込み
+
+出力フォルダを消して全部書き直す代わりに、既にあるファイルと内容ハッシュを
+比べて、変わったファイルだけを一時ファイル経由のリネームで置き換えます。
+今回の出力に含まれない古いファイルだけを削除するので、途中で落ちても
+フォルダが半端に空になることはなく、変わっていないファイルの更新日時も
+変わりません（下流のキャッシュが無駄に無効化されない）。
+"""
+
+import filecmp
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+SYNC_KINDS = ('added', 'changed', 'unchanged', 'removed')
+
+# os.umask は読むだけでもプロセス全体の値を一度書き換えるので、
+# スレッドから書き込む前に読み込み時に1回だけ読んでおく
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _sha256_of_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _replace_with_mode(temp_path: str, path: str):
+    """
+    一時ファイルで path を置き換える
+
+    mkstemp の一時ファイルは 0600 なので、権限を元のファイル（なければ umask に
+    従った通常のファイル）に合わせてから置き換える。
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, path)
+
+
+def write_atomic(path: str, data: bytes):
+    """同じフォルダの一時ファイルに書いてから置き換える"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        _replace_with_mode(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def commit_atomic(temp_path: str, path: str):
+    """
+    書き終えた一時ファイルで path を置き換える
+
+    内容が元のファイルと同じなら置き換えずに一時ファイルを消す（更新日時が
+    変わらないので、下流のビルドキャッシュが無駄に無効化されない）。
+    """
+    if os.path.isfile(path) and filecmp.cmp(temp_path, path, shallow=False):
+        os.remove(temp_path)
+        return
+    _replace_with_mode(temp_path, path)
+
+
+@contextmanager
+def open_atomic(path: str, encoding: str = 'utf-8'):
+    """
+    write_atomic のテキスト版。少しずつ書き込み、with を抜けたときに置き換える
+
+    例外で抜けたときは一時ファイルを消し、元のファイルには触らない。
+    書いた内容が元のファイルと同じなら置き換えない（commit_atomic）。
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            yield f
+        commit_atomic(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def sync_dir(output_dir: str, files: dict, extensions: tuple = ('.png',)) -> dict:
+    """
+    output_dir の中身を files と同じにする
+
+    Args:
+        output_dir: 出力フォルダ（なければ作る）
+        files: {ファイル名: バイト列}
+        extensions: 古いファイルとして削除してよい拡張子（それ以外には触らない）
+
+    Returns:
+        {'added', 'changed', 'unchanged', 'removed'} それぞれファイル名のリスト
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {kind: [] for kind in SYNC_KINDS}
+
+    for name, data in files.items():
+        path = os.path.join(output_dir, name)
+        if os.path.isfile(path):
+            # サイズが違えば中身を読むまでもなく変更
+            if (os.path.getsize(path) == len(data)
+                    and _sha256_of_file(path) == hashlib.sha256(data).hexdigest()):
+                summary['unchanged'].append(name)
+                continue
+            kind = 'changed'
+        else:
+            kind = 'added'
+        write_atomic(path, data)
+        summary[kind].append(name)
+
+    for name in sorted(os.listdir(output_dir)):
+        path = os.path.join(output_dir, name)
+        if (name not in files and name.lower().endswith(extensions)
+                and os.path.isfile(path)):
+            os.remove(path)
+            summary['removed'].append(name)
+
+    return summary
+
+
+def merge_summaries(*summaries: dict) -> dict:
+    """複数フォルダの sync_dir の結果をまとめる"""
+    return {kind: [name for s in summaries for name in s[kind]] for kind in SYNC_KINDS}
+
+
+def format_sync_summary(summary: dict) -> str:
+    """追加・変更・変更なし・削除の件数を1行にまとめる"""
+    return (f"追加 {len(summary['added'])} / 変更 {len(summary['changed'])} / "
+            f"変更なし {len(summary['unchanged'])} / 削除 {len(summary['removed'])}")